@@ -0,0 +1,112 @@
+"""
+Benchmark the vtxMatch pipeline on a plain machine, no Maya needed.
+
+    python benchmarks/bench_vtxmatch.py --shapes grid sphere scan --sizes 1000 100000 1000000
+
+The matcher runs against fake_maya, and every stage (fetch, search, write,
+normals) reports wall time, peak traced memory and the number of Maya
+commands it issued. --no-trace skips tracemalloc for cleaner timings.
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import fake_maya
+import synthetic
+from vtxmatchlib.core import match_points, matched_values
+from vtxmatchlib.instrument import CAN_TRACE_MEMORY
+from vtxmatchlib.mayaio import MeshIO
+from vtxmatchlib.matcher import PostionMatcher
+from vtxmatchlib.spatial import ENGINES
+
+
+class Stage():
+    '''Times one stage and records its peak memory and command count.'''
+
+    def __init__(self, name, cmds, trace, report):
+        self.name = name
+        self.cmds = cmds
+        self.trace = trace
+        self.report = report
+
+    def __enter__(self):
+        self.calls = sum(self.cmds.calls.values())
+        if self.trace:
+            tracemalloc.reset_peak()
+            self.memory = tracemalloc.get_traced_memory()[0]
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        seconds = time.perf_counter() - self.start
+        peak = tracemalloc.get_traced_memory()[1] - self.memory if self.trace else None
+        self.report[self.name] = {'seconds': seconds,
+                                  'peak_mb': None if peak is None else peak / 2 ** 20,
+                                  'commands': sum(self.cmds.calls.values()) - self.calls}
+
+
+def run_case(shape, size, threshold, engine, trace):
+    source, faces, target = synthetic.SHAPES[shape](size)
+    cmds = fake_maya.FakeCmds()
+    om = fake_maya.FakeOpenMaya(cmds)
+    cmds.add_mesh('source', source, faces)
+    cmds.add_mesh('target', target, faces if shape != 'scan' else None)
+    matcher = PostionMatcher(MeshIO(cmds, om))
+    matcher.bVtxList = ['source.vtx[*]']
+    matcher.aVtxList = ['target.vtx[*]']
+
+    report = {}
+    with Stage('fetch', cmds, trace, report):
+        matcher.updated_xform()
+    with Stage('search', cmds, trace, report):
+        result = match_points(matcher.aPoints, matcher.bPoints, threshold,
+                              index=matcher.source_index(threshold, engine))
+    matched = matcher.aVtxList.take(result.target)
+    with Stage('write', cmds, trace, report):
+        with matcher.meshIO.undo_chunk('matchVertexs'):
+            matcher.meshIO.scatter(matched, matched_values(result, matcher.bPoints))
+    with Stage('normals', cmds, trace, report):
+        matcher.meshIO.scatter_normals(matched, matched_values(result, matcher.source_normals()))
+    return {'shape': shape, 'size': len(source), 'engine': engine, 'matched': len(result.target),
+            'stages': report}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--shapes', nargs='+', choices=sorted(synthetic.SHAPES), default=sorted(synthetic.SHAPES))
+    parser.add_argument('--sizes', nargs='+', type=int, default=[1000, 10000, 100000])
+    parser.add_argument('--threshold', type=float, default=0.01)
+    parser.add_argument('--engine', choices=ENGINES, default='auto')
+    parser.add_argument('--no-trace', action='store_true', help='do not measure memory')
+    parser.add_argument('--json', help='also write the results to this file')
+    args = parser.parse_args(argv)
+
+    trace = not args.no_trace
+    if trace and not CAN_TRACE_MEMORY:
+        parser.error('measuring memory per stage needs Python 3.9 or later; pass --no-trace')
+    if trace:
+        tracemalloc.start()
+    results = []
+    print(f'{"shape":<8}{"size":>10}{"matched":>10}  {"stage":<8}{"seconds":>10}{"peak MB":>10}{"commands":>10}')
+    for shape in args.shapes:
+        for size in args.sizes:
+            case = run_case(shape, size, args.threshold, args.engine, trace)
+            results.append(case)
+            for stage, row in case['stages'].items():
+                peak = '-' if row['peak_mb'] is None else f'{row["peak_mb"]:.1f}'
+                print(f'{shape:<8}{case["size"]:>10}{case["matched"]:>10}  {stage:<8}'
+                      f'{row["seconds"]:>10.3f}{peak:>10}{row["commands"]:>10}')
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
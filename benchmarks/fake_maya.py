@@ -0,0 +1,498 @@
+"""
+Pure-Python stand-in for the parts of maya.cmds and maya.api.OpenMaya that
+vtxmatchlib uses. Meshes are numpy arrays; every command call is counted so
+benchmarks can report Maya round-trips per stage.
+
+    cmds, om = fake_maya.install()   # also registers maya.cmds / maya.api.OpenMaya
+    cmds.add_mesh('pSphere1', points, faces)
+"""
+
+import collections
+import copy
+import os
+import re
+import struct
+import sys
+import types
+from xml.etree import ElementTree
+
+import numpy
+
+
+# FakeMesh state undo() does not restore from its snapshot
+_NOT_SNAPSHOT = ('motion', 'normals', 'locked', 'splitNormals')
+_RANGE = re.compile(r'^(?:vtx|pnts)\[(\*|\d+)(?::(\d+))?\]$')
+_INDEX = re.compile(r'\[(\d+)\]')
+
+
+class FakeMesh():
+    def __init__(self, points, faces=None, normals=None, matrix=None):
+        self.base = numpy.array(points, dtype=numpy.float64).reshape(-1, 3)
+        self.tweaks = numpy.zeros_like(self.base)
+        self.faces = [] if faces is None else [list(face) for face in faces]
+        self.normals = (numpy.tile([0.0, 1.0, 0.0], (len(self.base), 1)) if normals is None
+                        else numpy.array(normals, dtype=numpy.float64).reshape(-1, 3))
+        # what an unlocked vertex normal falls back to
+        self.computedNormals = self.normals.copy()
+        self.locked = numpy.zeros(len(self.base), dtype=bool)
+        # locked per face normals of split vertices: {(face, vertex): normal}, every face of such a vertex listed
+        self.splitNormals = {}
+        self.matrix = numpy.eye(4) if matrix is None else numpy.array(matrix, dtype=numpy.float64).reshape(4, 4)
+        # motion(time) -> (V, 3) offsets, a stand-in for upstream deformers or a simulation
+        self.motion = None
+        self.time = 1.0
+        # blendShape targets by index: {'weight', 'ids', 'offsets'}
+        self.blendTargets = {}
+        # an attached geometry cache: {time: (V, 3) points}, replacing base and motion on those frames
+        self.cache = None
+
+    def local(self):
+        points = self.base + self.tweaks
+        if self.motion is not None:
+            points += self.motion(self.time)
+        if self.cache is not None and self.time in self.cache:
+            points = self.cache[self.time] + self.tweaks
+        for target in self.blendTargets.values():
+            if len(target['ids']) == len(target['offsets']):
+                points[target['ids']] += target['weight'] * target['offsets']
+        return points
+
+    def world(self):
+        return self.local() @ self.matrix[:3, :3] + self.matrix[3, :3]
+
+    def normal_ids(self):
+        '''(normal id per face-vertex, normals): a vertex' own normal unless its face normals are split.'''
+        split = {key: len(self.base) + i for i, key in enumerate(self.splitNormals)}
+        ids = [split.get((f, v), v) for f, face in enumerate(self.faces) for v in face]
+        return ids, self.normals.tolist() + [list(normal) for normal in self.splitNormals.values()]
+
+    def unsplit(self, vertices):
+        for key in [key for key in self.splitNormals if key[1] in vertices]:
+            del self.splitNormals[key]
+
+
+class FakeCmds():
+    '''maya.cmds look-alike; calls counts every command issued.'''
+
+    def __init__(self):
+        self.meshes = {}
+        self.calls = collections.Counter()
+        self.undoChunks = 0
+        # matrix rigging: {node: {attr: value}}, (source, destination) plugs and (driver, driven) constraints
+        self.nodes = {}
+        self.connections = []
+        self.constraints = []
+        self.time = 1.0
+        self.timeUnit = 'film'
+        # (attribute, time) of every setKeyframe
+        self.keys = []
+        self.plugins = set()
+        # mesh state when the last outermost undo chunk opened, which undo() goes back to; normals
+        # are left out, they come back through the NormalEdits the chunk ran, as with the plug-in
+        self._chunkDepth = 0
+        self._undoState = None
+        self._normalEdits = []
+
+    def add_mesh(self, name, points, faces=None, normals=None, matrix=None, motion=None):
+        self.meshes[name] = FakeMesh(points, faces, normals, matrix)
+        self.meshes[name].motion = motion
+        return name
+
+    def _mesh(self, node):
+        node = node.split('|')[-1]
+        return self.meshes[node[:-len('Shape')] if node.endswith('Shape') else node]
+
+    def _range(self, component, count):
+        start, stop = _RANGE.match(component).groups()
+        if start == '*':
+            return slice(0, count)
+        return slice(int(start), int(stop if stop is not None else start) + 1)
+
+    def xform(self, item, q=False, ws=False, os=False, t=None, a=False, m=False):
+        self.calls['xform'] += 1
+        node, _, component = item.partition('.')
+        mesh = self._mesh(node)
+        if not component:
+            if q:
+                return (mesh.matrix.ravel() if m else mesh.matrix[3, :3]).tolist()
+            mesh.matrix[3, :3] = t
+            return None
+        rows = self._range(component, len(mesh.base))
+        if q:
+            return (mesh.world() if ws else mesh.local())[rows].ravel().tolist()
+        target = numpy.array(t, dtype=numpy.float64)
+        if ws:
+            target = (target - mesh.matrix[3, :3]) @ numpy.linalg.inv(mesh.matrix[:3, :3])
+        mesh.tweaks[rows] = target - mesh.base[rows]
+        return None
+
+    def listRelatives(self, node, shapes=False, noIntermediate=False, fullPath=False, type=None, **kwargs):
+        self.calls['listRelatives'] += 1
+        return [f'{node}Shape'] if node in self.meshes else None
+
+    def getAttr(self, attr, multiIndices=False):
+        self.calls['getAttr'] += 1
+        node, _, name = attr.partition('.')
+        if node in self.nodes:
+            return self._blend_get(node, name, multiIndices)
+        mesh = self._mesh(node)
+        if name == 'worldMatrix[0]':
+            return mesh.matrix.ravel().tolist()
+        return [tuple(row) for row in mesh.tweaks[self._range(name, len(mesh.base))]]
+
+    def setAttr(self, attr, *values, type=None):
+        self.calls['setAttr'] += 1
+        node, _, name = attr.partition('.')
+        if type == 'matrix':
+            self.nodes.setdefault(node, {})[name] = numpy.array(values, dtype=numpy.float64).reshape(4, 4)
+            return
+        if node in self.nodes:
+            self._blend_set(node, name, values)
+            return
+        mesh = self._mesh(node)
+        mesh.tweaks[self._range(name, len(mesh.base))] = numpy.array(values, dtype=numpy.float64).reshape(-1, 3)
+
+    def polyEvaluate(self, mesh, vertex=False, face=False):
+        self.calls['polyEvaluate'] += 1
+        return len(self._mesh(mesh).faces) if face else len(self._mesh(mesh).base)
+
+    def createNode(self, nodeType, name=None):
+        self.calls['createNode'] += 1
+        name = name or f'{nodeType}{len(self.nodes) + 1}'
+        self.nodes[name] = {'nodeType': nodeType}
+        return name
+
+    def connectAttr(self, source, destination, force=False):
+        self.calls['connectAttr'] += 1
+        self.connections.append((source, destination))
+
+    def parentConstraint(self, *nodes, mo=False):
+        self.calls['parentConstraint'] += 1
+        self.constraints.append(nodes)
+        return [f'{nodes[-1]}_parentConstraint1']
+
+    def _shape(self, node):
+        return f'{node}Shape' if node in self.meshes else node
+
+    def listHistory(self, node):
+        # depth first up the deformer chain like Maya's: the last deformer added comes first, each
+        # followed by the history of the meshes feeding it (blendShape targets, wrap drivers)
+        self.calls['listHistory'] += 1
+        history = []
+        for name, attrs in reversed(list(self.nodes.items())):
+            if self._shape(node) in attrs.get('geometry', ()):
+                history += [name] + [item for target in attrs.get('targets', ()) for item in self.listHistory(target)]
+        return [node] + [item for item in dict.fromkeys(history) if item != node]
+
+    def nodeType(self, node):
+        self.calls['nodeType'] += 1
+        return self.nodes[node]['nodeType']
+
+    def blendShape(self, *objects, name=None, q=False, geometry=False, geometryIndices=False):
+        # blendShape(target..., base) like Maya's: the last object is the one deformed
+        self.calls['blendShape'] += 1
+        if q:
+            shapes = self.nodes[objects[0]]['geometry']
+            return list(range(len(shapes))) if geometryIndices else list(shapes)
+        name = name or f'blendShape{len(self.nodes) + 1}'
+        self.nodes[name] = {'nodeType': 'blendShape', 'geometry': [self._shape(objects[-1])],
+                            'targets': list(objects[:-1]), 'aliases': {}}
+        return [name]
+
+    def deformer(self, node, e=False, q=False, geometry=None, type=None):
+        self.calls['deformer'] += 1
+        if q:
+            return list(self.nodes[node]['geometry'])
+        if e:
+            self.nodes[node]['geometry'].append(self._shape(geometry))
+            return None
+        name = f'{type}{len(self.nodes) + 1}'
+        self.nodes[name] = {'nodeType': type, 'geometry': [self._shape(node)]}
+        return [name]
+
+    def cacheFile(self, attachFile=False, fileName=None, directory=None, channelName=(), inAttr=()):
+        # reads the cache back as Maya does, the .xml first and then the data file its format names,
+        # so the mesh behind the historySwitch plays it
+        self.calls['cacheFile'] += 1
+        switch = inAttr[0].partition('.')[0]
+        cacheType = ElementTree.parse(os.path.join(directory, f'{fileName}.xml')).find('cacheType')
+        assert cacheType.get('Type') == 'OneFile'
+        extension = {'mcc': '.mc', 'mcx': '.mcx'}[cacheType.get('Format')]
+        with open(os.path.join(directory, f'{fileName}{extension}'), 'rb') as data:
+            chunks = _iff_chunks(data.read())
+        frames, time = {}, None
+        for tag, value in chunks:
+            if tag == b'TIME':
+                time = struct.unpack('>i', value)[0] * self._fps() / 6000
+            elif tag == b'FVCA':
+                frames[time] = numpy.frombuffer(value, dtype='>f4').reshape(-1, 3).astype(numpy.float64)
+        self._mesh(self.nodes[switch]['geometry'][0]).cache = frames
+        return self.createNode('cacheFile')
+
+    def currentUnit(self, q=False, time=False):
+        self.calls['currentUnit'] += 1
+        return self.timeUnit
+
+    def _fps(self):
+        return {'film': 24, 'pal': 25, 'ntsc': 30}.get(self.timeUnit) or float(self.timeUnit[:-len('fps')])
+
+    def aliasAttr(self, *args, q=False):
+        self.calls['aliasAttr'] += 1
+        if q:
+            aliases = self.nodes[args[0]]['aliases']
+            return [item for alias, index in aliases.items() for item in (alias, f'weight[{index}]')] or None
+        node, _, name = args[1].partition('.')
+        self.nodes[node]['aliases'][args[0]] = int(_INDEX.findall(name)[0])
+
+    def _blend_target(self, node, name, geometry=None):
+        # targets live on the deformed meshes; a weight is shared by the target on every geometry
+        indices = [int(index) for index in _INDEX.findall(name)]
+        index, geometry = (indices[0], geometry or 0) if name.startswith('weight') else (indices[1], indices[0])
+        return self._mesh(self.nodes[node]['geometry'][geometry]).blendTargets.setdefault(
+            index, {'weight': 0.0, 'ids': numpy.empty(0, dtype=numpy.int64), 'offsets': numpy.empty((0, 3))})
+
+    def _blend_get(self, node, name, multiIndices):
+        if multiIndices:
+            return sorted({index for shape in self.nodes[node]['geometry']
+                           for index in self._mesh(shape).blendTargets}) or None
+        target = self._blend_target(node, name)
+        if name.startswith('weight'):
+            return target['weight']
+        if name.endswith('inputPointsTarget'):
+            return [(*offset, 1.0) for offset in target['offsets'].tolist()] or None
+        return [f'vtx[{i}]' for i in target['ids'].tolist()] or None
+
+    def _blend_set(self, node, name, values):
+        target = self._blend_target(node, name)
+        if name.startswith('weight'):
+            for geometry in range(len(self.nodes[node]['geometry'])):
+                self._blend_target(node, name, geometry)['weight'] = float(values[0])
+        elif name.endswith('inputPointsTarget'):
+            target['offsets'] = numpy.array(values[1:], dtype=numpy.float64).reshape(-1, 4)[:, :3]
+        else:
+            ranges = [self._range(component, 0) for component in values[1:]]
+            target['ids'] = numpy.concatenate([numpy.empty(0, dtype=numpy.int64)] +
+                                              [numpy.arange(r.start, r.stop) for r in ranges])
+
+    def currentTime(self, time=None, q=False, update=True):
+        self.calls['currentTime'] += 1
+        if q:
+            return self.time
+        self.time = float(time)
+        for mesh in self.meshes.values():
+            mesh.time = self.time
+        return self.time
+
+    def setKeyframe(self, attrs, t=None, **kwargs):
+        self.calls['setKeyframe'] += 1
+        for attr in [attrs] if isinstance(attrs, str) else attrs:
+            self.keys.append((attr, self.time if t is None else t))
+
+    def polyNormalPerVertex(self, components, q=False, freezeNormal=False):
+        # query only: a lock flag per vertex-face, vertex by vertex
+        self.calls['polyNormalPerVertex'] += 1
+        flags = []
+        for component in [components] if isinstance(components, str) else components:
+            node, _, name = component.partition('.')
+            mesh = self._mesh(node)
+            rows = self._range(name, len(mesh.base))
+            faceCount = numpy.bincount([v for face in mesh.faces for v in face], minlength=len(mesh.base))
+            flags += numpy.repeat(mesh.locked[rows], faceCount[rows]).tolist()
+        return flags
+
+    def pluginInfo(self, name, q=False, loaded=False):
+        self.calls['pluginInfo'] += 1
+        return name in self.plugins
+
+    def loadPlugin(self, path, quiet=False):
+        self.calls['loadPlugin'] += 1
+        self.plugins.add(path.replace('\\', '/').rsplit('/', 1)[-1].rsplit('.', 1)[0])
+
+    def vtxMatchSetNormals(self):
+        # the plug-in command: apply the edit MeshIO staged
+        from vtxmatchlib import mayaio
+        self.calls['vtxMatchSetNormals'] += 1
+        edit = mayaio.take_normal_edit()
+        edit.redo()
+        self._normalEdits.append(edit)
+
+    def undo(self):
+        # back to the state the last undo chunk started from
+        self.calls['undo'] += 1
+        # the plug-in command's undoIt, last edit first
+        while self._normalEdits:
+            self._normalEdits.pop().undo()
+        if self._undoState is not None:
+            for name, state in self._undoState.items():
+                self.meshes[name].__dict__.update(state)
+            self._undoState = None
+
+    def undoInfo(self, openChunk=False, closeChunk=False, chunkName=None, **kwargs):
+        self.calls['undoInfo'] += 1
+        self.undoChunks += int(openChunk)
+        if openChunk:
+            if not self._chunkDepth:
+                self._undoState = {name: copy.deepcopy({key: value for key, value in vars(mesh).items()
+                                                        if key not in _NOT_SNAPSHOT})
+                                   for name, mesh in self.meshes.items()}
+                self._normalEdits = []
+            self._chunkDepth += 1
+        elif closeChunk:
+            self._chunkDepth -= 1
+
+    def ls(self, *patterns, fl=False, sl=False, type=None, **kwargs):
+        self.calls['ls'] += 1
+        result = []
+        for pattern in (p for group in patterns for p in ([group] if isinstance(group, str) else group)):
+            if type is not None:
+                # every node with deformed geometry is a geometryFilter
+                attrs = self.nodes.get(pattern, {})
+                if attrs.get('nodeType') == type or (type == 'geometryFilter' and 'geometry' in attrs):
+                    result.append(pattern)
+                continue
+            node, _, component = pattern.partition('.')
+            if not component or not fl:
+                result.append(pattern)
+                continue
+            rows = self._range(component, len(self._mesh(node).base))
+            result.extend(f'{node}.vtx[{i}]' for i in range(rows.start, rows.stop))
+        return result
+
+
+def _iff_chunks(data):
+    '''(tag, data) of every chunk in an IFF file, descending into FOR4 groups.'''
+    chunks, at = [], 0
+    while at < len(data):
+        tag, size = data[at:at + 4], struct.unpack('>i', data[at + 4:at + 8])[0]
+        if tag == b'FOR4':
+            chunks += _iff_chunks(data[at + 12:at + 8 + size])
+        else:
+            chunks.append((tag, data[at + 8:at + 8 + size]))
+        at += 8 + size + (-size % 4)
+    return chunks
+
+
+class FakeOpenMaya(types.ModuleType):
+    '''maya.api.OpenMaya look-alike for the MFnMesh calls MeshIO makes.'''
+
+    class MSpace():
+        kObject = 2
+        kWorld = 4
+
+    MVector = staticmethod(lambda x, y, z: (x, y, z))
+    MVectorArray = list
+    MIntArray = list
+
+    def __init__(self, cmds):
+        super().__init__('maya.api.OpenMaya')
+        self.cmds = cmds
+
+    def MSelectionList(self):
+        return _FakeSelectionList(self.cmds)
+
+    def MFnMesh(self, path):
+        return _FakeFnMesh(self.cmds, path)
+
+    def MFnTransform(self, path):
+        # fake transforms have no parents, so local and world agree
+        return types.SimpleNamespace(transformation=lambda: types.SimpleNamespace(asMatrix=path.inclusiveMatrix))
+
+
+class _FakeSelectionList(list):
+    def __init__(self, cmds):
+        super().__init__()
+        self.cmds = cmds
+
+    def add(self, name):
+        if name not in self:
+            self.append(name)
+
+    def getDagPath(self, i):
+        return _FakeDagPath(self[i], self.cmds)
+
+
+class _FakeDagPath(str):
+    def __new__(cls, name, cmds):
+        path = super().__new__(cls, name)
+        path.cmds = cmds
+        return path
+
+    def inclusiveMatrix(self):
+        self.cmds.calls['MDagPath.inclusiveMatrix'] += 1
+        matrix = self.cmds._mesh(self).matrix
+        return types.SimpleNamespace(getElement=lambda r, c: float(matrix[r, c]))
+
+
+class _FakeFnMesh():
+    def __init__(self, cmds, path):
+        self.cmds = cmds
+        self.mesh = cmds._mesh(path)
+
+    def getVertexNormals(self, angleWeighted, space):
+        self.cmds.calls['MFnMesh.getVertexNormals'] += 1
+        return self.mesh.normals.tolist()
+
+    def setVertexNormals(self, normals, ids, space):
+        self.cmds.calls['MFnMesh.setVertexNormals'] += 1
+        self.mesh.normals[numpy.asarray(ids, dtype=numpy.int64)] = numpy.array(normals, dtype=numpy.float64)
+        self.mesh.locked[numpy.asarray(ids, dtype=numpy.int64)] = True
+        self.mesh.unsplit(set(ids))
+
+    def getNormals(self, space):
+        self.cmds.calls['MFnMesh.getNormals'] += 1
+        return self.mesh.normal_ids()[1]
+
+    def setFaceVertexNormals(self, normals, faces, vertices, space):
+        # splits the vertices' normals, and joins them again where every face ends up alike
+        self.cmds.calls['MFnMesh.setFaceVertexNormals'] += 1
+        mesh = self.mesh
+        for vertex in set(vertices):
+            for f, face in enumerate(mesh.faces):
+                if vertex in face:
+                    mesh.splitNormals.setdefault((f, vertex), tuple(mesh.normals[vertex]))
+        for normal, face, vertex in zip(normals, faces, vertices):
+            mesh.splitNormals[(face, vertex)] = tuple(float(x) for x in normal)
+        for vertex in set(vertices):
+            own = [normal for key, normal in mesh.splitNormals.items() if key[1] == vertex]
+            mesh.locked[vertex] = True
+            if len(set(own)) > 1:
+                mesh.normals[vertex] = numpy.mean(own, axis=0)
+                continue
+            mesh.normals[vertex] = own[0]
+            mesh.unsplit({vertex})
+
+    def unlockVertexNormals(self, ids):
+        self.cmds.calls['MFnMesh.unlockVertexNormals'] += 1
+        ids = numpy.asarray(ids, dtype=numpy.int64)
+        self.mesh.normals[ids] = self.mesh.computedNormals[ids]
+        self.mesh.locked[ids] = False
+        self.mesh.unsplit(set(ids.tolist()))
+
+    def getVertices(self):
+        self.cmds.calls['MFnMesh.getVertices'] += 1
+        return [len(face) for face in self.mesh.faces], [v for face in self.mesh.faces for v in face]
+
+    def getTriangles(self):
+        # fan triangulation of every face
+        self.cmds.calls['MFnMesh.getTriangles'] += 1
+        triangles = [(face[0], face[i], face[i + 1]) for face in self.mesh.faces for i in range(1, len(face) - 1)]
+        return [len(face) - 2 for face in self.mesh.faces], [v for triangle in triangles for v in triangle]
+
+    def getNormalIds(self):
+        self.cmds.calls['MFnMesh.getNormalIds'] += 1
+        return [len(face) for face in self.mesh.faces], self.mesh.normal_ids()[0]
+
+
+def install():
+    '''Register the fakes as maya, maya.cmds and maya.api.OpenMaya; returns (cmds, om).'''
+    cmds = FakeCmds()
+    om = FakeOpenMaya(cmds)
+    maya = types.ModuleType('maya')
+    api = types.ModuleType('maya.api')
+    cmdsModule = types.ModuleType('maya.cmds')
+    for name in dir(cmds):
+        if not name.startswith('__'):
+            setattr(cmdsModule, name, getattr(cmds, name))
+    maya.cmds, maya.api, api.OpenMaya = cmdsModule, api, om
+    sys.modules.update({'maya': maya, 'maya.cmds': cmdsModule, 'maya.api': api, 'maya.api.OpenMaya': om})
+    return cmds, om
@@ -0,0 +1,48 @@
+"""
+Synthetic source / target pairs for benchmarking vtxMatch.
+Every generator returns (source points, source faces or None, target points)
+for roughly count vertices, with the target within `noise` of the source.
+"""
+
+import numpy
+
+
+def grid(count, noise=0.002, seed=0):
+    '''Flat quad grid, target jittered in plane and height.'''
+    rng = numpy.random.default_rng(seed)
+    side = max(int(round(count ** 0.5)), 2)
+    u, v = numpy.meshgrid(numpy.linspace(0, 1, side), numpy.linspace(0, 1, side), indexing='ij')
+    points = numpy.stack([u.ravel(), numpy.zeros(side * side), v.ravel()], axis=1)
+    ids = numpy.arange(side * side).reshape(side, side)
+    faces = numpy.stack([ids[:-1, :-1], ids[1:, :-1], ids[1:, 1:], ids[:-1, 1:]], axis=-1).reshape(-1, 4)
+    return points, faces, points + rng.normal(scale=noise, size=points.shape)
+
+
+def noisy_sphere(count, noise=0.002, seed=0):
+    '''Unit UV sphere with radial noise on the source and extra jitter on the target.'''
+    rng = numpy.random.default_rng(seed)
+    rings = max(int(round((count / 2) ** 0.5)), 3)
+    segments = max(count // rings, 3)
+    theta, phi = numpy.meshgrid(numpy.linspace(0.1, numpy.pi - 0.1, rings),
+                                numpy.linspace(0, 2 * numpy.pi, segments, endpoint=False), indexing='ij')
+    points = numpy.stack([numpy.sin(theta) * numpy.cos(phi), numpy.cos(theta),
+                          numpy.sin(theta) * numpy.sin(phi)], axis=-1).reshape(-1, 3)
+    points *= 1 + rng.normal(scale=noise, size=(len(points), 1))
+    ids = numpy.arange(rings * segments).reshape(rings, segments)
+    nxt = numpy.roll(ids, -1, axis=1)
+    faces = numpy.stack([ids[:-1], ids[1:], nxt[1:], nxt[:-1]], axis=-1).reshape(-1, 4)
+    return points, faces, points + rng.normal(scale=noise, size=points.shape)
+
+
+def scan(count, noise=0.002, duplicates=0.1, seed=0):
+    '''Photogrammetry-like cloud: no faces, a share of exactly duplicated points.'''
+    rng = numpy.random.default_rng(seed)
+    points = rng.normal(size=(count, 3))
+    points /= numpy.linalg.norm(points, axis=1, keepdims=True)
+    copies = rng.choice(count, size=int(count * duplicates), replace=False)
+    points[copies[1::2]] = points[copies[::2]][:len(copies[1::2])]
+    target = points[rng.permutation(count)] + rng.normal(scale=noise, size=points.shape)
+    return points, None, target
+
+
+SHAPES = {'grid': grid, 'sphere': noisy_sphere, 'scan': scan}
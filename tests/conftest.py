@@ -0,0 +1,41 @@
+"""
+The tests drive vtxmatchlib against benchmarks/fake_maya, so they run on a
+plain Python with numpy; nothing here needs Maya.
+"""
+
+import os
+import sys
+
+import numpy
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[:0] = [ROOT, os.path.join(ROOT, 'benchmarks')]
+
+import fake_maya
+from vtxmatchlib.mayaio import MeshIO
+from vtxmatchlib.matcher import PostionMatcher
+
+
+@pytest.fixture
+def cmds():
+    return fake_maya.FakeCmds()
+
+
+@pytest.fixture
+def meshIO(cmds):
+    return MeshIO(cmds, fake_maya.FakeOpenMaya(cmds))
+
+
+@pytest.fixture
+def matcher(meshIO):
+    return PostionMatcher(meshIO)
+
+
+def grid_mesh(side, spacing=1.0):
+    '''(points, quad faces) of a flat side x side grid in the xz plane.'''
+    u, v = numpy.meshgrid(numpy.arange(side) * spacing, numpy.arange(side) * spacing, indexing='ij')
+    points = numpy.stack([u.ravel(), numpy.zeros(side * side), v.ravel()], axis=1)
+    ids = numpy.arange(side * side).reshape(side, side)
+    faces = numpy.stack([ids[:-1, :-1], ids[1:, :-1], ids[1:, 1:], ids[:-1, 1:]], axis=-1).reshape(-1, 4)
+    return points, faces
@@ -0,0 +1,76 @@
+import itertools
+
+import numpy
+import pytest
+
+from vtxmatchlib import assignment
+from vtxmatchlib.assignment import assign_greedy, assign_optimal, candidate_pairs, match_points_unique
+
+
+def sequential_greedy(candidates):
+    '''The plain greedy pass the rounds must reproduce: shortest first, ties to the lower target, then source.'''
+    target, source, distance = candidates
+    usedTarget, usedSource, taken = set(), set(), []
+    for row in numpy.lexsort((source, target, distance)).tolist():
+        if target[row] not in usedTarget and source[row] not in usedSource:
+            usedTarget.add(target[row])
+            usedSource.add(source[row])
+            taken.append(row)
+    taken = numpy.array(taken, dtype=numpy.int64)
+    taken = taken[numpy.argsort(target[taken], kind='stable')]
+    return target[taken], source[taken]
+
+
+def chain(count):
+    '''t0 s0 t1 s1 ... on a line with ever wider gaps: every pair waits on the one before it.'''
+    x = numpy.concatenate([[0.0], numpy.cumsum(numpy.linspace(1.0, 1.9, 2 * count - 1))])
+    return numpy.stack([x[0::2], numpy.zeros(count), numpy.zeros(count)], axis=1), \
+        numpy.stack([x[1::2], numpy.zeros(count), numpy.zeros(count)], axis=1)
+
+
+@pytest.mark.parametrize('seed', range(3))
+def test_greedy_equals_the_sequential_pass(seed):
+    rng = numpy.random.default_rng(seed)
+    # lattice points, so equal distances really are ties
+    targets, sources = rng.integers(0, 12, (800, 3)) / 4.0, rng.integers(0, 12, (500, 3)) / 4.0
+    candidates = candidate_pairs(targets, sources, 0.6)
+    result = assign_greedy(candidates)
+    expected = sequential_greedy(candidates)
+    numpy.testing.assert_array_equal(result.target, expected[0])
+    numpy.testing.assert_array_equal(result.source, expected[1])
+
+
+def test_greedy_on_a_chain_is_not_quadratic(monkeypatch):
+    targets, sources = chain(20000)
+    candidates = candidate_pairs(targets, sources, 1.95)
+    rounds = []
+    firstOf = assignment._first_of
+    monkeypatch.setattr(assignment, '_first_of', lambda values: rounds.append(1) or firstOf(values))
+    result = assign_greedy(candidates)
+    # _first_of runs twice a round; one pair a round would be 20000 rounds, the sweep takes over after the first
+    assert len(rounds) == 2
+    expected = sequential_greedy(candidates)
+    numpy.testing.assert_array_equal(result.target, expected[0])
+    numpy.testing.assert_array_equal(result.source, expected[1])
+
+
+def test_optimal_matches_most_then_shortest():
+    rng = numpy.random.default_rng(4)
+    targets, sources = rng.random((6, 3)), rng.random((5, 3))
+    candidates = candidate_pairs(targets, sources, 0.7)
+    result = assign_optimal(candidates)
+    assert len(numpy.unique(result.source)) == len(result.source)
+    cost = {(t, s): d for t, s, d in zip(*candidates)}
+    best = (0, 0.0)
+    for count in range(1, 6):
+        for chosen in itertools.permutations(range(5), count):
+            for rows in itertools.combinations(range(6), count):
+                if all((t, s) in cost for t, s in zip(rows, chosen)):
+                    total = sum(cost[pair] for pair in zip(rows, chosen))
+                    best = max(best, (count, -total))
+    assert (len(result.target), -result.distance.sum()) == pytest.approx(best)
+
+
+def test_unknown_mode_is_refused():
+    with pytest.raises(ValueError):
+        match_points_unique(numpy.zeros((1, 3)), numpy.zeros((1, 3)), 1.0, mode='fastest')
@@ -0,0 +1,63 @@
+import os
+
+import numpy
+import pytest
+
+from conftest import grid_mesh
+from vtxmatchlib.progress import Cancelled
+
+
+@pytest.fixture
+def scene(cmds, matcher):
+    points, faces = grid_mesh(8)
+    matrix = numpy.eye(4)
+    matrix[3, :3] = [0.0, 1.0, 0.0]
+    # the source rises with time, the target slides along x on its own
+    cmds.add_mesh('src', points, faces, motion=lambda time: numpy.array([0.0, 0.1 * time, 0.0]))
+    cmds.add_mesh('tgt', points + [0.0, -0.99, 0.0], faces, matrix=matrix,
+                  motion=lambda time: numpy.array([0.05 * time, 0.0, 0.0]))
+    cmds.currentTime(5)
+    matcher.bVtxList = ['src.vtx[*]']
+    matcher.aVtxList = ['tgt.vtx[0:31]']
+    return cmds, matcher
+
+
+def test_keyed_bake_follows_the_source(scene):
+    cmds, matcher = scene
+    result = matcher.bake_vertices(range(1, 5), 0.1, referenceFrame=0)
+    assert len(result.target) == 32
+    assert cmds.time == 5
+    assert [frame for _, frame in cmds.keys] == [1, 2, 3, 4]
+    assert cmds.keys[0][0] == 'tgt.vtx[0:31]'
+    # the last keyed frame is what the tweaks hold now
+    cmds.time = cmds.meshes['src'].time = cmds.meshes['tgt'].time = 4.0
+    numpy.testing.assert_allclose(cmds.meshes['tgt'].world()[result.target],
+                                  cmds.meshes['src'].world()[result.source], atol=1e-9)
+
+
+def test_geometry_cache_plays_every_frame(scene, tmp_path):
+    cmds, matcher = scene
+    cmds.meshes['tgt'].tweaks[40:] = 0.25
+    result = matcher.bake_vertices(range(1, 5), 0.1, referenceFrame=0, cacheDir=str(tmp_path))
+    assert sorted(os.listdir(tmp_path)) == ['tgtShape.mc', 'tgtShape.xml']
+    assert not cmds.keys
+    assert cmds.calls['cacheFile'] == 1
+    rest = numpy.setdiff1d(numpy.arange(64), result.target)
+    for frame in range(1, 5):
+        cmds.currentTime(frame)
+        world = cmds.meshes['tgt'].world()
+        numpy.testing.assert_allclose(world[result.target], cmds.meshes['src'].world()[result.source], atol=1e-5)
+        # unmatched vertices keep their own motion and tweaks under the cache
+        points, _ = grid_mesh(8)
+        expected = points[rest] + [0.05 * frame, 0.01, 0.0] + numpy.where(rest[:, None] >= 40, 0.25, 0.0)
+        numpy.testing.assert_allclose(world[rest], expected, atol=1e-5)
+
+
+def test_cancelled_cache_bake_leaves_nothing(scene, tmp_path):
+    cmds, matcher = scene
+    matcher.progress = lambda stage, done, total: None if done < 2 else False
+    with pytest.raises(Cancelled):
+        matcher.bake_vertices(range(1, 5), 0.1, referenceFrame=0, cacheDir=str(tmp_path))
+    assert not os.listdir(tmp_path)
+    assert not cmds.calls['undo']
+    assert cmds.time == 5
@@ -0,0 +1,94 @@
+import logging
+
+import numpy
+import pytest
+
+from conftest import grid_mesh
+
+
+@pytest.fixture
+def scene(cmds, matcher):
+    rng = numpy.random.default_rng(0)
+    points, faces = grid_mesh(12)
+    matrix = numpy.eye(4)
+    matrix[3, :3] = [1.0, 2.0, 3.0]
+    cmds.add_mesh('src', points, faces)
+    cmds.add_mesh('tgt', points - [1.0, 2.0, 3.0] + rng.normal(0, 0.01, points.shape), faces, matrix=matrix)
+    matcher.blendTarget = 'vtxMatch'
+    matcher.bVtxList = ['src.vtx[*]']
+    matcher.aVtxList = ['tgt.vtx[*]']
+    return cmds, matcher
+
+
+def test_match_lands_in_target_not_mesh(scene):
+    cmds, matcher = scene
+    mesh = cmds.meshes['tgt']
+    before = mesh.world().copy()
+    result = matcher.match_vertices(0.1)
+    assert len(result.target) == len(mesh.base)
+    assert not mesh.tweaks.any()
+    numpy.testing.assert_allclose(mesh.world()[result.target], cmds.meshes['src'].world()[result.source], atol=1e-9)
+    # the weight dials the match in
+    mesh.blendTargets[0]['weight'] = 0.5
+    numpy.testing.assert_allclose(mesh.world()[result.target],
+                                  (before[result.target] + cmds.meshes['src'].world()[result.source]) / 2, atol=1e-9)
+    assert cmds.nodes['tgt_vtxMatch']['aliases'] == {'vtxMatch': 0}
+
+
+def test_rerun_keeps_weight_and_other_offsets(scene):
+    cmds, matcher = scene
+    mesh = cmds.meshes['tgt']
+    matcher.match_vertices(0.1)
+    mesh.blendTargets[0]['weight'] = 0.25
+    matcher.aVtxList = ['tgt.vtx[0:9]']
+    matcher.match_vertices(0.1)
+    assert mesh.blendTargets[0]['weight'] == 0.25
+    assert len(mesh.blendTargets[0]['ids']) == len(mesh.base)
+    matcher.blendTarget = 'second'
+    matcher.match_vertices(0.1)
+    assert sorted(mesh.blendTargets) == [0, 1]
+    assert cmds.nodes['tgt_vtxMatch']['aliases'] == {'vtxMatch': 0, 'second': 1}
+
+
+def test_uses_the_blend_shape_deforming_the_mesh(scene):
+    cmds, matcher = scene
+    points, faces = grid_mesh(12)
+    cmds.add_mesh('upstream', points, faces)
+    cmds.add_mesh('other', points, faces)
+    cmds.blendShape('upstream', name='upstreamBlend')
+    blendShape = cmds.blendShape('other', name='shared')[0]
+    cmds.deformer(blendShape, e=True, geometry='tgt')
+    # a wrap after it, driven by a mesh with its own blendShape, lists that one first
+    wrap = cmds.deformer('tgt', type='wrap')[0]
+    cmds.nodes[wrap]['targets'] = ['upstream']
+    assert cmds.ls(cmds.listHistory('tgt'), type='blendShape')[0] == 'upstreamBlend'
+    assert matcher.meshIO.blend_shape('tgt') == ('shared', 1)
+    assert matcher.meshIO.deformers_after('tgt', 'shared') == [wrap]
+
+    result = matcher.match_vertices(0.1)
+    numpy.testing.assert_allclose(cmds.meshes['tgt'].world()[result.target],
+                                  cmds.meshes['src'].world()[result.source], atol=1e-9)
+    assert not cmds.meshes['upstream'].blendTargets
+    assert not cmds.meshes['other'].blendTargets[0]['ids'].size
+
+
+@pytest.mark.parametrize('after', [None, 'tweak', 'skinCluster'])
+def test_warns_when_a_deformer_after_the_blend_shape_moves_the_offsets(scene, caplog, after):
+    cmds, matcher = scene
+    points, faces = grid_mesh(12)
+    cmds.add_mesh('skinned', points, faces)
+    # deformers of other meshes never count
+    cmds.deformer('skinned', type='skinCluster')
+    cmds.blendShape('tgt', name='tgt_vtxMatch')
+    if after is not None:
+        cmds.deformer('tgt', type=after)
+    with caplog.at_level(logging.WARNING, logger='MenuFramework.vtxMatch'):
+        matcher.match_vertices(0.1)
+    assert ('skinCluster' in caplog.text) == (after == 'skinCluster')
+
+
+def test_normals_are_refused(scene):
+    cmds, matcher = scene
+    with pytest.raises(ValueError):
+        matcher.match_vertices(0.1, copyNormals=True)
+    assert not cmds.meshes['tgt'].blendTargets
@@ -0,0 +1,53 @@
+import numpy
+import pytest
+
+
+def add_transform(cmds, name, position):
+    matrix = numpy.eye(4)
+    matrix[3, :3] = position
+    cmds.add_mesh(name, numpy.zeros((1, 3)), matrix=matrix)
+    return name
+
+
+@pytest.fixture
+def rig(cmds):
+    drivers = [add_transform(cmds, f'drv{i}', p) for i, p in enumerate([[0, 0, 0], [1, 0, 0], [5, 0, 0]])]
+    driven = [add_transform(cmds, f'jnt{i}', p) for i, p in enumerate([[0.1, 0, 0], [0.9, 0, 0], [0.2, 0, 0],
+                                                                         [9, 0, 0]])]
+    return drivers, driven
+
+
+def test_parent_constraint_to_nearest(cmds, matcher, rig):
+    matcher.bVtxList, matcher.aVtxList = rig
+    result = matcher.constrain_closest(1.0)
+    assert cmds.constraints == [('drv0', 'jnt0'), ('drv1', 'jnt1'), ('drv0', 'jnt2')]
+    assert result.target.tolist() == [0, 1, 2]
+    assert cmds.undoChunks == 1
+
+
+def test_offset_parent_matrix_wiring(cmds, matcher, rig):
+    matcher.bVtxList, matcher.aVtxList = rig
+    matcher.constrain_closest(1.0, mode='offsetParentMatrix')
+    assert not cmds.constraints
+    assert ('drv1.worldMatrix[0]', 'jnt1_followMatrix.matrixIn[1]') in cmds.connections
+    assert ('jnt1_followMatrix.matrixSum', 'jnt1.offsetParentMatrix') in cmds.connections
+    # local @ offset @ driver world (no parent here) keeps the driven where it is
+    offset = cmds.nodes['jnt1_followMatrix']['matrixIn[0]']
+    world = cmds.meshes['jnt1'].matrix
+    numpy.testing.assert_allclose(world @ offset @ cmds.meshes['drv1'].matrix, world, atol=1e-12)
+
+
+def test_no_transform_drives_itself_or_a_loop(cmds, matcher):
+    names = [add_transform(cmds, f'n{i}', p) for i, p in enumerate([[0, 0, 0], [1, 0, 0], [0.5, 0.8, 0],
+                                                                     [3, 0, 0], [3.5, 0, 0]])]
+    matcher.bVtxList = names
+    matcher.aVtxList = names
+    matcher.constrain_closest(2.0)
+    driverOf = {driven: driver for driver, driven in cmds.constraints}
+    assert driverOf and all(driver != driven for driven, driver in driverOf.items())
+    for node in driverOf:
+        seen = set()
+        while node in driverOf:
+            assert node not in seen
+            seen.add(node)
+            node = driverOf[node]
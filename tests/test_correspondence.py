@@ -0,0 +1,107 @@
+import numpy
+import pytest
+
+from conftest import grid_mesh
+from vtxmatchlib.correspondence import apply_map, load_map
+
+
+@pytest.fixture
+def scene(cmds, matcher):
+    rng = numpy.random.default_rng(0)
+    points, faces = grid_mesh(8)
+    cmds.add_mesh('src', points + rng.normal(0, 0.02, points.shape), faces)
+    for name in ('tgtA', 'tgtB'):
+        cmds.add_mesh(name, points + rng.normal(0, 0.1, points.shape), faces)
+    matcher.bVtxList = ['src.vtx[*]']
+    # a transform on the target side has no vertex to map
+    cmds.add_mesh('locator', numpy.array([[0.0, 0.0, 0.0]]))
+    matcher.aVtxList = ['tgtA.vtx[*]', 'tgtB.vtx[0:31]', 'locator']
+    return cmds, matcher
+
+
+def targets(cmds):
+    return {name: cmds.meshes[name].world().copy() for name in ('tgtA', 'tgtB')}
+
+
+def test_saved_map_reapplies_the_match(scene, tmp_path):
+    cmds, matcher = scene
+    path = str(tmp_path / 'shot.npz')
+    result = matcher.pair(0.3)
+    stored = matcher.export_map(path, result)
+    loaded = load_map(path)
+    for name in stored._fields:
+        numpy.testing.assert_array_equal(getattr(loaded, name), getattr(stored, name))
+    assert loaded.targetMeshes.tolist() == ['tgtA', 'tgtB'] and loaded.sourceMeshes.tolist() == ['src']
+    # the locator (row 96) is dropped from the map
+    assert len(loaded.targetVertex) == numpy.count_nonzero(result.target < 96) < len(result.target)
+
+    before = targets(cmds)
+    apply_map(loaded, matcher.meshIO)
+    assert cmds.undoChunks == 1
+    source = cmds.meshes['src'].world()
+    for i, name in enumerate(('tgtA', 'tgtB')):
+        rows = loaded.targetMesh == i
+        expected = before[name].copy()
+        expected[loaded.targetVertex[rows]] = source[loaded.sourceVertex[rows]]
+        numpy.testing.assert_allclose(cmds.meshes[name].world(), expected)
+    # the map did what the match itself would have done
+    applied = targets(cmds)
+    matcher.match_vertices(0.3)
+    for name, points in targets(cmds).items():
+        numpy.testing.assert_allclose(points, applied[name])
+
+
+def test_map_applies_to_renamed_meshes(scene, tmp_path):
+    cmds, matcher = scene
+    path = str(tmp_path / 'shot.npz')
+    correspondence = matcher.export_map(path, matcher.pair(0.3))
+    for name in ('src', 'tgtA', 'tgtB'):
+        mesh = cmds.meshes[name]
+        cmds.add_mesh(f'shot2_{name}', mesh.world() + 5.0, mesh.faces)
+    before = targets(cmds)
+    applied = apply_map(load_map(path), matcher.meshIO, targetMeshes=['shot2_tgtA', 'shot2_tgtB'],
+                        sourceMeshes=['shot2_src'])
+    assert applied.targetMeshes.tolist() == ['shot2_tgtA', 'shot2_tgtB']
+    rows = correspondence.targetMesh == 0
+    numpy.testing.assert_allclose(cmds.meshes['shot2_tgtA'].world()[correspondence.targetVertex[rows]],
+                                  cmds.meshes['shot2_src'].world()[correspondence.sourceVertex[rows]])
+    for name, points in targets(cmds).items():
+        numpy.testing.assert_array_equal(points, before[name])
+    with pytest.raises(ValueError):
+        apply_map(correspondence, matcher.meshIO, targetMeshes=['shot2_tgtA'])
+
+
+def test_map_is_refused_when_the_topology_changed(scene, tmp_path):
+    cmds, matcher = scene
+    path = str(tmp_path / 'shot.npz')
+    matcher.export_map(path, matcher.pair(0.3))
+    mesh = cmds.meshes['src']
+    cmds.add_mesh('src', mesh.world(), mesh.faces[:-1])
+    before = targets(cmds)
+    with pytest.raises(ValueError, match='src'):
+        apply_map(load_map(path), matcher.meshIO)
+    assert cmds.undoChunks == 0
+    for name, points in targets(cmds).items():
+        numpy.testing.assert_array_equal(points, before[name])
+
+
+def test_foreign_file_is_refused(tmp_path):
+    path = str(tmp_path / 'other.npz')
+    numpy.savez(path, targetMeshes=numpy.array(['a']))
+    with pytest.raises(ValueError):
+        load_map(path)
+
+
+def test_mirrored_map_reflects_the_source(cmds, matcher, tmp_path):
+    points, faces = grid_mesh(6)
+    points = points + [0.5, 0.0, 0.0]
+    cmds.add_mesh('left', points, faces)
+    cmds.add_mesh('right', points * [-1.0, 1.0, 1.0] + 0.01, faces)
+    matcher.bVtxList, matcher.aVtxList = ['left.vtx[*]'], ['right.vtx[*]']
+    path = str(tmp_path / 'mirror.npz')
+    correspondence = matcher.export_map(path, matcher.pair(0.1, mirror='x'), mirror='x')
+    assert len(correspondence.targetVertex) == 36
+    apply_map(load_map(path), matcher.meshIO)
+    reflected = points * [-1.0, 1.0, 1.0]
+    numpy.testing.assert_allclose(cmds.meshes['right'].world()[correspondence.targetVertex],
+                                  reflected[correspondence.sourceVertex])
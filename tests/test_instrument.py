@@ -0,0 +1,67 @@
+import logging
+import pstats
+import tracemalloc
+
+import numpy
+import pytest
+
+from conftest import grid_mesh
+from vtxmatchlib import instrument as instrumentModule
+from vtxmatchlib.instrument import CAN_TRACE_MEMORY, Instrument
+
+
+@pytest.fixture
+def scene(cmds, matcher):
+    points, faces = grid_mesh(10)
+    cmds.add_mesh('src', points, faces)
+    cmds.add_mesh('tgt', points + 0.01, faces)
+    matcher.bVtxList = ['src.vtx[*]']
+    matcher.aVtxList = ['tgt.vtx[*]']
+    return cmds, matcher
+
+
+def test_report_counts_stages_commands_and_pairs(scene, caplog):
+    cmds, matcher = scene
+    matcher.instrument = Instrument()
+    before = cmds.calls.copy()
+    with matcher.instrument.session(matcher.meshIO):
+        matcher.match_vertices(0.1, copyNormals=True)
+    report = matcher.instrument.report()
+    assert set(report['stages']) == {'fetch', 'search', 'write', 'normals'}
+    assert report['counters'] == {'pairs': 100}
+    # every maya.cmds command the run issued is counted (OpenMaya calls are not commands)
+    issued = {name: count for name, count in (cmds.calls - before).items() if '.' not in name}
+    assert report['commands'] == issued
+    assert sum(entry['commands'] for entry in report['stages'].values()) <= sum(report['commands'].values())
+    assert all(entry['peak_mb'] is None for entry in report['stages'].values())
+    assert matcher.meshIO.cmds is cmds
+    with caplog.at_level(logging.INFO, logger='MenuFramework.vtxMatch'):
+        matcher.instrument.log()
+    assert 'search: ' in caplog.text and 'total: ' in caplog.text
+
+
+@pytest.mark.skipif(not CAN_TRACE_MEMORY, reason='tracemalloc.reset_peak needs Python 3.9')
+def test_trace_records_a_peak_per_stage(scene):
+    _, matcher = scene
+    matcher.instrument = Instrument(trace=True)
+    with matcher.instrument.session(matcher.meshIO):
+        matcher.match_vertices(0.1)
+    assert all(entry['peak_mb'] >= 0.0 for entry in matcher.instrument.report()['stages'].values())
+    assert not tracemalloc.is_tracing()
+
+
+def test_trace_is_refused_without_reset_peak(monkeypatch):
+    monkeypatch.setattr(instrumentModule, 'CAN_TRACE_MEMORY', False)
+    with pytest.raises(ValueError):
+        Instrument(trace=True)
+    Instrument()
+
+
+def test_profile_dumps_stats(scene, tmp_path):
+    _, matcher = scene
+    path = str(tmp_path / 'run.prof')
+    matcher.instrument = Instrument(profile=path)
+    with matcher.instrument.session(matcher.meshIO):
+        matcher.match_vertices(0.1)
+    assert any(name == 'match_vertices' for _, _, name in pstats.Stats(path).stats)
+    assert numpy.isfinite(matcher.instrument.report()['seconds'])
@@ -0,0 +1,191 @@
+import logging
+import time
+
+import numpy
+import pytest
+
+from conftest import grid_mesh
+from vtxmatchlib.core import match_points
+from vtxmatchlib.matcher import INDEX_CACHE_SIZE
+from vtxmatchlib.progress import Cancelled
+from vtxmatchlib.spatial import KDTree
+
+
+@pytest.fixture
+def scene(cmds, matcher):
+    rng = numpy.random.default_rng(0)
+    points, faces = grid_mesh(20)
+    cmds.add_mesh('src', points + rng.normal(0, 0.02, points.shape), faces, normals=rng.normal(size=points.shape))
+    cmds.add_mesh('tgt', points + rng.normal(0, 0.1, points.shape), faces, normals=rng.normal(size=points.shape))
+    matcher.bVtxList = ['src.vtx[*]']
+    matcher.aVtxList = ['tgt.vtx[*]']
+    return cmds, matcher
+
+
+def test_match_vertices_snaps_like_match_points(scene):
+    cmds, matcher = scene
+    before = cmds.meshes['tgt'].world().copy()
+    expected = match_points(before, cmds.meshes['src'].world(), 0.25)
+    result = matcher.match_vertices(0.25)
+    for column, expectedColumn in zip(result, expected):
+        numpy.testing.assert_array_equal(column, expectedColumn)
+    world = cmds.meshes['tgt'].world()
+    numpy.testing.assert_allclose(world[result.target], cmds.meshes['src'].world()[result.source], atol=1e-12)
+    untouched = numpy.setdiff1d(numpy.arange(len(before)), result.target)
+    numpy.testing.assert_array_equal(world[untouched], before[untouched])
+    assert cmds.undoChunks == 1
+
+
+def test_chunks_give_the_same_result(scene, cmds):
+    _, matcher = scene
+    whole = matcher.pair(0.25)
+    calls = []
+    matcher.chunkSize = 37
+    matcher.progress = lambda *args: calls.append(args)
+    chunked = matcher.match_vertices(0.25, copyNormals=True)
+    for column, wholeColumn in zip(chunked, whole):
+        numpy.testing.assert_array_equal(column, wholeColumn)
+    assert calls[-1] == ('normals', len(whole.target), len(whole.target))
+    numpy.testing.assert_allclose(cmds.meshes['tgt'].normals[whole.target],
+                                  cmds.meshes['src'].normals[whole.source])
+
+
+@pytest.mark.parametrize('stage', ['search', 'write', 'normals'])
+def test_cancel_rolls_everything_back(scene, stage):
+    cmds, matcher = scene
+    mesh = cmds.meshes['tgt']
+    world, normals = mesh.world().copy(), mesh.normals.copy()
+    seen = []
+    matcher.chunkSize = 50
+    matcher.progress = lambda name, done, total: seen.append(name) or (None if seen.count(stage) < 2 else False)
+    with pytest.raises(Cancelled):
+        matcher.match_vertices(0.25, copyNormals=True)
+    numpy.testing.assert_array_equal(mesh.world(), world)
+    numpy.testing.assert_array_equal(mesh.normals, normals)
+    assert not mesh.locked.any()
+
+
+@pytest.mark.parametrize('mode', ['greedy', 'optimal'])
+def test_unique_uses_every_source_once(scene, mode):
+    cmds, matcher = scene
+    # a denser target: two targets near every source
+    cmds.add_mesh('dense', numpy.repeat(cmds.meshes['src'].world(), 2, axis=0) + 0.01)
+    matcher.aVtxList = ['dense.vtx[*]']
+    result = matcher.pair(0.25, unique=mode)
+    assert len(numpy.unique(result.source)) == len(result.source) == len(cmds.meshes['src'].base)
+    assert (result.distance < 0.25).all()
+
+
+def test_mirror_matches_the_reflected_source(cmds, matcher):
+    points, faces = grid_mesh(6)
+    cmds.add_mesh('right', points + [0.5, 0.0, 0.0], faces)
+    cmds.add_mesh('left', -(points + [0.5, 0.0, 0.0]) * [1, -1, -1] + 0.01, faces)
+    matcher.bVtxList = ['right.vtx[*]']
+    matcher.aVtxList = ['left.vtx[*]']
+    result = matcher.match_vertices(0.1, mirror='x')
+    assert len(result.target) == 36
+    mirrored = cmds.meshes['right'].world() * [-1, 1, 1]
+    numpy.testing.assert_allclose(cmds.meshes['left'].world()[result.target], mirrored[result.source])
+
+
+def test_same_topology_pairs_by_id_without_an_index(scene):
+    cmds, matcher = scene
+    points, faces = grid_mesh(20)
+    cmds.add_mesh('copy', points + 5.0, faces)
+    matcher.aVtxList = ['copy.vtx[*]']
+    result = matcher.pair(0.25, sameTopology=True)
+    numpy.testing.assert_array_equal(result.target, numpy.arange(400))
+    numpy.testing.assert_array_equal(result.source, numpy.arange(400))
+    assert not matcher._indexCache
+
+
+@pytest.mark.parametrize('edit', ['reordered', 'rewired'])
+def test_same_counts_alone_do_not_pair_by_id(scene, edit):
+    cmds, matcher = scene
+    points, faces = grid_mesh(20)
+    if edit == 'reordered':
+        # Mirror Geometry or a reorder: the same shape with its vertex ids shuffled
+        order = numpy.random.default_rng(1).permutation(len(points))
+        points, faces = points[order], numpy.argsort(order)[faces]
+    else:
+        # an unrelated mesh that happens to have as many vertices and faces
+        faces = numpy.roll(faces, 1, axis=0)[:, ::-1]
+    cmds.add_mesh('other', points + 5.0, faces)
+    matcher.aVtxList = ['other.vtx[*]']
+    assert not len(matcher.topology_pairs()[0])
+    assert not len(matcher.pair(0.25, sameTopology=True).target)
+
+
+def test_rematch_equals_a_full_match(scene):
+    cmds, matcher = scene
+    matcher.match_vertices(0.25)
+    cmds.meshes['src'].tweaks[:60] += [0.0, 0.08, 0.0]
+    full = match_points(cmds.meshes['tgt'].world(), cmds.meshes['src'].world(), 0.25)
+    rematched = matcher.rematch_vertices(0.25)
+    numpy.testing.assert_array_equal(rematched.target, full.target)
+    numpy.testing.assert_array_equal(rematched.source, full.source)
+    numpy.testing.assert_allclose(rematched.distance, full.distance, atol=1e-12)
+
+
+def test_edited_source_normals_are_copied_without_any_vertex_moving(scene):
+    cmds, matcher = scene
+    result = matcher.match_vertices(0.25, copyNormals=True)
+    tree = matcher.source_index(0.25, 'kdtree')
+    # a soften edge or lock normal: the normals turn, the positions stay
+    cmds.meshes['src'].normals[:] = [0.0, 0.0, 1.0]
+    assert matcher.match_vertices(0.25, copyNormals=True).target.tolist() == result.target.tolist()
+    assert matcher.source_index(0.25, 'kdtree') is tree
+    numpy.testing.assert_array_equal(cmds.meshes['tgt'].normals[result.target], [[0.0, 0.0, 1.0]] * len(result.target))
+
+
+def test_rematch_finds_turned_source_normals(scene):
+    cmds, matcher = scene
+    result = matcher.match_vertices(0.25, copyNormals=True)
+    source = cmds.meshes['src']
+    source.normals[result.source[:5]] = [1.0, 0.0, 0.0]
+    matcher.rematch_vertices(0.25, copyNormals=True)
+    numpy.testing.assert_allclose(cmds.meshes['tgt'].normals[result.target], source.normals[result.source])
+
+
+def test_one_tree_serves_every_threshold_and_the_cache_is_bounded(scene):
+    _, matcher = scene
+    matcher.updated_xform()
+    tree = matcher.source_index(0.2, 'kdtree')
+    assert matcher.source_index(5.0, 'auto') is tree
+    assert isinstance(tree, KDTree)
+    for threshold in numpy.linspace(0.05, 0.3, 2 * INDEX_CACHE_SIZE):
+        matcher.source_index(float(threshold), 'grid')
+    assert len(matcher._indexCache) == INDEX_CACHE_SIZE
+
+
+def test_async_match_writes_and_reports(scene):
+    cmds, matcher = scene
+    deferred, done = [], []
+    matcher.match_vertices_async(0.25, defer=deferred.append, done=done.append).result()
+    _wait_for(deferred)
+    deferred.pop()()
+    assert len(done[0].target)
+    numpy.testing.assert_allclose(cmds.meshes['tgt'].world()[done[0].target],
+                                  cmds.meshes['src'].world()[done[0].source], atol=1e-12)
+
+
+def test_async_failure_is_logged_and_done_still_called(scene, caplog):
+    _, matcher = scene
+    deferred, done = [], []
+    future = matcher.match_vertices_async(0.25, engine='octree', defer=deferred.append, done=done.append)
+    with pytest.raises(ValueError):
+        future.result()
+    _wait_for(deferred)
+    with caplog.at_level(logging.ERROR, logger='MenuFramework.vtxMatch'):
+        deferred.pop()()
+    assert done == [None]
+    assert 'background vtxMatch failed' in caplog.text
+
+
+def _wait_for(deferred):
+    # the write is handed to defer from the worker thread's done callback
+    for _ in range(200):
+        if deferred:
+            return
+        time.sleep(0.01)
+    raise AssertionError('the search never handed its write over')
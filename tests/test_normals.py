@@ -0,0 +1,89 @@
+import numpy
+import pytest
+
+from conftest import grid_mesh
+from vtxmatchlib.progress import Cancelled
+
+
+def normal_copy_commands(cmds, meshIO, side):
+    for name in ('a', 'b'):
+        points, faces = grid_mesh(side)
+        cmds.add_mesh(f'{name}{side}', points, faces)
+    items = [f'a{side}.vtx[*]', f'b{side}.vtx[*]']
+    normals = numpy.random.default_rng(side).normal(size=(2 * side * side, 3))
+    before = sum(cmds.calls.values())
+    meshIO.scatter_normals(items, normals)
+    commands = sum(cmds.calls.values()) - before
+    numpy.testing.assert_allclose(meshIO.gather_normals(items), normals)
+    return commands
+
+
+def test_normal_copy_commands_do_not_grow_with_the_vertex_count(cmds, meshIO):
+    # the first write also loads the plug-in
+    normal_copy_commands(cmds, meshIO, 3)
+    small = normal_copy_commands(cmds, meshIO, 4)
+    assert normal_copy_commands(cmds, meshIO, 60) == small
+    # a fixed handful per mesh, one of them the lock query
+    assert small <= 2 * 8
+    assert cmds.calls['polyNormalPerVertex'] == 6
+
+
+def normal_state(mesh):
+    return mesh.normals.copy(), mesh.locked.copy(), dict(mesh.splitNormals)
+
+
+def assert_same_normals(mesh, state):
+    normals, locked, split = state
+    numpy.testing.assert_array_equal(mesh.locked, locked)
+    numpy.testing.assert_allclose(mesh.normals, normals)
+    assert mesh.splitNormals.keys() == split.keys()
+    numpy.testing.assert_allclose([mesh.splitNormals[key] for key in split], list(split.values()))
+
+
+@pytest.fixture
+def shaded(cmds, meshIO):
+    '''A grid with locked, split (locked per face) and unlocked vertex normals.'''
+    points, faces = grid_mesh(5)
+    rng = numpy.random.default_rng(0)
+    cmds.add_mesh('shaded', points, faces, normals=rng.normal(size=points.shape))
+    fn = meshIO._mesh_fn('shaded')
+    fn.setVertexNormals(rng.normal(size=(5, 3)).tolist(), [0, 1, 2, 3, 4], 4)
+    # vertex 6 sits on four faces, vertex 12 on four more: give each face its own normal
+    faceVertices = [(f, v) for f, face in enumerate(cmds.meshes['shaded'].faces) for v in face if v in (6, 12)]
+    fn.setFaceVertexNormals(rng.normal(size=(len(faceVertices), 3)).tolist(), *zip(*faceVertices), 4)
+    mesh = cmds.meshes['shaded']
+    assert mesh.locked[[0, 6, 12]].all() and not mesh.locked[[5, 7, 24]].any()
+    assert len(mesh.splitNormals) == 8
+    return mesh
+
+
+def test_undo_restores_locked_split_and_unlocked_normals(cmds, meshIO, shaded):
+    before = normal_state(shaded)
+    with meshIO.undo_chunk('matchVertexs'):
+        meshIO.set_normals('shaded', numpy.arange(25), numpy.tile([0.0, 0.0, 1.0], (25, 1)))
+    assert shaded.locked.all() and not shaded.splitNormals
+    cmds.undo()
+    assert_same_normals(shaded, before)
+
+
+def test_keep_face_normals_leaves_split_vertices_and_undoes(cmds, meshIO, shaded):
+    before = normal_state(shaded)
+    with meshIO.undo_chunk('matchVertexs'):
+        meshIO.set_normals('shaded', numpy.arange(25), numpy.tile([0.0, 0.0, 1.0], (25, 1)), keepFaceNormals=True)
+    assert shaded.splitNormals == before[2]
+    assert shaded.locked.all()
+    cmds.undo()
+    assert_same_normals(shaded, before)
+
+
+def test_cancelled_normal_copy_goes_back_through_the_edits(cmds, matcher, shaded):
+    points, faces = grid_mesh(5)
+    cmds.add_mesh('src', points, faces, normals=numpy.tile([1.0, 0.0, 0.0], (25, 1)))
+    matcher.bVtxList, matcher.aVtxList = ['src.vtx[*]'], ['shaded.vtx[*]']
+    before = normal_state(shaded)
+    matcher.chunkSize = 10
+    matcher.progress = lambda stage, done, total: False if stage == 'normals' and done > 10 else None
+    with pytest.raises(Cancelled):
+        matcher.match_vertices(0.1, copyNormals=True)
+    assert cmds.calls['MFnMesh.setFaceVertexNormals'] and cmds.calls['MFnMesh.unlockVertexNormals']
+    assert_same_normals(shaded, before)
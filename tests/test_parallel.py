@@ -0,0 +1,64 @@
+import os
+
+import numpy
+import pytest
+
+from conftest import grid_mesh
+from vtxmatchlib import parallel
+from vtxmatchlib.core import match_points
+from vtxmatchlib.parallel import match_many, parallel_match_meshes
+
+
+def assert_same_result(result, expected):
+    numpy.testing.assert_array_equal(result.target, expected.target)
+    numpy.testing.assert_array_equal(result.source, expected.source)
+    numpy.testing.assert_array_equal(result.distance, expected.distance)
+
+
+@pytest.mark.parametrize('engine', ['kdtree', 'grid'])
+def test_pool_equals_match_points(engine):
+    rng = numpy.random.default_rng(0)
+    sources = rng.random((2000, 3))
+    # an empty array and slices that straddle the arrays' boundaries
+    targets = [rng.random((900, 3)), numpy.empty((0, 3)), rng.random((1300, 3))]
+    results = match_many(targets, sources, 0.04, engine, processes=2, chunkSize=500)
+    assert len(results) == len(targets)
+    for result, points in zip(results, targets):
+        assert_same_result(result, match_points(points, sources, 0.04, engine))
+
+
+def test_pool_is_skipped_for_one_process_or_slice(monkeypatch):
+    monkeypatch.setattr(parallel, '_publish', None)
+    rng = numpy.random.default_rng(1)
+    sources, targets = rng.random((300, 3)), rng.random((400, 3))
+    expected = match_points(targets, sources, 0.1)
+    assert_same_result(match_many([targets], sources, 0.1, processes=1, chunkSize=50)[0], expected)
+    assert_same_result(match_many([targets], sources, 0.1, processes=4, chunkSize=400)[0], expected)
+
+
+def test_parallel_match_meshes_snaps_every_mesh(cmds, meshIO):
+    rng = numpy.random.default_rng(2)
+    points, faces = grid_mesh(30)
+    cmds.add_mesh('src', points, faces)
+    for name in ('lod0', 'lod1'):
+        cmds.add_mesh(name, points + rng.normal(0, 0.2, points.shape), faces)
+    before = {name: cmds.meshes[name].world().copy() for name in ('lod0', 'lod1')}
+    results = parallel_match_meshes(['src.vtx[*]'], ['lod0', 'lod1'], 0.3, processes=2, chunkSize=400,
+                                    meshIO=meshIO)
+    for name, start in before.items():
+        expected = match_points(start, points, 0.3)
+        assert_same_result(results[name], expected)
+        numpy.testing.assert_allclose(cmds.meshes[name].world()[expected.target], points[expected.source])
+    cmds.undo()
+    for name, start in before.items():
+        numpy.testing.assert_allclose(cmds.meshes[name].world(), start)
+
+
+@pytest.mark.parametrize('executable, expected', [
+    (os.path.join('maya', 'bin', 'maya'), os.path.join('maya', 'bin', 'mayapy')),
+    (os.path.join('maya', 'bin', 'mayapy'), None),
+])
+def test_gui_session_spawns_mayapy(monkeypatch, executable, expected):
+    monkeypatch.setattr(parallel.sys, 'executable', executable)
+    monkeypatch.setattr(parallel.sys, 'platform', 'linux')
+    assert parallel._python_executable() == expected
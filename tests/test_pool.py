@@ -0,0 +1,33 @@
+import numpy
+
+from conftest import grid_mesh
+from vtxmatchlib.batch import expand_items, run
+
+
+def test_meshes_expand_to_their_vertices(cmds, meshIO):
+    points, faces = grid_mesh(3)
+    cmds.add_mesh('pieceA', points, faces)
+    items = meshIO.expand_meshes(['pieceA', 'locator1', 'pieceA.vtx[2]', 'pieceA.f[0]'])
+    assert items == ['pieceA.vtx[*]', 'locator1', 'pieceA.vtx[2]', 'pieceA.f[0]']
+
+
+def test_pairs_in_a_pool_of_meshes_resolve_to_their_piece(cmds, meshIO):
+    rng = numpy.random.default_rng(0)
+    points, faces = grid_mesh(5)
+    pieces = {'pieceA': points, 'pieceB': points + [10.0, 0.0, 0.0], 'pieceC': points + [0.0, 0.0, 10.0]}
+    for name, piecePoints in pieces.items():
+        cmds.add_mesh(name, piecePoints, faces)
+    # one target spanning the first two pieces, out of order
+    target = numpy.concatenate([pieces['pieceB'], pieces['pieceA']])
+    cmds.add_mesh('tgt', target + rng.normal(0, 0.05, target.shape))
+
+    result = run(['pieceA', 'pieceB', 'pieceC'], ['tgt'], 0.3, meshIO=meshIO)
+    assert cmds.undoChunks == 1
+    numpy.testing.assert_array_equal(result.target, numpy.arange(50))
+    sources = meshIO.selection(expand_items(meshIO, ['pieceA', 'pieceB', 'pieceC']))
+    assert len(sources) == 75
+    owner, vertex = sources.owners(result.source)
+    assert [sources.meshes[i] for i in owner[[0, 24, 25, 49]]] == ['pieceB', 'pieceB', 'pieceA', 'pieceA']
+    numpy.testing.assert_array_equal(vertex, numpy.tile(numpy.arange(25), 2))
+    numpy.testing.assert_allclose(cmds.meshes['tgt'].world(),
+                                  [pieces[sources.meshes[i]][v] for i, v in zip(owner, vertex)])
@@ -0,0 +1,57 @@
+import numpy
+
+from conftest import grid_mesh
+from vtxmatchlib.mayaio import VertexSelection
+
+
+COUNTS = {'|grp|ns:body': 6, 'head': 4}
+
+
+def test_from_items_reads_compact_ranges_in_selection_order():
+    items = ['head.vtx[3]', '|grp|ns:body.vtx[2:4]', 'locator1', 'head.vtx[*]', '|grp|ns:body.vtx[0]', 'null1']
+    selection = VertexSelection.from_items(items, COUNTS.get)
+    assert selection.meshes == ['head', '|grp|ns:body'] and selection.nodes == ['locator1', 'null1']
+    numpy.testing.assert_array_equal(selection.mesh, [0, 1, 1, 1, -1, 0, 0, 0, 0, 1, -1])
+    numpy.testing.assert_array_equal(selection.ids, [3, 2, 3, 4, 0, 0, 1, 2, 3, 0, 1])
+    assert selection.names() == ['head.vtx[3]', '|grp|ns:body.vtx[2]', '|grp|ns:body.vtx[3]', '|grp|ns:body.vtx[4]',
+                                 'locator1', 'head.vtx[0]', 'head.vtx[1]', 'head.vtx[2]', 'head.vtx[3]',
+                                 '|grp|ns:body.vtx[0]', 'null1']
+
+
+def test_flattened_and_compact_items_give_the_same_selection():
+    compact = VertexSelection.from_items(['head.vtx[0:3]', '|grp|ns:body.vtx[*]'], COUNTS.get)
+    flat = VertexSelection.from_items(compact.names())
+    numpy.testing.assert_array_equal(flat.mesh, compact.mesh)
+    numpy.testing.assert_array_equal(flat.ids, compact.ids)
+    assert len(flat) == 10
+
+
+def test_empty_items_give_an_empty_selection():
+    selection = VertexSelection.from_items([])
+    meshes, nodes = selection.groups()
+    assert len(selection) == 0 and meshes == {} and len(nodes) == 0
+
+
+def test_groups_and_take_keep_the_selection_order():
+    selection = VertexSelection.from_items(['head.vtx[2:3]', 'null1', '|grp|ns:body.vtx[5]', 'head.vtx[0]'],
+                                           COUNTS.get)
+    meshes, nodes = selection.groups()
+    assert list(meshes) == ['head', '|grp|ns:body']
+    numpy.testing.assert_array_equal(meshes['head'][0], [0, 1, 4])
+    numpy.testing.assert_array_equal(meshes['head'][1], [2, 3, 0])
+    numpy.testing.assert_array_equal(meshes['|grp|ns:body'][0], [3])
+    numpy.testing.assert_array_equal(nodes, [2])
+    taken = selection.take(numpy.array([4, 2, 0]))
+    assert taken.names() == ['head.vtx[0]', 'null1', 'head.vtx[2]']
+
+
+def test_gather_reads_a_mixed_selection_like_per_vertex_queries(cmds, meshIO):
+    rng = numpy.random.default_rng(0)
+    points, faces = grid_mesh(5)
+    cmds.add_mesh('a', points + rng.normal(0, 0.1, points.shape), faces)
+    cmds.add_mesh('b', points + 3.0, faces)
+    cmds.add_mesh('null1', numpy.array([[1.0, 2.0, 3.0]]))
+    items = ['b.vtx[20:24]', 'a.vtx[3]', 'null1', 'a.vtx[*]', 'b.vtx[0]']
+    expected = [cmds.xform(name, q=True, ws=True, t=True)
+                for name in VertexSelection.from_items(items, meshIO.vertex_count).names()]
+    numpy.testing.assert_allclose(meshIO.gather(items), expected)
@@ -0,0 +1,89 @@
+import numpy
+import pytest
+
+from conftest import grid_mesh
+from vtxmatchlib.core import match_points
+from vtxmatchlib.soft import FALLOFFS, blended_values, falloff_weight, soft_match
+
+
+@pytest.mark.parametrize('falloff', FALLOFFS)
+def test_falloff_runs_from_one_to_about_zero(falloff):
+    weight = falloff_weight(numpy.array([0.0, 0.5, 1.0, 2.0]), 1.0, falloff)
+    assert weight[0] == 1.0
+    assert 1.0 > weight[1] > weight[2]
+    assert weight[2] == pytest.approx(0.0, abs=0.02)
+    assert weight[3] == weight[2]
+
+
+def test_unknown_falloff_is_refused():
+    with pytest.raises(ValueError):
+        soft_match(numpy.zeros((1, 3)), numpy.zeros((1, 3)), 1.0, falloff='cubic')
+
+
+@pytest.mark.parametrize('engine', ['kdtree', 'grid'])
+@pytest.mark.parametrize('falloff', FALLOFFS)
+def test_single_source_weight_is_the_falloff(engine, falloff):
+    rng = numpy.random.default_rng(0)
+    sources, targets = rng.random((500, 3)), rng.random((400, 3))
+    expected = match_points(targets, sources, 0.1, engine)
+    result = soft_match(targets, sources, 0.1, falloff, engine=engine)
+    numpy.testing.assert_array_equal(result.target, expected.target)
+    numpy.testing.assert_array_equal(result.source[:, 0], expected.source)
+    numpy.testing.assert_allclose(result.weight[:, 0], falloff_weight(expected.distance, 0.1, falloff))
+
+
+def brute_force_knn(targets, sources, threshold, k):
+    distance = numpy.linalg.norm(targets[:, None, :] - sources[None, :, :], axis=-1)
+    order = numpy.argsort(distance, axis=1, kind='stable')[:, :k]
+    nearest = numpy.take_along_axis(distance, order, axis=1)
+    return order, nearest, nearest < threshold
+
+
+@pytest.mark.parametrize('engine', ['kdtree', 'grid'])
+def test_k_nearest_blend_matches_brute_force(engine):
+    rng = numpy.random.default_rng(1)
+    sources, targets = rng.random((600, 3)), rng.random((300, 3))
+    # chunks smaller than the target count, so the slices are stitched back
+    result = soft_match(targets, sources, 0.15, 'smoothstep', k=4, engine=engine, chunkSize=70)
+    order, nearest, inside = brute_force_knn(targets, sources, 0.15, 4)
+    numpy.testing.assert_array_equal(result.target, numpy.flatnonzero(inside[:, 0]))
+    order, nearest, inside = order[result.target], nearest[result.target], inside[result.target]
+    assert not inside.all() and inside.any(axis=1).all()
+    numpy.testing.assert_array_equal(result.source[inside], order[inside])
+    inverse = numpy.where(inside, 1.0 / numpy.where(inside, nearest, 1.0) ** 2, 0.0)
+    expected = inverse / inverse.sum(axis=1, keepdims=True) * falloff_weight(nearest[:, :1], 0.15, 'smoothstep')
+    numpy.testing.assert_allclose(result.weight, expected)
+    numpy.testing.assert_allclose(result.weight.sum(axis=1),
+                                  falloff_weight(nearest[:, 0], 0.15, 'smoothstep'))
+
+
+def test_source_on_the_target_takes_the_whole_blend():
+    sources = numpy.array([[0.0, 0.0, 0.0], [0.1, 0.0, 0.0], [0.0, 0.1, 0.0]])
+    result = soft_match(sources[:1], sources, 0.5, k=3)
+    numpy.testing.assert_array_equal(result.weight, [[1.0, 0.0, 0.0]])
+    numpy.testing.assert_array_equal(blended_values(result, sources + 1.0, sources), [[1.0, 1.0, 1.0]])
+
+
+def test_blended_values_keep_the_rest_of_the_target():
+    rng = numpy.random.default_rng(2)
+    sources, targets = rng.random((50, 3)), rng.random((40, 3))
+    result = soft_match(targets, sources, 0.3, k=2)
+    blended = blended_values(result, sources, targets)
+    keep = 1.0 - result.weight.sum(axis=1, keepdims=True)
+    expected = targets[result.target] * keep + (result.weight[..., None] * sources[result.source]).sum(axis=1)
+    numpy.testing.assert_allclose(blended, expected)
+
+
+def test_soft_match_vertices_moves_targets_part_way_and_undoes(cmds, matcher):
+    points, faces = grid_mesh(10)
+    cmds.add_mesh('src', points, faces)
+    cmds.add_mesh('tgt', points + [0.0, 0.2, 0.0], faces)
+    matcher.bVtxList, matcher.aVtxList = ['src.vtx[*]'], ['tgt.vtx[*]']
+    before = cmds.meshes['tgt'].world().copy()
+    result = matcher.soft_match_vertices(0.8, falloff='linear')
+    assert cmds.undoChunks == 1
+    assert len(result.target) == 100
+    # 0.2 of a 0.8 threshold: three quarters of the way down
+    numpy.testing.assert_allclose(cmds.meshes['tgt'].world(), points + [0.0, 0.05, 0.0])
+    cmds.undo()
+    numpy.testing.assert_allclose(cmds.meshes['tgt'].world(), before)
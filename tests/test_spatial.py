@@ -0,0 +1,103 @@
+import numpy
+import pytest
+
+from vtxmatchlib.spatial import HashGrid, KDTree, build_index
+
+
+# lattice coordinates keep every squared distance exact, so ties and points
+# exactly on the threshold really are ties and on the threshold
+STEP = 1.0 / 16
+
+
+def lattice(count, side, seed):
+    return numpy.random.default_rng(seed).integers(0, side, (count, 3)) * STEP
+
+
+@pytest.fixture
+def points():
+    sources = lattice(1500, 24, 0)
+    # duplicated sources tie on every query
+    sources = numpy.concatenate([sources, sources[:200]])
+    targets = lattice(600, 26, 1)
+    return targets, sources
+
+
+def brute_force(targets, sources, r):
+    squared = ((targets[:, None, :] - sources[None, :, :]) ** 2).sum(axis=-1)
+    return squared, squared < r * r
+
+
+def indices(sources, r, engine):
+    if engine == 'kdtree':
+        return [KDTree(sources), KDTree(sources, leafsize=1)]
+    return [HashGrid(sources, r)]
+
+
+@pytest.mark.parametrize('engine', ['kdtree', 'grid'])
+@pytest.mark.parametrize('r', [STEP, 3 * STEP, 4 * STEP])
+def test_query_matches_brute_force(points, engine, r):
+    targets, sources = points
+    squared, inside = brute_force(targets, sources, r)
+    masked = numpy.where(inside, squared, numpy.inf)
+    # argmin takes the first of equal distances: ties go to the lowest source index
+    expected = numpy.where(inside.any(axis=1), masked.argmin(axis=1), -1)
+    for index in indices(sources, r, engine):
+        distance, nearest = index.query(targets, r)
+        numpy.testing.assert_array_equal(nearest, expected)
+        numpy.testing.assert_array_equal(distance, numpy.sqrt(masked.min(axis=1)))
+
+
+@pytest.mark.parametrize('engine', ['kdtree', 'grid'])
+@pytest.mark.parametrize('r', [STEP, 3 * STEP, 4 * STEP])
+def test_query_radius_matches_brute_force(points, engine, r):
+    targets, sources = points
+    squared, inside = brute_force(targets, sources, r)
+    target, source = numpy.nonzero(inside)
+    order = numpy.lexsort((source, squared[target, source], target))
+    for index in indices(sources, r, engine):
+        queries, found, distance = index.query_radius(targets, r)
+        numpy.testing.assert_array_equal(queries, target[order])
+        numpy.testing.assert_array_equal(found, source[order])
+        numpy.testing.assert_array_equal(distance, numpy.sqrt(squared[target, source][order]))
+
+
+@pytest.mark.parametrize('make', [KDTree, lambda points: HashGrid(points, 0.5)])
+def test_threshold_is_strict(make):
+    index = make(numpy.array([[0.0, 0.0, 0.0], [2.0, 0.0, 0.0]]))
+    targets = numpy.array([[0.5, 0.0, 0.0], [0.0, 0.4375, 0.0]])
+    distance, nearest = index.query(targets, 0.5)
+    assert nearest.tolist() == [-1, 0]
+    assert distance[0] == numpy.inf and distance[1] == 0.4375
+    queries, sources, _ = index.query_radius(targets, 0.5)
+    assert queries.tolist() == [1] and sources.tolist() == [0]
+
+
+def test_ties_go_to_the_lowest_index():
+    sources = numpy.array([[1.0, 0.0, 0.0], [-1.0, 0.0, 0.0], [0.0, 1.0, 0.0], [1.0, 0.0, 0.0]])
+    for index in (KDTree(sources), KDTree(sources, leafsize=1), HashGrid(sources, 2.0)):
+        distance, nearest = index.query(numpy.zeros((1, 3)), 2.0)
+        assert nearest.tolist() == [0] and distance.tolist() == [1.0]
+        assert index.query_radius(numpy.zeros((1, 3)), 2.0)[1].tolist() == [0, 1, 2, 3]
+
+
+def test_empty_inputs():
+    for index in (KDTree(numpy.empty((0, 3))), KDTree(numpy.ones((4, 3)))):
+        distance, nearest = index.query(numpy.empty((0, 3)), 1.0)
+        assert not len(distance) and not len(nearest)
+    distance, nearest = KDTree(numpy.empty((0, 3))).query(numpy.zeros((2, 3)), 1.0)
+    assert nearest.tolist() == [-1, -1] and numpy.isinf(distance).all()
+    assert not len(KDTree(numpy.empty((0, 3))).query_radius(numpy.zeros((2, 3)), 1.0)[0])
+
+
+def test_build_index_engines(points):
+    targets, sources = points
+    assert isinstance(build_index(sources, STEP, 'kdtree'), KDTree)
+    assert isinstance(build_index(sources, STEP, 'grid'), HashGrid)
+    # a sparse grid wins for a short range, the tree for an unbounded one
+    assert isinstance(build_index(sources, STEP, 'auto'), HashGrid)
+    assert isinstance(build_index(sources, numpy.inf, 'auto'), KDTree)
+    # with every source in reach of every target the grid refuses
+    with pytest.raises(ValueError):
+        build_index(numpy.random.default_rng(0).random((5000, 3)), 100.0, 'grid')
+    with pytest.raises(ValueError):
+        build_index(sources, STEP, 'octree')
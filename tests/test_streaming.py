@@ -0,0 +1,51 @@
+import os
+
+import numpy
+import pytest
+
+from conftest import grid_mesh
+from vtxmatchlib.core import match_points, match_points_chunked
+from vtxmatchlib.streaming import stream_match
+
+
+def assert_same_result(result, expected):
+    numpy.testing.assert_array_equal(result.target, expected.target)
+    numpy.testing.assert_array_equal(result.source, expected.source)
+    numpy.testing.assert_allclose(result.distance, expected.distance)
+
+
+@pytest.mark.parametrize('engine', ['kdtree', 'grid'])
+@pytest.mark.parametrize('spill', [False, True])
+def test_chunked_equals_match_points(tmp_path, engine, spill):
+    rng = numpy.random.default_rng(0)
+    sources, targets = rng.random((700, 3)), rng.random((1000, 3))
+    expected = match_points(targets, sources, 0.05, engine)
+    result = match_points_chunked(targets, sources, 0.05, engine, chunkSize=97,
+                                  spillDir=str(tmp_path) if spill else None)
+    assert_same_result(result, expected)
+    assert not os.listdir(tmp_path)
+
+
+@pytest.mark.parametrize('float32', [False, True])
+@pytest.mark.parametrize('spill', [False, True])
+def test_stream_match_equals_match_points_and_writes_back(cmds, meshIO, tmp_path, float32, spill):
+    rng = numpy.random.default_rng(1)
+    points, faces = grid_mesh(30)
+    cmds.add_mesh('src', points + rng.normal(0, 0.02, points.shape), faces)
+    cmds.add_mesh('tgt', points + rng.normal(0, 0.1, points.shape), faces)
+    dtype = numpy.float32 if float32 else numpy.float64
+    sources = cmds.meshes['src'].world().astype(dtype)
+    before = cmds.meshes['tgt'].world().copy()
+    expected = match_points(before.astype(dtype), sources, 0.25)
+    assert 0 < len(expected.target) < len(before)
+
+    result = stream_match('src', 'tgt', 0.25, chunkSize=64, float32=float32,
+                          spillDir=str(tmp_path) if spill else None, meshIO=meshIO)
+    assert_same_result(result, expected)
+    assert not os.listdir(tmp_path)
+    after = cmds.meshes['tgt'].world()
+    numpy.testing.assert_allclose(after[expected.target], sources[expected.source], atol=1e-6)
+    unmatched = numpy.setdiff1d(numpy.arange(len(before)), expected.target)
+    numpy.testing.assert_array_equal(after[unmatched], before[unmatched])
+    cmds.undo()
+    numpy.testing.assert_allclose(cmds.meshes['tgt'].world(), before)
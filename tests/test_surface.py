@@ -0,0 +1,78 @@
+import numpy
+import pytest
+
+from conftest import grid_mesh
+from vtxmatchlib.surface import TriangleBVH, closest_on_triangles, closest_points, interpolated_values
+
+
+def triangle_soup(count, seed):
+    rng = numpy.random.default_rng(seed)
+    vertices = rng.random((3 * count, 3))
+    # small triangles, so most leaves hold far away ones
+    vertices = vertices[::3].repeat(3, axis=0) + rng.normal(0, 0.05, vertices.shape)
+    return vertices, numpy.arange(3 * count).reshape(-1, 3)
+
+
+def brute_force(targets, vertices, triangles):
+    '''Distance to and closest point on every triangle, (N, T) and (N, T, 3).'''
+    corners = vertices[triangles]
+    shape = (len(targets), len(triangles), 3)
+    points, _ = closest_on_triangles(numpy.broadcast_to(targets[:, None, :], shape).reshape(-1, 3),
+                                     *(numpy.broadcast_to(corners[None, :, i], shape).reshape(-1, 3)
+                                       for i in range(3)))
+    points = points.reshape(shape)
+    return numpy.linalg.norm(points - targets[:, None, :], axis=-1), points
+
+
+def test_closest_on_triangles_covers_every_region():
+    a, b, c = numpy.array([[0.0, 0.0, 0.0]]), numpy.array([[1.0, 0.0, 0.0]]), numpy.array([[0.0, 1.0, 0.0]])
+    cases = {(-1.0, -1.0, 0.0): (0.0, 0.0), (2.0, -0.5, 0.0): (1.0, 0.0), (-0.5, 2.0, 0.0): (0.0, 1.0),
+             (0.5, -1.0, 0.0): (0.5, 0.0), (-1.0, 0.5, 0.0): (0.0, 0.5), (1.0, 1.0, 0.0): (0.5, 0.5),
+             (0.25, 0.25, 3.0): (0.25, 0.25)}
+    for target, expected in cases.items():
+        point, weight = closest_on_triangles(numpy.array([target]), a, b, c)
+        numpy.testing.assert_allclose(point[0], expected + (0.0,), atol=1e-12)
+        numpy.testing.assert_allclose(weight[0], (1.0 - sum(expected),) + expected, atol=1e-12)
+
+
+@pytest.mark.parametrize('leafsize', [1, 8])
+@pytest.mark.parametrize('threshold', [numpy.inf, 0.08])
+def test_closest_points_match_brute_force(leafsize, threshold):
+    vertices, triangles = triangle_soup(300, 0)
+    targets = numpy.random.default_rng(1).random((400, 3))
+    bvh = TriangleBVH(vertices, triangles, leafsize)
+    assert len(bvh) == 300
+    result = closest_points(targets, bvh, threshold)
+    distance, points = brute_force(targets, vertices, triangles)
+    nearest = distance.min(axis=1)
+    inside = numpy.flatnonzero(nearest < threshold)
+    assert 0 < len(inside) <= len(targets)
+    numpy.testing.assert_array_equal(result.target, inside)
+    numpy.testing.assert_allclose(result.distance, nearest[inside])
+    # a point on a shared edge may be reported on either triangle, but its distance is the same
+    numpy.testing.assert_allclose(distance[inside, result.triangle], nearest[inside])
+    numpy.testing.assert_allclose(result.point, points[inside, result.triangle], atol=1e-12)
+    numpy.testing.assert_allclose(interpolated_values(result, triangles, vertices), result.point, atol=1e-12)
+    numpy.testing.assert_allclose(result.weight.sum(axis=1), 1.0)
+
+
+def test_empty_surface_matches_nothing():
+    result = closest_points(numpy.zeros((5, 3)), TriangleBVH(numpy.empty((0, 3)), numpy.empty((0, 3))))
+    assert len(result.target) == 0 and result.point.shape == (0, 3)
+
+
+def test_surface_match_vertices_lands_between_source_vertices(cmds, matcher):
+    cage, cageFaces = grid_mesh(4, spacing=1.0)
+    dense, denseFaces = grid_mesh(13, spacing=0.25)
+    cmds.add_mesh('cage', cage, cageFaces)
+    cmds.add_mesh('dense', dense + [0.0, 0.1, 0.0], denseFaces)
+    # the last row of cage vertices is left out, and with it the triangles that use them
+    matcher.bVtxList, matcher.aVtxList = ['cage.vtx[0:11]'], ['dense.vtx[*]']
+    result = matcher.surface_match_vertices(0.2)
+    assert cmds.undoChunks == 1
+    onCage = numpy.flatnonzero(dense[:, 0] <= 2.0)
+    numpy.testing.assert_array_equal(result.target, onCage)
+    numpy.testing.assert_allclose(result.distance, 0.1)
+    after = cmds.meshes['dense'].world()
+    numpy.testing.assert_allclose(after[onCage], dense[onCage], atol=1e-12)
+    numpy.testing.assert_allclose(after[dense[:, 0] > 2.0, 1], 0.1)
@@ -1,7 +1,7 @@
 #!/usr/bin/env python
 '''
 Match postion and normal vertex from act vertex to ref vertex.
-Need numpy
+Need numpy and the vtxmatchlib package next to this file.
 Usage:
 import vtxMatch
 vtxMatch.main()
@@ -9,82 +9,203 @@ vtxMatch.main()
 '''
 __author__ = "Jiapei Lu"
 __email__ = "aurora.lu@gmail.com"
-__version__ = "1.0.4"
+__version__ = "1.1.0"
 
 
 import maya.cmds as cmds
-import sys
 
-try:
-    import numpy
-except ImportError as e:
-    
-    raise RuntimeError(f"\n This script requires the numpy module\n{e}")
-
-
-class PostionMatcher():
-    def __init__(self):
-        self.aVtxList = []
-        self.bVtxList = []
-        self.aVtxDic = {}
-        self.bVtxDic = {}
-
-    def updated_xform(self):
-        for vtx in self.aVtxList:
-            # vtx_t =  cmds.xform(  vtx, q = True, ws = True, t = True )
-            self.aVtxDic[vtx] = cmds.xform(vtx, q=True, ws=True, t=True)
-        for vtx in self.bVtxList:
-            # vtx_t =  cmds.xform(  vtx, q = True, ws = True, t = True )
-            self.bVtxDic[vtx] = cmds.xform(vtx, q=True, ws=True, t=True)
+from vtxmatchlib.assignment import AVAILABLE_UNIQUE_MODES, UNIQUE_MODES
+from vtxmatchlib.core import MIRROR_AXES
+from vtxmatchlib.correspondence import apply_map, load_map
+from vtxmatchlib.instrument import Instrument
+from vtxmatchlib.progress import Cancelled, ProgressWindow
+from vtxmatchlib.mayaio import CONSTRAINT_MODES
+from vtxmatchlib.soft import FALLOFFS
+from vtxmatchlib.spatial import ENGINES
+from vtxmatchlib.matcher import PostionMatcher
 
 
 lPostionMatcher = PostionMatcher()
 
 
 def getRefVertex(*args):
-    lPostionMatcher.bVtxList = cmds.ls(sl=True, fl=True)  # act vtxs
+    lPostionMatcher.bVtxList = cmds.ls(sl=True, long=True)  # vertex ranges, kept as index arrays
     print("Source Vertexs:", len(lPostionMatcher.bVtxList))
 
 
+def getRefMeshes(*args):
+    # every selected mesh object joins one source pool, e.g. separate garment pieces
+    lPostionMatcher.bVtxList = lPostionMatcher.meshIO.expand_meshes(cmds.ls(sl=True, long=True))
+    print("Source Vertexs:", len(lPostionMatcher.bVtxList), "on", len(lPostionMatcher.bVtxList.meshes), "meshes")
+
+
 def getActVerex(*args):
-    lPostionMatcher.aVtxList = cmds.ls(sl=True, fl=True)  # act vtxs
+    lPostionMatcher.aVtxList = cmds.ls(sl=True, long=True)  # vertex ranges, kept as index arrays
     print("Target Vertexs:", len(lPostionMatcher.aVtxList))
 
 
+def instrumented(run):
+    # with Log Timings on, the run's stage timings and command counts go to the vtxMatch logger
+    def wrapper(*args):
+        if not cmds.checkBox(logTimings, q=True, v=True):
+            return run(*args)
+        lPostionMatcher.instrument = Instrument()
+        try:
+            with lPostionMatcher.instrument.session(lPostionMatcher.meshIO):
+                return run(*args)
+        finally:
+            lPostionMatcher.instrument.log()
+            lPostionMatcher.instrument = None
+    return wrapper
+
+
+def blend_output(run):
+    # with To BlendShape Target on, matches land in that target and the mesh itself is left alone
+    def wrapper(*args):
+        name = cmds.textField(blendTarget, q=True, text=True)
+        lPostionMatcher.blendTarget = name if cmds.checkBox(toBlendShape, q=True, v=True) and name else None
+        if lPostionMatcher.blendTarget and cmds.checkBox(normal, q=True, v=True):
+            cmds.warning('Copy Normals edits the mesh itself, normals are left alone with To BlendShape Target')
+        return run(*args)
+    return wrapper
+
+
+def cancellable(title):
+    # runs in chunks under a progress window; Esc rolls the scene back to before the run
+    def decorator(run):
+        def wrapper(*args):
+            try:
+                with ProgressWindow(title) as lPostionMatcher.progress:
+                    return run(*args)
+            except Cancelled:
+                print('=== Cancelled ===', title)
+            finally:
+                lPostionMatcher.progress = None
+        return wrapper
+    return decorator
+
+
+@cancellable('Constrain')
+@instrumented
 def parent_constraint_closer_items(*args):
-    for objA, objB in pair_by_distance(lPostionMatcher):
-        print(objA, objB)
-        # cmds.xform( objA, a = True, ws = True, t = lPostionMatcher.bVtxDic[objB] )
-        cmds.parentConstraint(objB, objA, mo=True)
-
-
-def pair_by_distance(vList: PostionMatcher):
-    vList.updated_xform()
-    distanceRange = cmds.floatField(Threshold, q=True, v=True)
-    for objA in list(vList.aVtxDic.keys()):
-        distanctCompare = {}
-        for objB in list(vList.bVtxDic.keys()):
-            a = numpy.array(vList.aVtxDic[objA])
-            b = numpy.array(vList.bVtxDic[objB])
-            dis = numpy.linalg.norm(a - b)
-            if dis < distanceRange:
-                distanctCompare[objB] = dis
-                if len(list(distanctCompare.keys())) > 1:
-                    objB = sorted(distanctCompare, key=distanctCompare.get)[0]
-                yield objA,   objB
+    # each target transform follows its single nearest source transform
+    result = lPostionMatcher.constrain_closest(cmds.floatField(Threshold, q=True, v=True),
+                                               cmds.optionMenu(engine, q=True, v=True),
+                                               cmds.optionMenu(constrainWith, q=True, v=True))
+    print('=== Constrain Done ===', len(result.target))
+
+
+def assign_mode():
+    # 'nearest' lets several targets share one source
+    mode = cmds.optionMenu(assign, q=True, v=True)
+    return mode if mode in UNIQUE_MODES else None
 
 
+def mirror_axis():
+    # 'off' matches the source as it is
+    axis = cmds.optionMenu(mirror, q=True, v=True)
+    return axis if axis in MIRROR_AXES else None
+
+
+@blend_output
+@cancellable('Match Vertexs')
+@instrumented
 def matchVertexs(*args):
-    for objA,   objB in pair_by_distance(lPostionMatcher):
-        cmds.xform(objA, a=True, ws=True, t=lPostionMatcher.bVtxDic[objB])
-        if cmds.checkBox(normal, q=True, v=True):
-            bNormal = cmds.polyNormalPerVertex(objB, query=True, xyz=True)
-            cmds.polyNormalPerVertex(objA, xyz=(
-                bNormal[0], bNormal[1], bNormal[2]))
-        print('=== Match Vertex Done ===')
+    settings = dict(copyNormals=cmds.checkBox(normal, q=True, v=True) and not lPostionMatcher.blendTarget,
+                    keepFaceNormals=cmds.checkBox(hardEdge, q=True, v=True),
+                    mirror=mirror_axis())
+    byId = cmds.checkBox(sameTopology, q=True, v=True)
+    softFalloff = cmds.optionMenu(falloff, q=True, v=True)
+    onSurface = cmds.optionMenu(snapTo, q=True, v=True) == 'surface'
+    if onSurface or softFalloff in FALLOFFS:
+        # the batch refuses these combinations; here the run goes ahead without them
+        ignored = [label for label, on in (('Assign', assign_mode()), ('Same Topology By Vertex Id', byId),
+                                           ('Only Re-match What Moved', cmds.checkBox(incremental, q=True, v=True)),
+                                           ('Match In Background', cmds.checkBox(background, q=True, v=True)))
+                   if on]
+        if ignored:
+            cmds.warning(f'{", ".join(ignored)} not used with {"Snap To surface" if onSurface else "Falloff"}')
+    if onSurface:
+        result = lPostionMatcher.surface_match_vertices(cmds.floatField(Threshold, q=True, v=True), **settings)
+    elif softFalloff in FALLOFFS:
+        result = lPostionMatcher.soft_match_vertices(cmds.floatField(Threshold, q=True, v=True),
+                                                     cmds.optionMenu(engine, q=True, v=True), softFalloff,
+                                                     cmds.intField(blendNearest, q=True, v=True), **settings)
+    elif cmds.checkBox(incremental, q=True, v=True) and not assign_mode() and not byId:
+        # only what moved since the last run is matched and written again
+        result = lPostionMatcher.rematch_vertices(cmds.floatField(Threshold, q=True, v=True),
+                                                  cmds.optionMenu(engine, q=True, v=True), **settings)
+    elif cmds.checkBox(background, q=True, v=True):
+        # the search runs on a worker thread, the result is written once Maya is idle
+        lPostionMatcher.match_vertices_async(cmds.floatField(Threshold, q=True, v=True),
+                                             cmds.optionMenu(engine, q=True, v=True),
+                                             unique=assign_mode(), sameTopology=byId, done=background_done,
+                                             **settings)
+        print('=== Match Vertex Started ===')
+        return
+    else:
+        result = lPostionMatcher.match_vertices(cmds.floatField(Threshold, q=True, v=True),
+                                                cmds.optionMenu(engine, q=True, v=True),
+                                                unique=assign_mode(), sameTopology=byId, **settings)
+    print('=== Match Vertex Done ===', len(result.target))
+
+
+@cancellable('Bake Match')
+@instrumented
+def bake_frames(cacheDir):
+    # matched once at the current frame, then keyed (or cached) onto the sources on every frame of the range
+    start, end = cmds.intField(bakeStart, q=True, v=True), cmds.intField(bakeEnd, q=True, v=True)
+    result = lPostionMatcher.bake_vertices(range(start, end + 1), cmds.floatField(Threshold, q=True, v=True),
+                                           cmds.optionMenu(engine, q=True, v=True), assign_mode(), mirror_axis(),
+                                           cmds.checkBox(sameTopology, q=True, v=True), cacheDir=cacheDir)
+    print('=== Bake Done ===', len(result.target), 'vertices over', end - start + 1, 'frames')
+    if cacheDir is None and len(result.target) > 5000:
+        cmds.warning(f'{len(result.target)} vertices keyed, three animCurves each; '
+                     'Bake To Geometry Cache keeps dense meshes light')
+
+
+def bake_match(*args):
+    bake_frames(None)
+
+
+def bake_cache(*args):
+    # the same bake written into a geometry cache per target mesh, no keys
+    path = cmds.fileDialog2(fileMode=3, caption='Bake To Geometry Cache')
+    if path:
+        bake_frames(path[0])
+
+
+def background_done(result):
+    if result is None:
+        print('=== Match Vertex Dropped, the selection changed or the match failed (see the log) ===')
+    else:
+        print('=== Match Vertex Done ===', len(result.target))
+
+
+def save_correspondence(*args):
+    # the pairs of a match with the current settings, without moving anything
+    path = cmds.fileDialog2(fileFilter='Correspondence Map (*.npz)', fileMode=0, caption='Save Map')
+    if not path:
+        return
+    result = lPostionMatcher.pair(cmds.floatField(Threshold, q=True, v=True),
+                                  cmds.optionMenu(engine, q=True, v=True), assign_mode(), mirror_axis(),
+                                  cmds.checkBox(sameTopology, q=True, v=True))
+    lPostionMatcher.export_map(path[0], result, mirror_axis())
+    print('=== Map Saved ===', len(result.target), path[0])
+
+
+def apply_correspondence(*args):
+    path = cmds.fileDialog2(fileFilter='Correspondence Map (*.npz)', fileMode=1, caption='Apply Map')
+    if not path:
+        return
+    applied = apply_map(load_map(path[0]), lPostionMatcher.meshIO, cmds.checkBox(normal, q=True, v=True),
+                        cmds.checkBox(hardEdge, q=True, v=True))
+    print('=== Map Applied ===', len(applied.targetVertex))
 
 
 def main():
+    global Threshold, engine, snapTo, assign, mirror, falloff, blendNearest, sameTopology, normal, hardEdge, incremental
+    global constrainWith, logTimings, background, bakeStart, bakeEnd, toBlendShape, blendTarget
     wd_Match_Vertexs = 'Match_Vertexs'
     if cmds.window(wd_Match_Vertexs, q=True, ex=True):
         cmds.deleteUI(wd_Match_Vertexs)
@@ -92,13 +213,62 @@ def main():
     wd_Match_Vertexs = cmds.window(wd_Match_Vertexs, title='Match Vertexs')
     cmds.columnLayout(adjustableColumn=True, rs=5, cw=160)
     cmds.button(label="Get Source Objects", command=getRefVertex)
+    cmds.button(label="Get Source Meshes As One Pool", command=getRefMeshes)
     cmds.button(label="Get Target Objects", command=getActVerex)
     cmds.rowLayout(h=22, numberOfColumns=2, columnWidth2=(80, 75), adjustableColumn=True,
                    columnAlign=(1, 'left'), columnAttach=[(1, 'both', 0), (2, 'both', 0)])
     cmds.text(l='Threshold:', al='right')
     Threshold = cmds.floatField(minValue=0, maxValue=10, value=1, step=0.1, pre=1)
     cmds.setParent('..')
+    engine = cmds.optionMenu(label='Engine:')
+    for name in ENGINES:
+        cmds.menuItem(label=name)
+    snapTo = cmds.optionMenu(label='Snap To:')
+    for name in ('vertices', 'surface'):
+        cmds.menuItem(label=name)
+    assign = cmds.optionMenu(label='Assign:')
+    for name in ('nearest',) + AVAILABLE_UNIQUE_MODES:
+        cmds.menuItem(label=name)
+    mirror = cmds.optionMenu(label='Mirror:')
+    for name in ('off',) + tuple(MIRROR_AXES):
+        cmds.menuItem(label=name)
+    falloff = cmds.optionMenu(label='Falloff:')
+    for name in ('off',) + FALLOFFS:
+        cmds.menuItem(label=name)
+    cmds.rowLayout(h=22, numberOfColumns=2, columnWidth2=(80, 75), adjustableColumn=True,
+                   columnAlign=(1, 'left'), columnAttach=[(1, 'both', 0), (2, 'both', 0)])
+    cmds.text(l='Blend Nearest:', al='right')
+    blendNearest = cmds.intField(minValue=1, maxValue=16, value=1)
+    cmds.setParent('..')
+    sameTopology = cmds.checkBox(label='Same Topology By Vertex Id', v=False)
     normal = cmds.checkBox(label='Copy Vertex Normal', v=True)
+    hardEdge = cmds.checkBox(label='Keep Hard Edge Normals', v=False)
+    incremental = cmds.checkBox(label='Only Re-match What Moved', v=False)
+    background = cmds.checkBox(label='Match In Background', v=False)
+    logTimings = cmds.checkBox(label='Log Timings', v=False)
+    cmds.rowLayout(h=22, numberOfColumns=2, columnWidth2=(160, 75), adjustableColumn=2,
+                   columnAttach=[(1, 'both', 0), (2, 'both', 0)])
+    toBlendShape = cmds.checkBox(label='To BlendShape Target:', v=False)
+    blendTarget = cmds.textField(text='vtxMatch')
+    cmds.setParent('..')
     cmds.button(label="Match Vertexs", command=matchVertexs)
+    cmds.rowLayout(numberOfColumns=2, adjustableColumn=1, columnAttach=[(1, 'both', 0), (2, 'both', 0)])
+    cmds.button(label="Save Map...", command=save_correspondence)
+    cmds.button(label="Apply Map...", command=apply_correspondence)
+    cmds.setParent('..')
+    cmds.rowLayout(h=22, numberOfColumns=3, columnWidth3=(80, 40, 40), adjustableColumn=1,
+                   columnAlign=(1, 'left'), columnAttach=[(1, 'both', 0), (2, 'both', 0), (3, 'both', 0)])
+    cmds.text(l='Bake Frames:', al='right')
+    bakeStart = cmds.intField(value=int(cmds.playbackOptions(q=True, minTime=True)))
+    bakeEnd = cmds.intField(value=int(cmds.playbackOptions(q=True, maxTime=True)))
+    cmds.setParent('..')
+    cmds.rowLayout(numberOfColumns=2, adjustableColumn=1, columnAttach=[(1, 'both', 0), (2, 'both', 0)])
+    cmds.button(label="Bake Match Over Frames", command=bake_match)
+    cmds.button(label="Bake To Geometry Cache...", command=bake_cache)
+    cmds.setParent('..')
+    constrainWith = cmds.optionMenu(label='Constrain With:')
+    for name in CONSTRAINT_MODES:
+        cmds.menuItem(label=name)
+    cmds.button(label="Constrain To Closest Objects", command=parent_constraint_closer_items)
 
     cmds.showWindow(wd_Match_Vertexs)
@@ -0,0 +1,16 @@
+"""
+Core library behind vtxMatch.py.
+spatial, core, assignment, soft, surface and geocache are plain numpy and
+import without Maya; mayaio, matcher and batch are the Maya adapters around them.
+"""
+
+try:
+    import numpy
+except ImportError as e:
+    raise RuntimeError(f"\n This script requires the numpy module\n{e}")
+
+from vtxmatchlib.spatial import ENGINES, HashGrid, KDTree, build_index
+from vtxmatchlib.core import MatchResult, match_points, matched_values, reflect
+from vtxmatchlib.assignment import AVAILABLE_UNIQUE_MODES, UNIQUE_MODES, match_points_unique
+from vtxmatchlib.soft import FALLOFFS, blended_values, soft_match
+from vtxmatchlib.surface import TriangleBVH, closest_points
@@ -0,0 +1,248 @@
+"""
+One-to-one vtxMatch: every source point is used by at most one target, so
+targets on a denser mesh no longer collapse onto the same source vertex.
+
+Both modes work on the sparse candidate pairs inside the threshold from the
+spatial index, never on a dense target x source cost matrix.
+"""
+
+import numpy
+
+try:
+    from scipy.optimize import linear_sum_assignment
+    from scipy.sparse import csr_matrix
+    from scipy.sparse.csgraph import min_weight_full_bipartite_matching
+except ImportError:
+    linear_sum_assignment = csr_matrix = min_weight_full_bipartite_matching = None
+
+from vtxmatchlib.core import MatchResult
+from vtxmatchlib.spatial import as_points, build_index
+
+
+UNIQUE_MODES = ('greedy', 'optimal')
+# the modes the window and batch offer: without scipy, 'optimal' fails on
+# any block over MAX_DENSE_CELLS, i.e. on most connected meshes
+AVAILABLE_UNIQUE_MODES = UNIQUE_MODES if min_weight_full_bipartite_matching is not None else ('greedy',)
+
+# a greedy round that drops less than 1 / SWEEP_SHRINK of the remaining
+# pairs hands the rest to one sequential sweep
+SWEEP_SHRINK = 4
+
+# largest connected block of candidates (targets x sources) solved as a
+# dense matrix; bigger blocks need scipy's sparse solver
+MAX_DENSE_CELLS = 2000000
+
+
+def candidate_pairs(targetPoints, sourcePoints, threshold, engine='auto', index=None):
+    '''
+    Every (target, source, distance) pair strictly closer than threshold,
+    sorted by target, distance, source.
+    '''
+    targetPoints = as_points(targetPoints)
+    sourcePoints = as_points(sourcePoints)
+    if not len(targetPoints) or not len(sourcePoints):
+        return _empty(sourcePoints.dtype)
+    if index is None:
+        index = build_index(sourcePoints, threshold, engine)
+    return MatchResult(*index.query_radius(targetPoints, threshold))
+
+
+def assign_greedy(candidates):
+    '''
+    Take candidate pairs shortest first, skipping any whose target or source
+    is already used; ties go to the lower target, then source.
+
+    Runs as rounds over the remaining pairs: a pair that ranks first for
+    both its target and its source is exactly the one the sequential greedy
+    pass would take, so each round takes all of them at once. Chains of
+    pairs that each wait on the next (graded density along an edge loop)
+    would take one round per pair, so once a round drops less than
+    1 / SWEEP_SHRINK of the remaining pairs, the rest is taken by one
+    sequential sweep over the sorted list instead.
+    '''
+    target, source, distance = candidates
+    order = numpy.lexsort((source, target, distance))
+    target, source, distance = target[order], source[order], distance[order]
+    usedTarget = numpy.zeros(target.max() + 1 if len(target) else 0, dtype=bool)
+    usedSource = numpy.zeros(source.max() + 1 if len(source) else 0, dtype=bool)
+    taken = []
+    alive = numpy.arange(len(target))
+    while len(alive):
+        win = _first_of(target[alive]) & _first_of(source[alive])
+        taken.append(alive[win])
+        usedTarget[target[alive[win]]] = True
+        usedSource[source[alive[win]]] = True
+        remaining = alive[~(usedTarget[target[alive]] | usedSource[source[alive]])]
+        if len(remaining) * SWEEP_SHRINK > len(alive) * (SWEEP_SHRINK - 1):
+            taken.append(_sweep(target, source, remaining, usedTarget, usedSource))
+            break
+        alive = remaining
+    return _by_target(target, source, distance, numpy.concatenate(taken) if taken else alive)
+
+
+def assign_optimal(candidates):
+    '''
+    Match as many targets as possible, and among those the assignment with
+    the smallest summed distance.
+
+    Candidates split into independent connected blocks. A block with a
+    single target or source takes its closest pair, small blocks are solved
+    as dense matrices and blocks over MAX_DENSE_CELLS as one sparse
+    problem, which needs scipy (ValueError without it).
+    '''
+    target, source, distance = candidates
+    if not len(target):
+        return _empty(distance.dtype)
+    targets, row = numpy.unique(target, return_inverse=True)
+    sources, column = numpy.unique(source, return_inverse=True)
+    pickedRow, pickedColumn = _solve_components(row, column, distance.astype(numpy.float64), len(targets))
+    # map the chosen cells back onto candidate pairs; cells that are no
+    # candidate at all were only taken at the unmatched penalty
+    cell = row * len(sources) + column
+    order = numpy.argsort(cell)
+    chosen = pickedRow * len(sources) + pickedColumn
+    slot = numpy.minimum(numpy.searchsorted(cell, chosen, sorter=order), len(cell) - 1)
+    found = cell[order[slot]] == chosen
+    return _by_target(target, source, distance, order[slot[found]])
+
+
+def match_points_unique(targetPoints, sourcePoints, threshold, mode='greedy', engine='auto', index=None):
+    '''
+    match_points where each source point is used at most once. mode is
+    'greedy' (fast, shortest pairs first) or 'optimal' (most matches,
+    then smallest total distance).
+    '''
+    if mode not in UNIQUE_MODES:
+        raise ValueError(f'unknown unique mode {mode!r}, expected one of {UNIQUE_MODES}')
+    candidates = candidate_pairs(targetPoints, sourcePoints, threshold, engine, index)
+    return assign_greedy(candidates) if mode == 'greedy' else assign_optimal(candidates)
+
+
+def _empty(dtype):
+    return MatchResult(numpy.empty(0, dtype=numpy.int64), numpy.empty(0, dtype=numpy.int64),
+                       numpy.empty(0, dtype=dtype))
+
+
+def _sweep(target, source, alive, usedTarget, usedSource):
+    '''The sequential greedy pass over alive (in sorted order): rows whose target and source are both free.'''
+    usedTarget, usedSource = bytearray(usedTarget.tobytes()), bytearray(usedSource.tobytes())
+    taken = []
+    for row, t, s in zip(alive.tolist(), target[alive].tolist(), source[alive].tolist()):
+        if not usedTarget[t] and not usedSource[s]:
+            usedTarget[t] = usedSource[s] = 1
+            taken.append(row)
+    return numpy.array(taken, dtype=numpy.int64)
+
+
+def _first_of(values):
+    '''True at the first occurrence of each value.'''
+    first = numpy.zeros(len(values), dtype=bool)
+    first[numpy.unique(values, return_index=True)[1]] = True
+    return first
+
+
+def _by_target(target, source, distance, picked):
+    picked = picked[numpy.argsort(target[picked], kind='stable')]
+    return MatchResult(target[picked], source[picked], distance[picked])
+
+
+def _components(row, column, rowCount):
+    '''Connected block label per row and per column of the bipartite candidate graph.'''
+    node = numpy.arange(rowCount + column.max() + 1)
+    left, right = row, column + rowCount
+    while True:
+        low = numpy.minimum(node[left], node[right])
+        label = node.copy()
+        numpy.minimum.at(label, left, low)
+        numpy.minimum.at(label, right, low)
+        label = label[label]
+        if numpy.array_equal(label, node):
+            return node[:rowCount], node[rowCount:]
+        node = label
+
+
+def _solve_components(row, column, cost, rowCount):
+    '''Chosen (row, column) candidates, solving each connected block on its own.'''
+    rowLabel, columnLabel = _components(row, column, rowCount)
+    block = rowLabel[row]
+    order = numpy.lexsort((cost, block))
+    row, column, cost, block = row[order], column[order], cost[order], block[order]
+    starts = numpy.flatnonzero(numpy.r_[True, block[1:] != block[:-1]])
+    ends = numpy.r_[starts[1:], len(block)]
+    rowsIn = numpy.bincount(rowLabel, minlength=len(columnLabel) + rowCount)
+    columnsIn = numpy.bincount(columnLabel, minlength=len(columnLabel) + rowCount)
+    star = (rowsIn[block[starts]] == 1) | (columnsIn[block[starts]] == 1)
+    pickedRow, pickedColumn = [row[starts[star]]], [column[starts[star]]]
+    for lo, hi in zip(starts[~star], ends[~star]):
+        rows, localRow = numpy.unique(row[lo:hi], return_inverse=True)
+        columns, localColumn = numpy.unique(column[lo:hi], return_inverse=True)
+        # real pairs cost at least 1 so that leaving a target unmatched
+        # (penalty) always costs more than any set of real pairs
+        blockCost = cost[lo:hi] + 1.0
+        penalty = (blockCost.max() + 1.0) * (len(rows) + 1)
+        if len(rows) * len(columns) <= MAX_DENSE_CELLS:
+            # the shorter side goes down the rows, so every row has a place to go
+            matrix = numpy.full((len(rows), len(columns)), penalty)
+            matrix[localRow, localColumn] = blockCost
+            flip = len(rows) > len(columns)
+            assigned = _dense_assignment(matrix.T if flip else matrix)
+            picked, assigned = (assigned, numpy.arange(len(columns))) if flip else (numpy.arange(len(rows)), assigned)
+        elif min_weight_full_bipartite_matching is not None:
+            # one private fallback column per row keeps a full matching possible
+            graph = csr_matrix((numpy.r_[blockCost, numpy.full(len(rows), penalty)],
+                                (numpy.r_[localRow, numpy.arange(len(rows))],
+                                 numpy.r_[localColumn, len(columns) + numpy.arange(len(rows))])),
+                               shape=(len(rows), len(columns) + len(rows)))
+            picked, assigned = min_weight_full_bipartite_matching(graph)
+        else:
+            raise ValueError(f'{len(rows)} targets compete for {len(columns)} sources within the threshold; '
+                             'lower the threshold, use greedy mode or install scipy')
+        real = assigned < len(columns)  # fallback columns leave their row unmatched
+        pickedRow.append(rows[picked[real]])
+        pickedColumn.append(columns[assigned[real]])
+    return numpy.concatenate(pickedRow), numpy.concatenate(pickedColumn)
+
+
+def _dense_assignment(cost):
+    if linear_sum_assignment is not None:
+        return linear_sum_assignment(cost)[1]
+    return _hungarian(cost)
+
+
+def _hungarian(cost):
+    '''
+    Column assigned to each row of a dense rows <= columns cost matrix
+    (shortest augmenting path with potentials, O(n^2 m)).
+    '''
+    rows, columns = cost.shape
+    u = numpy.zeros(rows + 1)
+    v = numpy.zeros(columns + 1)
+    owner = numpy.zeros(columns + 1, dtype=numpy.int64)  # 1-based row on each column, 0 = free
+    way = numpy.zeros(columns + 1, dtype=numpy.int64)
+    for i in range(1, rows + 1):
+        owner[0] = i
+        j0 = 0
+        minv = numpy.full(columns + 1, numpy.inf)
+        used = numpy.zeros(columns + 1, dtype=bool)
+        while owner[j0]:
+            used[j0] = True
+            i0 = owner[j0]
+            free = ~used
+            current = cost[i0 - 1] - u[i0] - v[1:]
+            better = free[1:] & (current < minv[1:])
+            minv[1:][better] = current[better]
+            way[1:][better] = j0
+            j1 = int(numpy.argmin(numpy.where(free, minv, numpy.inf)))
+            delta = minv[j1]
+            u[owner[used]] += delta
+            v[used] -= delta
+            minv[free] -= delta
+            j0 = j1
+        while j0:
+            j1 = way[j0]
+            owner[j0] = owner[j1]
+            j0 = j1
+    assigned = numpy.empty(rows, dtype=numpy.int64)
+    taken = numpy.flatnonzero(owner[1:])
+    assigned[owner[taken + 1] - 1] = taken
+    return assigned
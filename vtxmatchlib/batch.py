@@ -0,0 +1,197 @@
+"""
+mayapy entry point for matches without a GUI, e.g. on the render farm:
+
+    mayapy -m vtxmatchlib.batch scene.mb --source "scan.vtx[*]" --target base --threshold 0.05 -o out.mb
+
+--source / --target take any cmds.ls pattern; plain mesh names mean every vertex.
+For multi-million vertex scans add --chunk-size 65536 (and --spill-dir) to
+stream one source mesh onto one target mesh with bounded memory; with
+--processes N many --target meshes (LODs, variants) are matched on a pool.
+--save-map keeps the pairs of a match in a file that --apply-map re-applies
+to other scenes with the same meshes without searching again. --report
+prints per stage timings and Maya command counts as JSON, --profile dumps
+cProfile stats of the run. --frames START END matches once and keys the
+targets onto their sources on every frame (or bakes them into Maya geometry
+caches under --geometry-cache).
+--blend-target NAME writes the match into that blendShape target of each
+target mesh instead of moving its vertices.
+"""
+
+import argparse
+import json
+
+from vtxmatchlib.assignment import AVAILABLE_UNIQUE_MODES
+from vtxmatchlib.core import MIRROR_AXES
+from vtxmatchlib.correspondence import apply_map, load_map
+from vtxmatchlib.instrument import CAN_TRACE_MEMORY, Instrument
+from vtxmatchlib.mayaio import MeshIO
+from vtxmatchlib.soft import FALLOFFS
+from vtxmatchlib.spatial import ENGINES
+from vtxmatchlib.matcher import PostionMatcher
+from vtxmatchlib.streaming import stream_match
+
+
+def expand_items(meshIO, patterns):
+    '''
+    Unflattened cmds.ls items for patterns, vertex ranges as they come;
+    meshes expand to "mesh.vtx[*]", so several --source meshes form one
+    pool. See mayaio.VertexSelection.
+    '''
+    return meshIO.expand_meshes(meshIO.cmds.ls(patterns, long=True))
+
+
+def run(source, target, threshold, engine='auto', copyNormals=False, keepFaceNormals=False, meshIO=None,
+        unique=None, mirror=None, sameTopology=False, falloff=None, k=1, surface=False, saveMap=None,
+        instrument=None, frames=None, referenceFrame=None, cacheDir=None, blendTarget=None):
+    '''
+    Match the target patterns onto the source patterns in the open scene;
+    with a falloff the targets are moved softly, see soft.soft_match, with
+    surface they land on the closest point of the source triangles.
+    saveMap is a path to store the pairs of a vertex match in, see
+    correspondence.save_map. instrument (an instrument.Instrument) times
+    the run's stages. With frames the match is baked over those frames
+    (into geometry caches in cacheDir if given), see
+    PostionMatcher.bake_vertices. blendTarget names a blendShape target
+    to write into instead of the meshes, see MeshIO.set_blend_target.
+    '''
+    matcher = PostionMatcher(meshIO, instrument)
+    matcher.blendTarget = blendTarget
+    matcher.bVtxList = expand_items(matcher.meshIO, source)
+    matcher.aVtxList = expand_items(matcher.meshIO, target)
+    if surface:
+        return matcher.surface_match_vertices(threshold, copyNormals, keepFaceNormals, mirror)
+    if frames is not None:
+        return matcher.bake_vertices(frames, threshold, engine, unique, mirror, sameTopology, referenceFrame,
+                                     cacheDir)
+    if falloff:
+        return matcher.soft_match_vertices(threshold, engine, falloff, k, copyNormals, keepFaceNormals, mirror)
+    result = matcher.match_vertices(threshold, engine, copyNormals, keepFaceNormals, unique, mirror, sameTopology)
+    if saveMap:
+        matcher.export_map(saveMap, result, mirror)
+    return result
+
+
+def frame_range(start, end):
+    '''Every whole frame from start to end, both included.'''
+    return [start + i for i in range(int(end - start) + 1)]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='vtxmatchlib.batch', description=__doc__.strip().splitlines()[0])
+    parser.add_argument('scene', help='scene file to open')
+    parser.add_argument('--source', nargs='+')
+    parser.add_argument('--target', nargs='+')
+    parser.add_argument('--threshold', type=float, default=1.0)
+    parser.add_argument('--engine', choices=ENGINES, default='auto')
+    parser.add_argument('--normals', action='store_true', help='copy vertex normals too')
+    parser.add_argument('--keep-hard-edges', action='store_true')
+    parser.add_argument('--unique', choices=AVAILABLE_UNIQUE_MODES, help='use every source vertex at most once')
+    parser.add_argument('--mirror', choices=tuple(MIRROR_AXES),
+                        help='match onto the source mirrored across the world plane normal to this axis')
+    parser.add_argument('--mirror-offset', type=float, default=0.0, help='position of the mirror plane on its axis')
+    parser.add_argument('--surface', action='store_true',
+                        help='snap onto the closest point of the source triangles instead of the closest vertex')
+    parser.add_argument('--falloff', choices=FALLOFFS, help='move targets toward the source by this falloff')
+    parser.add_argument('--blend-nearest', type=int, default=1,
+                        help='with --falloff, blend this many nearest sources by inverse distance')
+    parser.add_argument('--same-topology', action='store_true',
+                        help='copy by vertex id from source meshes with the same topology as a target mesh')
+    parser.add_argument('--chunk-size', type=int,
+                        help='stream whole meshes in chunks of this many vertices (one --source and --target mesh)')
+    parser.add_argument('--float64', action='store_true', help='keep streamed positions in float64')
+    parser.add_argument('--spill-dir', help='memory-map streamed arrays into this folder')
+    parser.add_argument('--processes', type=int,
+                        help='match whole --target meshes on a pool of this many processes')
+    parser.add_argument('--save-map', help='also write the matched pairs to this .npz correspondence map')
+    parser.add_argument('--apply-map', help='re-apply a saved correspondence map instead of matching')
+    parser.add_argument('--report', action='store_true', help='print per stage timings and command counts as JSON')
+    parser.add_argument('--trace-memory', action='store_true', help='with --report, add tracemalloc peaks per stage')
+    parser.add_argument('--profile', help='dump cProfile stats of the match to this file')
+    parser.add_argument('--frames', type=float, nargs=2, metavar=('START', 'END'),
+                        help='match once, then key the targets onto their sources on every frame of this range')
+    parser.add_argument('--reference-frame', type=float, help='with --frames, match at this frame (default START)')
+    parser.add_argument('--geometry-cache', metavar='DIR',
+                        help='with --frames, bake into Maya geometry caches in this folder instead of keying')
+    parser.add_argument('--blend-target', metavar='NAME',
+                        help='write the match into this blendShape target instead of moving the vertices')
+    parser.add_argument('-o', '--output', help='save to this file instead of overwriting the scene')
+    args = parser.parse_args(argv)
+    if not args.apply_map and not (args.source and args.target):
+        parser.error('--source and --target are required unless --apply-map is given')
+    if (args.save_map or args.apply_map) and (args.processes or args.chunk_size or args.falloff or args.surface):
+        parser.error('--save-map and --apply-map cannot be combined with --processes, --chunk-size, '
+                     '--falloff or --surface')
+    if (args.report or args.profile) and (args.apply_map or args.processes or args.chunk_size):
+        parser.error('--report and --profile only cover plain matches, '
+                     'not --apply-map, --processes or --chunk-size')
+    if args.trace_memory and not CAN_TRACE_MEMORY:
+        parser.error('--trace-memory needs Python 3.9 or later')
+    if args.save_map and args.apply_map:
+        parser.error('--save-map and --apply-map are exclusive')
+    if args.processes and (args.chunk_size or args.normals or args.unique or args.mirror or args.falloff):
+        parser.error('--processes cannot be combined with --chunk-size, --normals, --unique, --mirror or --falloff')
+    if args.processes and any('.' in target for target in args.target):
+        parser.error('--processes snaps whole target meshes, not vertex ranges')
+    if args.chunk_size and (len(args.source) != 1 or len(args.target) != 1
+                            or args.normals or args.unique or args.mirror or args.falloff):
+        parser.error('--chunk-size takes exactly one source and one target mesh '
+                     'and no --normals, --unique, --mirror or --falloff')
+    if (args.falloff or args.surface) and (args.unique or args.same_topology):
+        parser.error('--falloff and --surface cannot be combined with --unique or --same-topology')
+    if args.frames and (args.normals or args.falloff or args.surface or args.save_map or args.apply_map
+                        or args.processes or args.chunk_size):
+        parser.error('--frames cannot be combined with --normals, --falloff, --surface, --save-map, --apply-map, '
+                     '--processes or --chunk-size')
+    if args.blend_target and (args.frames or args.apply_map or args.processes or args.chunk_size or args.normals):
+        parser.error('--blend-target cannot be combined with --frames, --apply-map, --processes, --chunk-size '
+                     'or --normals')
+    if (args.reference_frame is not None or args.geometry_cache) and not args.frames:
+        parser.error('--reference-frame and --geometry-cache need --frames')
+    if args.surface and (args.falloff or args.processes or args.chunk_size):
+        parser.error('--surface cannot be combined with --falloff, --processes or --chunk-size')
+
+    import maya.standalone
+    maya.standalone.initialize(name='python')
+    try:
+        import maya.cmds as cmds
+        cmds.file(args.scene, open=True, force=True)
+        if args.apply_map:
+            matched = len(apply_map(load_map(args.apply_map), copyNormals=args.normals,
+                                    keepFaceNormals=args.keep_hard_edges).targetVertex)
+        elif args.processes:
+            # multiprocessing.shared_memory is Python 3.8+, older Mayas only miss --processes
+            from vtxmatchlib.parallel import parallel_match_meshes
+            results = parallel_match_meshes(expand_items(MeshIO(cmds), args.source), cmds.ls(args.target),
+                                            args.threshold, args.engine, args.processes)
+            matched = sum(len(result.target) for result in results.values())
+        elif args.chunk_size:
+            matched = len(stream_match(args.source[0], args.target[0], args.threshold, args.engine,
+                                       args.chunk_size, not args.float64, args.spill_dir).target)
+        else:
+            instrument = Instrument(args.trace_memory, args.profile)
+            frames = referenceFrame = None
+            if args.frames:
+                frames = frame_range(*args.frames)
+                referenceFrame = args.frames[0] if args.reference_frame is None else args.reference_frame
+            meshIO = MeshIO(cmds)
+            with instrument.session(meshIO):
+                matched = len(run(args.source, args.target, args.threshold, args.engine,
+                                  args.normals, args.keep_hard_edges, meshIO, unique=args.unique,
+                                  mirror=args.mirror and (args.mirror, args.mirror_offset),
+                                  sameTopology=args.same_topology, falloff=args.falloff,
+                                  k=args.blend_nearest, surface=args.surface, saveMap=args.save_map,
+                                  instrument=instrument, frames=frames, referenceFrame=referenceFrame,
+                                  cacheDir=args.geometry_cache, blendTarget=args.blend_target).target)
+            if args.report:
+                print(json.dumps(instrument.report(), indent=2))
+        print(f'Matched {matched} vertices')
+        if args.output:
+            cmds.file(rename=args.output)
+        sceneType = 'mayaAscii' if cmds.file(q=True, sceneName=True).endswith('.ma') else 'mayaBinary'
+        cmds.file(save=True, force=True, type=sceneType)
+    finally:
+        maya.standalone.uninitialize()
+
+
+if __name__ == '__main__':
+    main()
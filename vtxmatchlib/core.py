@@ -0,0 +1,165 @@
+"""
+Headless vtxMatch engine.
+Takes plain position / normal arrays and returns index pairs, so the same
+code backs the Maya window, mayapy batch jobs and plain Python scripts.
+"""
+
+import collections
+import contextlib
+import os
+import tempfile
+
+import numpy
+
+from vtxmatchlib.spatial import KDTree, as_points, build_index
+
+
+MatchResult = collections.namedtuple('MatchResult', ['target', 'source', 'distance'])
+MatchResult.__doc__ = '''
+Matched pairs as parallel arrays: target row, source row and their distance.
+Targets without a source inside the threshold are left out.
+'''
+
+# targets per slice in chunked matching; keeps search temporaries in the tens of MB
+DEFAULT_CHUNK_SIZE = 65536
+
+# relative change below which a refetched position counts as unmoved; covers
+# the float32 round trip through a mesh's tweak array
+MOVE_TOLERANCE = 1e-5
+
+MIRROR_AXES = {'x': (1.0, 0.0, 0.0), 'y': (0.0, 1.0, 0.0), 'z': (0.0, 0.0, 1.0)}
+
+
+def match_points(targetPoints, sourcePoints, threshold, engine='auto', index=None):
+    '''
+    Pair every target point with its nearest source point strictly closer
+    than threshold. Pass a prebuilt index over sourcePoints to skip the build.
+    '''
+    targetPoints = as_points(targetPoints)
+    sourcePoints = as_points(sourcePoints)
+    if not len(targetPoints) or not len(sourcePoints):
+        return MatchResult(numpy.empty(0, dtype=numpy.int64), numpy.empty(0, dtype=numpy.int64),
+                           numpy.empty(0, dtype=sourcePoints.dtype))
+    if index is None:
+        index = build_index(sourcePoints, threshold, engine)
+    distance, nearest = index.query(targetPoints, threshold)
+    target = numpy.flatnonzero(nearest >= 0)
+    return MatchResult(target, nearest[target], distance[target])
+
+
+def match_points_chunked(targetPoints, sourcePoints, threshold, engine='auto', index=None,
+                         chunkSize=DEFAULT_CHUNK_SIZE, spillDir=None):
+    '''
+    match_points in slices of chunkSize targets, with identical results.
+    Search temporaries stay bounded by the chunk size however many targets
+    there are; targetPoints may itself be a numpy.memmap. With spillDir the
+    per-target arrays are memory-mapped .npy files in a temporary folder
+    under spillDir (see spill_folder) instead of RAM; the result, matched
+    pairs only, is in memory.
+    '''
+    count = len(targetPoints)
+    if index is None:
+        index = build_index(sourcePoints, threshold, engine)
+    dtype = index.points.dtype
+    with spill_folder(spillDir) as folder:
+        nearest = allocate((count,), numpy.int64, folder, 'nearest')
+        distance = allocate((count,), dtype, folder, 'distance')
+        matched = 0
+        for lo in range(0, count, chunkSize):
+            hi = min(lo + chunkSize, count)
+            distance[lo:hi], nearest[lo:hi] = index.query(as_points(targetPoints[lo:hi], dtype), threshold)
+            matched += int(numpy.count_nonzero(nearest[lo:hi] >= 0))
+
+        result = MatchResult(numpy.empty(matched, dtype=numpy.int64), numpy.empty(matched, dtype=numpy.int64),
+                             numpy.empty(matched, dtype=dtype))
+        row = 0
+        for lo in range(0, count, chunkSize):
+            hit = numpy.flatnonzero(nearest[lo:lo + chunkSize] >= 0)
+            result.target[row:row + len(hit)] = hit + lo
+            result.source[row:row + len(hit)] = nearest[lo:lo + chunkSize][hit]
+            result.distance[row:row + len(hit)] = distance[lo:lo + chunkSize][hit]
+            row += len(hit)
+        # the maps have to be closed before the folder can go on Windows
+        del nearest, distance
+    return result
+
+
+def spill_folder(spillDir=None):
+    '''
+    Context manager giving a fresh folder under spillDir for allocate's
+    memory-mapped files and removing it with them on exit; gives None, so
+    allocate stays in RAM, when spillDir is None.
+    '''
+    if spillDir is None:
+        return contextlib.nullcontext()
+    return tempfile.TemporaryDirectory(prefix='vtxmatch_', dir=spillDir)
+
+
+def allocate(shape, dtype, spillDir=None, name='array'):
+    '''Empty array, or a memory-mapped <name>.npy file when spillDir is given.'''
+    if spillDir is None:
+        return numpy.empty(shape, dtype=dtype)
+    return numpy.lib.format.open_memmap(os.path.join(spillDir, f'{name}.npy'), mode='w+',
+                                        dtype=dtype, shape=shape)
+
+
+def mirror_plane(mirror):
+    '''
+    (unit normal, offset) of the plane normal . p == offset. mirror is an
+    axis name from MIRROR_AXES or a normal vector for a plane through the
+    origin, or an (axis, offset) pair.
+    '''
+    offset = 0.0
+    if isinstance(mirror, (tuple, list)) and len(mirror) == 2:
+        mirror, offset = mirror
+    normal = numpy.asarray(MIRROR_AXES.get(mirror, ()) if isinstance(mirror, str) else mirror,
+                           dtype=numpy.float64)
+    if normal.shape != (3,) or not numpy.any(normal):
+        raise ValueError(f'cannot mirror across {mirror!r}, expected one of {tuple(MIRROR_AXES)} or a 3d normal')
+    return normal / numpy.linalg.norm(normal), float(offset)
+
+
+def reflect(values, mirror, vectors=False):
+    '''
+    Points mirrored across mirror_plane(mirror); with vectors=True the rows
+    are directions (normals) and only flip, whatever the plane offset.
+    '''
+    normal, offset = mirror_plane(mirror)
+    values = numpy.asarray(values)
+    normal = normal.astype(values.dtype)
+    height = values @ normal - (0.0 if vectors else offset)
+    return values - 2 * height[:, None] * normal
+
+
+def merge_results(*results):
+    '''One MatchResult, sorted by target, from results over disjoint targets.'''
+    merged = MatchResult(*(numpy.concatenate(column) for column in zip(*results)))
+    order = numpy.argsort(merged.target, kind='stable')
+    return MatchResult(merged.target[order], merged.source[order], merged.distance[order])
+
+
+def moved(before, after, tolerance=MOVE_TOLERANCE):
+    '''Mask of rows of after that differ from before by more than tolerance (relative).'''
+    before, after = numpy.asarray(before), numpy.asarray(after)
+    if before.shape != after.shape:
+        return numpy.ones(len(after), dtype=bool)
+    return numpy.any(numpy.abs(after - before) > tolerance * (1.0 + numpy.abs(before)), axis=1)
+
+
+def points_near(points, centres, radius):
+    '''Mask of points strictly closer than radius to any of centres.'''
+    points, centres = as_points(points), as_points(centres)
+    near = numpy.zeros(len(points), dtype=bool)
+    if not len(points) or not len(centres):
+        return near
+    # only points inside the padded bounding box of the centres can be close
+    inBox = numpy.flatnonzero(numpy.all((points > centres.min(axis=0) - radius)
+                                        & (points < centres.max(axis=0) + radius), axis=1))
+    distance, _ = KDTree(centres).query(points[inBox], radius)
+    near[inBox] = numpy.isfinite(distance)
+    return near
+
+
+def matched_values(result, sourceValues):
+    '''Source rows (positions, normals, ...) picked for each matched target.'''
+    return numpy.asarray(sourceValues)[result.source]
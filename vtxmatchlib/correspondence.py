@@ -0,0 +1,115 @@
+"""
+Saved vtxMatch correspondences: the (target vertex, source vertex) pairs of
+a match, stored per mesh in a small .npz file so the same mapping can be
+re-applied to other shots of the same assets with one bulk read and write
+per mesh and no search at all.
+"""
+
+import collections
+
+import numpy
+
+from vtxmatchlib.core import mirror_plane, reflect
+from vtxmatchlib.mayaio import MeshIO
+
+
+MAP_VERSION = 1
+
+CorrespondenceMap = collections.namedtuple('CorrespondenceMap', [
+    'targetMeshes', 'sourceMeshes', 'targetFingerprints', 'sourceFingerprints',
+    'targetMesh', 'targetVertex', 'sourceMesh', 'sourceVertex', 'distance', 'mirror'])
+CorrespondenceMap.__doc__ = '''
+Matched pairs by mesh: targetMesh / sourceMesh index targetMeshes /
+sourceMeshes, whose topology fingerprints (MeshIO.fingerprint) are kept
+alongside; targetVertex / sourceVertex are vertex ids on those meshes.
+mirror is the (normal x, y, z, offset) plane the source was reflected
+across, or empty.
+'''
+
+
+def build_map(result, targetItems, sourceItems, meshIO=None, mirror=None):
+    '''
+    CorrespondenceMap of a MatchResult over two selections (see
+    MeshIO.selection). Pairs with a node (transform) on either side are
+    left out.
+    '''
+    meshIO = meshIO or MeshIO()
+    targetSelection, sourceSelection = meshIO.selection(targetItems), meshIO.selection(sourceItems)
+    targetMeshes, sourceMeshes = targetSelection.meshes, sourceSelection.meshes
+    keep = (targetSelection.mesh[result.target] >= 0) & (sourceSelection.mesh[result.source] >= 0)
+    target, source = result.target[keep], result.source[keep]
+    plane = numpy.empty(0, dtype=numpy.float64)
+    if mirror is not None:
+        normal, offset = mirror_plane(mirror)
+        plane = numpy.append(normal, offset)
+    return CorrespondenceMap(
+        numpy.array(targetMeshes, dtype=str), numpy.array(sourceMeshes, dtype=str),
+        numpy.array([meshIO.fingerprint(mesh) for mesh in targetMeshes], dtype=str),
+        numpy.array([meshIO.fingerprint(mesh) for mesh in sourceMeshes], dtype=str),
+        targetSelection.mesh[target], targetSelection.ids[target], sourceSelection.mesh[source],
+        sourceSelection.ids[source],
+        numpy.asarray(result.distance)[keep], plane)
+
+
+def save_map(path, correspondence):
+    '''Write a CorrespondenceMap to a compressed .npz file.'''
+    numpy.savez_compressed(path, version=MAP_VERSION, **correspondence._asdict())
+
+
+def load_map(path):
+    '''Read a CorrespondenceMap written by save_map.'''
+    with numpy.load(path, allow_pickle=False) as data:
+        if 'version' not in data or int(data['version']) != MAP_VERSION:
+            raise ValueError(f'{path} is not a version {MAP_VERSION} vtxMatch correspondence map')
+        return CorrespondenceMap(*(data[name] for name in CorrespondenceMap._fields))
+
+
+def apply_map(correspondence, meshIO=None, copyNormals=False, keepFaceNormals=False,
+              targetMeshes=None, sourceMeshes=None):
+    '''
+    Snap the mapped target vertices onto their source vertices as one undo
+    step: every source mesh is read and every target mesh written once.
+    targetMeshes / sourceMeshes rename the stored meshes in order (e.g. to
+    another namespace). Raises ValueError before touching the scene when a
+    mesh's topology no longer matches its fingerprint. Returns the map with
+    the mesh names it was applied to.
+    '''
+    meshIO = meshIO or MeshIO()
+    targetMeshes = list(correspondence.targetMeshes if targetMeshes is None else targetMeshes)
+    sourceMeshes = list(correspondence.sourceMeshes if sourceMeshes is None else sourceMeshes)
+    if (len(targetMeshes), len(sourceMeshes)) != (len(correspondence.targetMeshes), len(correspondence.sourceMeshes)):
+        raise ValueError('the map needs one replacement name per stored mesh')
+    mismatched = [mesh for meshes, fingerprints in ((targetMeshes, correspondence.targetFingerprints),
+                                                     (sourceMeshes, correspondence.sourceFingerprints))
+                  for mesh, fingerprint in zip(meshes, fingerprints.tolist())
+                  if meshIO.fingerprint(mesh) != fingerprint]
+    if mismatched:
+        raise ValueError(f'topology of {", ".join(mismatched)} does not match the correspondence map')
+    mirror = None
+    if len(correspondence.mirror):
+        mirror = (correspondence.mirror[:3], float(correspondence.mirror[3]))
+
+    positions = _source_values(correspondence, sourceMeshes, meshIO.points)
+    normals = _source_values(correspondence, sourceMeshes, meshIO.normals) if copyNormals else None
+    if mirror is not None:
+        positions = reflect(positions, mirror)
+        normals = None if normals is None else reflect(normals, mirror, vectors=True)
+    with meshIO.undo_chunk('matchVertexs'):
+        for i, mesh in enumerate(targetMeshes):
+            rows = numpy.flatnonzero(correspondence.targetMesh == i)
+            meshIO.set_points(mesh, correspondence.targetVertex[rows], positions[rows])
+            if normals is not None:
+                meshIO.set_normals(mesh, correspondence.targetVertex[rows], normals[rows], keepFaceNormals)
+    return correspondence._replace(targetMeshes=numpy.array(targetMeshes, dtype=str),
+                                   sourceMeshes=numpy.array(sourceMeshes, dtype=str))
+
+
+def _source_values(correspondence, sourceMeshes, read):
+    '''(P, 3) per pair values of the source vertices, with read(mesh) called once per mesh.'''
+    values = numpy.empty((len(correspondence.sourceVertex), 3), dtype=numpy.float64)
+    for i, mesh in enumerate(sourceMeshes):
+        rows = numpy.flatnonzero(correspondence.sourceMesh == i)
+        if len(rows):
+            values[rows] = read(mesh)[correspondence.sourceVertex[rows]]
+    return values
+
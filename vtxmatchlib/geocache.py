@@ -0,0 +1,85 @@
+"""
+Maya geometry caches written from plain arrays: the .xml description and
+one-file .mc data that cacheFile and Cache > Geometry Cache > Import Cache
+read, so a baked match plays back without a key on every vertex.
+"""
+
+import os
+import struct
+from xml.sax.saxutils import quoteattr
+
+import numpy
+
+
+# Maya's cache time unit
+TICKS_PER_SECOND = 6000
+# data file of a Format="mcc" cache; Maya looks for <name>.mc next to <name>.xml
+DATA_EXTENSION = '.mc'
+
+_DESCRIPTION = '''<?xml version="1.0"?>
+<Autodesk_Cache_File>
+  <cacheType Type="OneFile" Format="mcc"/>
+  <time Range="{start}-{end}"/>
+  <cacheTimePerFrame TimePerFrame="{perFrame}"/>
+  <cacheVersion Version="2.0"/>
+  <Channels>
+    <channel0 ChannelName={channel} ChannelType="FloatVectorArray" ChannelInterpretation="positions" \
+SamplingType="Regular" SamplingRate="{rate}" StartTime="{start}" EndTime="{end}"/>
+  </Channels>
+</Autodesk_Cache_File>
+'''
+
+
+class CacheWriter():
+    '''
+    One channel of point positions over frames, written frame by frame to
+    <path>.xml and <path>.mc, so only one frame is ever held in memory.
+    frames must be evenly spaced; fps turns them into cache ticks. Use as a
+    context manager: leaving it on an exception removes both files.
+
+        with CacheWriter('/tmp/cache/pSphereShape1', 'pSphereShape1', frames, 24) as cache:
+            for frame in frames:
+                cache.write(objectSpacePoints)
+    '''
+
+    def __init__(self, path, channel, frames, fps):
+        self.path = path
+        self.channel = channel
+        self.ticks = [int(round(frame * TICKS_PER_SECOND / fps)) for frame in frames]
+        self._written = 0
+        self._file = None
+
+    def __enter__(self):
+        start, end = self.ticks[0], self.ticks[-1]
+        rate = self.ticks[1] - self.ticks[0] if len(self.ticks) > 1 else 1
+        with open(f'{self.path}.xml', 'w') as description:
+            description.write(_DESCRIPTION.format(start=start, end=end, rate=rate, channel=quoteattr(self.channel),
+                                                  perFrame=rate))
+        self._file = open(f'{self.path}{DATA_EXTENSION}', 'wb')
+        self._file.write(_group(b'CACH', _chunk(b'VRSN', b'0.1\0') + _chunk(b'STIM', struct.pack('>i', start))
+                                + _chunk(b'ETIM', struct.pack('>i', end))))
+        return self
+
+    def write(self, points):
+        '''Append the (V, 3) positions of the next frame.'''
+        points = numpy.asarray(points, dtype='>f4').reshape(-1, 3)
+        self._file.write(_group(b'MYCH', _chunk(b'TIME', struct.pack('>i', self.ticks[self._written]))
+                                + _chunk(b'CHNM', self.channel.encode() + b'\0')
+                                + _chunk(b'SIZE', struct.pack('>i', len(points)))
+                                + _chunk(b'FVCA', points.tobytes())))
+        self._written += 1
+
+    def __exit__(self, kind, value, traceback):
+        self._file.close()
+        if kind is not None:
+            for extension in ('.xml', DATA_EXTENSION):
+                os.remove(f'{self.path}{extension}')
+
+
+def _chunk(tag, data):
+    # IFF chunk: tag, big-endian size, data padded to 4 bytes
+    return tag + struct.pack('>i', len(data)) + data + b'\0' * (-len(data) % 4)
+
+
+def _group(kind, chunks):
+    return b'FOR4' + struct.pack('>i', len(chunks) + 4) + kind + chunks
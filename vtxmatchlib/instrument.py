@@ -0,0 +1,122 @@
+"""
+Where a vtxMatch run spends its time: wall time per stage (fetch, search,
+write, normals), Maya command counts, pair counts and, optionally, the
+tracemalloc peak per stage and a cProfile dump of the whole run.
+"""
+
+import collections
+import contextlib
+import cProfile
+import json
+import logging
+import time
+import tracemalloc
+
+
+# a child of the menulib logger, so runs from the menu land in its handler
+logger = logging.getLogger('MenuFramework.vtxMatch')
+
+# per stage peaks need tracemalloc.reset_peak, Python 3.9+ (not Maya 2022's 3.7)
+CAN_TRACE_MEMORY = hasattr(tracemalloc, 'reset_peak')
+
+
+class Instrument():
+    '''
+    Collects one run's report. Wrap the run in session(meshIO) and let the
+    matcher open a stage() per step; report() returns the results as a
+    dict and log() writes them to the vtxMatch logger. With trace, every
+    stage also records its tracemalloc peak; profile is a path to dump the
+    run's cProfile stats to (read them with pstats). trace raises
+    ValueError where CAN_TRACE_MEMORY is False.
+    '''
+
+    def __init__(self, trace=False, profile=None):
+        if trace and not CAN_TRACE_MEMORY:
+            raise ValueError('tracing memory per stage needs Python 3.9 or later (tracemalloc.reset_peak)')
+        self.trace = trace
+        self.profile = profile
+        self.stages = {}
+        self.commands = collections.Counter()
+        self.counters = collections.Counter()
+        self.seconds = 0.0
+
+    @contextlib.contextmanager
+    def session(self, meshIO):
+        '''Count meshIO's Maya commands, and trace and profile if asked, for the block.'''
+        cmds = meshIO.cmds
+        meshIO.cmds = _CountedCommands(cmds, self.commands)
+        tracing = self.trace and not tracemalloc.is_tracing()
+        if tracing:
+            tracemalloc.start()
+        profiler = cProfile.Profile() if self.profile else None
+        start = time.perf_counter()
+        if profiler is not None:
+            profiler.enable()
+        try:
+            yield self
+        finally:
+            if profiler is not None:
+                profiler.disable()
+                profiler.dump_stats(self.profile)
+            self.seconds += time.perf_counter() - start
+            if tracing:
+                tracemalloc.stop()
+            meshIO.cmds = cmds
+
+    @contextlib.contextmanager
+    def stage(self, name):
+        '''Time the block as stage name; repeated stages add up.'''
+        calls = sum(self.commands.values())
+        tracing = self.trace and tracemalloc.is_tracing()
+        if tracing:
+            tracemalloc.reset_peak()
+            memory = tracemalloc.get_traced_memory()[0]
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            entry = self.stages.setdefault(name, {'seconds': 0.0, 'commands': 0, 'peak_mb': None})
+            entry['seconds'] += time.perf_counter() - start
+            entry['commands'] += sum(self.commands.values()) - calls
+            if tracing:
+                peak = (tracemalloc.get_traced_memory()[1] - memory) / 2 ** 20
+                entry['peak_mb'] = max(entry['peak_mb'] or 0.0, peak)
+
+    def count(self, name, n=1):
+        self.counters[name] += int(n)
+
+    def report(self):
+        '''{'seconds', 'stages': {name: {'seconds', 'commands', 'peak_mb'}}, 'commands', 'counters'}'''
+        return {'seconds': self.seconds, 'stages': {name: dict(entry) for name, entry in self.stages.items()},
+                'commands': dict(self.commands), 'counters': dict(self.counters)}
+
+    def log(self, level=logging.INFO):
+        '''One line per stage plus the totals, on the vtxMatch logger.'''
+        for name, entry in self.stages.items():
+            peak = '' if entry['peak_mb'] is None else f', peak {entry["peak_mb"]:.1f} MB'
+            logger.log(level, f'{name}: {entry["seconds"]:.3f}s, {entry["commands"]} commands{peak}')
+        logger.log(level, f'total: {self.seconds:.3f}s, {json.dumps(dict(self.counters))}, '
+                          f'commands {json.dumps(dict(self.commands))}')
+
+
+def stage(instrument, name):
+    '''instrument.stage(name), or a no-op when there is no instrument.'''
+    return contextlib.nullcontext() if instrument is None else instrument.stage(name)
+
+
+class _CountedCommands():
+    '''maya.cmds stand-in that counts every command called through it.'''
+
+    def __init__(self, cmds, counter):
+        self._cmds = cmds
+        self._counter = counter
+
+    def __getattr__(self, name):
+        command = getattr(self._cmds, name)
+        if not callable(command):
+            return command
+
+        def counted(*args, **kwargs):
+            self._counter[name] += 1
+            return command(*args, **kwargs)
+        return counted
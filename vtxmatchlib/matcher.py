@@ -0,0 +1,682 @@
+"""
+Selection state of the vtxMatch tool and the Maya side of a match run.
+"""
+
+import collections
+import concurrent.futures
+import contextlib
+import hashlib
+import os
+
+import numpy
+
+from vtxmatchlib.assignment import match_points_unique
+from vtxmatchlib.correspondence import build_map, save_map
+from vtxmatchlib.core import (DEFAULT_CHUNK_SIZE, MatchResult, match_points, matched_values, merge_results,
+                              mirror_plane, moved, points_near, reflect)
+from vtxmatchlib.geocache import CacheWriter
+from vtxmatchlib.instrument import logger, stage
+from vtxmatchlib.mayaio import MeshIO, VertexSelection
+from vtxmatchlib.progress import Cancelled, step
+from vtxmatchlib.soft import blended_values, soft_match
+from vtxmatchlib.spatial import auto_engine, build_index
+from vtxmatchlib.surface import TriangleBVH, closest_points, interpolated_values
+
+
+# source indices (and 'auto' picks) a PostionMatcher keeps, least recently used dropped first
+INDEX_CACHE_SIZE = 8
+
+# what rematch_vertices diffs against: the settings and arrays of the last run
+_Run = collections.namedtuple('_Run', ['settings', 'targetPoints', 'sourcePoints', 'sourceNormals', 'result'])
+
+
+class PostionMatcher():
+    '''
+    Source (b) and target (a) selections plus their last fetched positions.
+    All Maya traffic goes through meshIO.
+
+    Selections are mayaio.VertexSelections and may span any number of
+    meshes: the source side is one position array and one search index over
+    every piece, and bVtxList.owners(result.source) resolves matched sources
+    to their (mesh, vertex) without a lookup per vertex.
+
+    The source side is cached between runs: its search indices (per engine
+    'auto' picked, threshold for the grid and mirror plane, the last
+    INDEX_CACHE_SIZE of them) are reused until the source selection is
+    replaced or a fetch returns different positions. Source normals can
+    change without a vertex moving, so they are read again, in bulk, by
+    the first run that needs them after each fetch.
+
+    Every match takes an optional mirror (see core.mirror_plane): the source
+    is then reflected across that plane in memory, so one half of a mesh
+    can be matched onto the mirrored other half without duplicating it.
+    With sameTopology, targets on a duplicate of a source mesh take the
+    source vertex with the same id directly (see topology_pairs) and only
+    the rest goes through the spatial search.
+
+    After a plain nearest match, rematch_vertices only searches and writes
+    the targets touched by what moved since.
+
+    Set instrument to an instrument.Instrument to time every run by stage
+    (fetch, search, write, normals) and count its matched pairs.
+
+    Search and write-back run chunkSize targets at a time, with one bulk
+    read and write per mesh per chunk. Set progress to a callback (see
+    progress.step) to hear about every chunk and cancel a run: what it
+    already wrote is undone and progress.Cancelled raised.
+
+    Set blendTarget to a target name to write matched positions as offsets
+    of that blendShape target (see MeshIO.set_blend_target) instead of
+    editing the target mesh, so the match can be dialled in by weight.
+    Normals live on the mesh itself, so runs that copy them raise
+    ValueError in that mode.
+    '''
+
+    def __init__(self, meshIO=None, instrument=None, progress=None, chunkSize=DEFAULT_CHUNK_SIZE):
+        self._meshIO = meshIO
+        self.instrument = instrument
+        self.progress = progress
+        self.chunkSize = chunkSize
+        self.blendTarget = None
+        self._aVtxList = VertexSelection()
+        self._bVtxList = VertexSelection()
+        self.aPoints = numpy.empty((0, 3), dtype=numpy.float64)
+        self.bPoints = numpy.empty((0, 3), dtype=numpy.float64)
+        self._bToken = None
+        self._indexCache = collections.OrderedDict()
+        self._bNormals = None
+        self._lastRun = None
+        # bumped whenever a selection is replaced, so late async results can tell
+        self._generation = 0
+
+    @property
+    def meshIO(self):
+        if self._meshIO is None:
+            self._meshIO = MeshIO()
+        return self._meshIO
+
+    @property
+    def aVtxList(self):
+        return self._aVtxList
+
+    @aVtxList.setter
+    def aVtxList(self, items):
+        self._aVtxList = self.meshIO.selection(items)
+        self._lastRun = None
+        self._generation += 1
+
+    @property
+    def bVtxList(self):
+        return self._bVtxList
+
+    @bVtxList.setter
+    def bVtxList(self, items):
+        self._bVtxList = self.meshIO.selection(items)
+        self._lastRun = None
+        self._generation += 1
+        self.invalidate()
+
+    def invalidate(self):
+        '''Forget everything cached about the source side.'''
+        self._bToken = None
+        self._indexCache.clear()
+        self._bNormals = None
+
+    def updated_xform(self):
+        with stage(self.instrument, 'fetch'):
+            self.aPoints = self.meshIO.gather(self.aVtxList)
+            self.bPoints = self.meshIO.gather(self.bVtxList)
+        token = hashlib.blake2b(self.bPoints.tobytes(), digest_size=16).digest()
+        if token != self._bToken:
+            self.invalidate()
+            self._bToken = token
+        # softening an edge or locking a normal leaves the positions alone, so normals never outlive a fetch
+        self._bNormals = None
+
+    def source_points(self, mirror=None):
+        '''bPoints, reflected when a mirror plane is given.'''
+        return self.bPoints if mirror is None else reflect(self.bPoints, mirror)
+
+    def source_index(self, threshold, engine='auto', mirror=None):
+        '''
+        Search index over source_points(mirror), built once per source state
+        and setting. 'auto' resolves to the engine it picks first, so every
+        threshold that picks the k-d tree shares one tree.
+        '''
+        if engine == 'auto':
+            engine = self._auto_engine(threshold, mirror)
+        key = _index_key(threshold, engine, mirror)
+        index = self._cached(key)
+        if index is None:
+            index = self._cache(key, build_index(self.source_points(mirror), threshold, engine))
+        return index
+
+    def _auto_engine(self, threshold, mirror):
+        '''The engine 'auto' picks for threshold, cached with the indices; a grid it builds to decide is kept.'''
+        choice = ('auto', float(threshold)) + _mirror_key(mirror)
+        engine = self._cached(choice)
+        if engine is None:
+            engine, grid = auto_engine(self.source_points(mirror), threshold)
+            if grid is not None:
+                self._cache(_index_key(threshold, engine, mirror), grid)
+            self._cache(choice, engine)
+        return engine
+
+    def _cached(self, key):
+        if key not in self._indexCache:
+            return None
+        self._indexCache.move_to_end(key)
+        return self._indexCache[key]
+
+    def _cache(self, key, value):
+        self._indexCache[key] = value
+        self._indexCache.move_to_end(key)
+        while len(self._indexCache) > INDEX_CACHE_SIZE:
+            self._indexCache.popitem(last=False)
+        return value
+
+    def source_surface(self, mirror=None):
+        '''
+        TriangleBVH over the source triangles whose three corners are all in
+        bVtxList, with vertices in bVtxList order; cached like source_index.
+        '''
+        key = ('surface',) + _mirror_key(mirror)
+        surface = self._cached(key)
+        if surface is None:
+            triangles = [numpy.empty((0, 3), dtype=numpy.int64)]
+            for mesh, (rows, ids) in self.bVtxList.groups()[0].items():
+                meshTriangles = self.meshIO.triangles(mesh)
+                rowOfId = numpy.full(max(int(ids.max()), int(meshTriangles.max(initial=0))) + 1, -1, dtype=numpy.int64)
+                rowOfId[ids] = rows
+                meshTriangles = rowOfId[meshTriangles]
+                triangles.append(meshTriangles[numpy.all(meshTriangles >= 0, axis=1)])
+            surface = self._cache(key, TriangleBVH(self.source_points(mirror), numpy.concatenate(triangles)))
+        return surface
+
+    def source_normals(self, mirror=None):
+        '''World space normals of bVtxList, one read per mesh after each fetch.'''
+        if self._bNormals is None:
+            self._bNormals = self.meshIO.gather_normals(self.bVtxList)
+        return self._bNormals if mirror is None else reflect(self._bNormals, mirror, vectors=True)
+
+    def topology_pairs(self):
+        '''
+        (target rows, source rows) whose vertex ids correspond: the same id on
+        a target mesh and on another source mesh with the same topology
+        (MeshIO.fingerprint: vertex count and face-vertex lists), e.g. a
+        duplicate or blendshape target. Equal counts are not enough, a mesh
+        with reordered vertex ids does not pair. Each target mesh pairs with
+        the first such mesh in the source selection.
+        '''
+        targetMeshes, _ = self.aVtxList.groups()
+        sourceMeshes, _ = self.bVtxList.groups()
+        fingerprint = {mesh: self.meshIO.fingerprint(mesh) for mesh in {**targetMeshes, **sourceMeshes}}
+        targetRows, sourceRows = [numpy.empty(0, dtype=numpy.int64)], [numpy.empty(0, dtype=numpy.int64)]
+        for mesh, (rows, ids) in targetMeshes.items():
+            partner = next((other for other in sourceMeshes
+                            if other != mesh and fingerprint[other] == fingerprint[mesh]), None)
+            if partner is None:
+                continue
+            sourceRowOfId = numpy.full(self.meshIO.vertex_count(mesh), -1, dtype=numpy.int64)
+            partnerRows, partnerIds = sourceMeshes[partner]
+            sourceRowOfId[partnerIds] = partnerRows
+            found = sourceRowOfId[ids]
+            targetRows.append(numpy.asarray(rows, dtype=numpy.int64)[found >= 0])
+            sourceRows.append(found[found >= 0])
+        return numpy.concatenate(targetRows), numpy.concatenate(sourceRows)
+
+    def pair(self, threshold, engine='auto', unique=None, mirror=None, sameTopology=False):
+        '''
+        Fetch both selections and match them, see core.match_points. unique
+        ('greedy' or 'optimal') uses every source vertex at most once, see
+        assignment.match_points_unique. Pairs found by sameTopology are kept
+        whatever the threshold.
+        '''
+        self.updated_xform()
+        with stage(self.instrument, 'search'):
+            sourcePoints = self.source_points(mirror)
+            topology = self.topology_pairs() if sameTopology else None
+            index = None
+            if len(sourcePoints) and _searches_index(len(self.aPoints), topology, unique):
+                index = self.source_index(threshold, engine, mirror)
+            return self._pair(self.aPoints, sourcePoints, threshold, engine, unique, index, topology, self.progress)
+
+    def _pair(self, targetPoints, sourcePoints, threshold, engine, unique, index, topology, progress):
+        '''pair on fetched arrays; touches no Maya state, so it may run off the main thread.'''
+        if topology is None:
+            return self._match(targetPoints, sourcePoints, threshold, engine, unique, index, progress)
+        target, source = topology
+        direct = MatchResult(target, source, numpy.linalg.norm(targetPoints[target] - sourcePoints[source], axis=1))
+        rest = numpy.setdiff1d(numpy.arange(len(targetPoints)), target)
+        if unique and len(source):
+            # sources already taken by id stay out of the spatial search
+            free = numpy.setdiff1d(numpy.arange(len(sourcePoints)), source)
+            spatial = match_points_unique(targetPoints[rest], sourcePoints[free], threshold, unique, engine)
+            spatial = spatial._replace(source=free[spatial.source])
+        elif len(rest):
+            spatial = self._match(targetPoints[rest], sourcePoints, threshold, engine, unique, index, progress)
+        else:
+            return direct
+        return merge_results(direct, spatial._replace(target=rest[spatial.target]))
+
+    def _match(self, targetPoints, sourcePoints, threshold, engine, unique, index, progress):
+        if unique:
+            # one assignment over every target, so there are no chunks to report
+            result = match_points_unique(targetPoints, sourcePoints, threshold, unique, engine, index)
+            step(progress, 'search', len(targetPoints), len(targetPoints))
+            return result
+        return self._chunked(lambda points: match_points(points, sourcePoints, threshold, engine, index),
+                             targetPoints, progress)
+
+    def _chunked(self, search, targetPoints, progress):
+        '''
+        search (points -> result with target rows first) over chunkSize
+        slices of targetPoints, reporting progress between them, as one result.
+        '''
+        parts = []
+        for lo in range(0, len(targetPoints), self.chunkSize):
+            part = search(targetPoints[lo:lo + self.chunkSize])
+            parts.append(part._replace(target=part.target + lo))
+            step(progress, 'search', min(lo + self.chunkSize, len(targetPoints)), len(targetPoints))
+        if len(parts) == 1:
+            return parts[0]
+        if not parts:
+            return search(targetPoints)
+        return type(parts[0])(*(numpy.concatenate(column) for column in zip(*parts)))
+
+    def match_vertices(self, threshold, engine='auto', copyNormals=False, keepFaceNormals=False, unique=None,
+                       mirror=None, sameTopology=False):
+        '''Snap matched targets onto their (mirrored) sources as one undo step.'''
+        result = self.pair(threshold, engine, unique, mirror, sameTopology)
+        self._write_match(result, threshold, engine, copyNormals, keepFaceNormals, unique, mirror, sameTopology)
+        return result
+
+    def match_vertices_async(self, threshold, engine='auto', copyNormals=False, keepFaceNormals=False, unique=None,
+                             mirror=None, sameTopology=False, defer=None, done=None):
+        '''
+        match_vertices with the search off the main thread, so the UI stays
+        live while it runs. Positions (and source normals) are fetched here,
+        the search runs on a worker thread and the write is handed to defer
+        (maya.utils.executeDeferred unless given) to run on the main thread,
+        followed by done(result). If either selection is replaced in the
+        meantime the result is dropped and done(None) called instead; so is
+        it when the search or write fails, after logging the error on the
+        vtxMatch logger.
+        Returns the search's concurrent.futures.Future.
+        '''
+        if defer is None:
+            import maya.utils
+            defer = maya.utils.executeDeferred
+        self.updated_xform()
+        if copyNormals:
+            self.source_normals(mirror)
+        targetPoints, sourcePoints = self.aPoints, self.source_points(mirror)
+        topology = self.topology_pairs() if sameTopology else None
+        choice = ('auto', float(threshold)) + _mirror_key(mirror)
+        picked = self._cached(choice) if engine == 'auto' else engine
+        index = None if picked is None else self._cached(_index_key(threshold, picked, mirror))
+        generation, token = self._generation, self._bToken
+
+        def search():
+            # plain numpy from here on: no Maya calls, no progress window, no shared caches
+            searchEngine, searchIndex = picked or engine, index
+            if searchIndex is None and len(sourcePoints) and _searches_index(len(targetPoints), topology, unique):
+                if searchEngine == 'auto':
+                    searchEngine, searchIndex = auto_engine(sourcePoints, threshold)
+                if searchIndex is None:
+                    searchIndex = build_index(sourcePoints, threshold, searchEngine)
+            return searchEngine, searchIndex, self._pair(targetPoints, sourcePoints, threshold, engine, unique,
+                                                         searchIndex, topology, None)
+
+        def write(future):
+            try:
+                searchEngine, searchIndex, result = future.result()
+                if generation != self._generation:
+                    result = None
+                else:
+                    if searchIndex is not None and token == self._bToken:
+                        if engine == 'auto':
+                            self._cache(choice, searchEngine)
+                        self._cache(_index_key(threshold, searchEngine, mirror), searchIndex)
+                    self._write_match(result, threshold, engine, copyNormals, keepFaceNormals, unique, mirror,
+                                      sameTopology)
+            except Exception:
+                # nobody waits on the future, so the error goes to the log and done still hears about the run
+                logger.exception('background vtxMatch failed')
+                result = None
+            if done is not None:
+                done(result)
+
+        future = _worker().submit(search)
+        future.add_done_callback(lambda future: defer(lambda: write(future)))
+        return future
+
+    def _write_match(self, result, threshold, engine, copyNormals, keepFaceNormals, unique, mirror, sameTopology):
+        self._write(result, result if copyNormals else None, keepFaceNormals, mirror)
+        # unique and by-id matches depend on every pair, so they always rerun in full
+        self._remember(None if unique or sameTopology else
+                       (float(threshold), engine, _mirror_key(mirror), copyNormals, keepFaceNormals),
+                       result, mirror, copyNormals)
+
+    def rematch_vertices(self, threshold, engine='auto', copyNormals=False, keepFaceNormals=False, mirror=None):
+        '''
+        match_vertices again after the source (or target) was edited. Both
+        sides are refetched in bulk and diffed against the last run; only
+        targets that moved, were matched to a moved source or lie within
+        threshold of one are searched and written again. Falls back to a
+        full match_vertices when the selections or settings changed.
+        Returns the complete correspondence, like match_vertices.
+        '''
+        settings = (float(threshold), engine, _mirror_key(mirror), copyNormals, keepFaceNormals)
+        last = self._lastRun
+        if last is None or last.settings != settings:
+            return self.match_vertices(threshold, engine, copyNormals, keepFaceNormals, mirror=mirror)
+        self.updated_xform()
+        sourcePoints = self.source_points(mirror)
+        movedSource = moved(last.sourcePoints, self.bPoints)
+        affected = moved(last.targetPoints, self.aPoints)
+        affected[last.result.target[movedSource[last.result.source]]] = True
+        affected |= points_near(self.aPoints, sourcePoints[movedSource], threshold)
+        rows = numpy.flatnonzero(affected)
+        with stage(self.instrument, 'search'):
+            index = self.source_index(threshold, engine, mirror) if len(sourcePoints) else None
+            spatial = self._match(self.aPoints[rows], sourcePoints, threshold, engine, None, index, self.progress)
+        spatial = spatial._replace(target=rows[spatial.target])
+        kept = ~affected[last.result.target]
+        keptResult = MatchResult(*(column[kept] for column in last.result))
+        # kept targets sit where the last run snapped them, so measure them again like a full match would
+        delta = self.aPoints[keptResult.target] - sourcePoints[keptResult.source]
+        keptResult = keptResult._replace(distance=numpy.sqrt(numpy.einsum('ij,ij->i', delta, delta)))
+        result = merge_results(keptResult, spatial)
+        normalResult = None
+        if copyNormals:
+            # a source normal also turns when only a neighbouring vertex moved
+            turned = kept & moved(last.sourceNormals, self.source_normals())[last.result.source]
+            normalResult = merge_results(MatchResult(*(column[turned] for column in last.result)), spatial)
+        self._write(spatial, normalResult, keepFaceNormals, mirror)
+        self._remember(settings, result, mirror, copyNormals)
+        return result
+
+    def soft_match_vertices(self, threshold, engine='auto', falloff='linear', k=1, copyNormals=False,
+                            keepFaceNormals=False, mirror=None):
+        '''
+        Move targets part of the way toward their (mirrored) sources instead
+        of snapping, see soft.soft_match, as one undo step. Copied normals are
+        blended the same way from the targets' own normals.
+        '''
+        self.updated_xform()
+        sourcePoints = self.source_points(mirror)
+        with stage(self.instrument, 'search'):
+            index = self.source_index(threshold, engine, mirror) if len(sourcePoints) else None
+            result = self._chunked(lambda points: soft_match(points, sourcePoints, threshold, falloff, k, engine,
+                                                             index), self.aPoints, self.progress)
+        normals = None
+        if copyNormals:
+            with stage(self.instrument, 'normals'):
+                normals = blended_values(result, self.source_normals(mirror),
+                                         self.meshIO.gather_normals(self.aVtxList))
+                normals /= numpy.maximum(numpy.linalg.norm(normals, axis=1, keepdims=True), 1e-12)
+        self._apply(result.target, blended_values(result, sourcePoints, self.aPoints), normals, keepFaceNormals)
+        # targets no longer sit on their sources, so there is nothing to re-match against
+        self._lastRun = None
+        return result
+
+    def surface_match_vertices(self, threshold, copyNormals=False, keepFaceNormals=False, mirror=None):
+        '''
+        Snap targets onto the closest point of the (mirrored) source surface
+        instead of the closest source vertex, as one undo step. Copied
+        normals are interpolated barycentrically from the triangle corners.
+        Returns a surface.SurfaceMatch.
+        '''
+        self.updated_xform()
+        with stage(self.instrument, 'search'):
+            surface = self.source_surface(mirror)
+            result = self._chunked(lambda points: closest_points(points, surface, threshold), self.aPoints,
+                                   self.progress)
+        normals = None
+        if copyNormals:
+            with stage(self.instrument, 'normals'):
+                normals = interpolated_values(result, surface.triangles, self.source_normals(mirror))
+                normals /= numpy.maximum(numpy.linalg.norm(normals, axis=1, keepdims=True), 1e-12)
+        self._apply(result.target, result.point, normals, keepFaceNormals)
+        # targets sit between source vertices, which rematch_vertices cannot diff against
+        self._lastRun = None
+        return result
+
+    def export_map(self, path, result, mirror=None):
+        '''
+        Store result (a MatchResult over the current selections, e.g. from
+        pair) as a correspondence map file; see correspondence.apply_map to
+        re-apply it without a search.
+        '''
+        correspondence = build_map(result, self.aVtxList, self.bVtxList, self.meshIO, mirror)
+        save_map(path, correspondence)
+        return correspondence
+
+    def bake_vertices(self, frames, threshold, engine='auto', unique=None, mirror=None, sameTopology=False,
+                      referenceFrame=None, cacheDir=None):
+        '''
+        Make the targets follow their (mirrored) sources over frames. The
+        match runs once, at referenceFrame (the current frame by default);
+        every frame then reads only the matched source vertices in bulk and
+        writes and keys the matched targets, with no search. Keying makes
+        three animCurves per matched vertex, fine for a few thousand.
+        With cacheDir the targets are not keyed: every target mesh gets a
+        Maya geometry cache there (see geocache.CacheWriter), written a frame
+        at a time and attached once complete (MeshIO.attach_cache). Keys
+        and attachments are one undo step; the current frame is restored
+        afterwards.
+        '''
+        meshIO = self.meshIO
+        frames = [float(frame) for frame in frames]
+        startFrame = meshIO.current_time()
+        try:
+            if referenceFrame is not None:
+                meshIO.set_time(referenceFrame)
+            result = self.pair(threshold, engine, unique, mirror, sameTopology)
+            self._count(result.target)
+            # each source vertex is read once per frame, however many targets share it
+            sources, sourceRows = numpy.unique(result.source, return_inverse=True)
+            sourceSelection = self.bVtxList.take(sources)
+            targets = self.aVtxList.take(result.target)
+            meshes, _ = targets.groups()
+            try:
+                with meshIO.undo_chunk('bakeMatch'), contextlib.ExitStack() as files:
+                    caches = {}
+                    if cacheDir is not None:
+                        fps = meshIO.frame_rate()
+                        for mesh in meshes:
+                            channel = meshIO.cache_channel(mesh)
+                            caches[mesh] = files.enter_context(
+                                CacheWriter(os.path.join(cacheDir, channel), channel, frames, fps))
+                    for i, frame in enumerate(frames):
+                        with stage(self.instrument, 'fetch'):
+                            meshIO.set_time(frame)
+                            positions = meshIO.gather(sourceSelection)
+                        if mirror is not None:
+                            positions = reflect(positions, mirror)
+                        positions = positions[sourceRows]
+                        with stage(self.instrument, 'write'):
+                            if cacheDir is not None:
+                                for mesh, (rows, ids) in meshes.items():
+                                    caches[mesh].write(meshIO.cache_points(mesh, ids, positions[rows]))
+                            else:
+                                meshIO.scatter(targets, positions)
+                                meshIO.key_points(targets, frame)
+                        step(self.progress, 'bake', i + 1, len(frames))
+            except Cancelled:
+                # partial caches are removed on the way out, keys go with the undo
+                if cacheDir is None:
+                    # the chunk holds only plain commands, so undoing it drops every key
+                    meshIO.cmds.undo()
+                raise
+        finally:
+            meshIO.set_time(startFrame)
+        if cacheDir is not None:
+            with meshIO.undo_chunk('bakeMatch'):
+                for mesh in meshes:
+                    meshIO.attach_cache(mesh, cacheDir)
+        return result
+
+    def constrain_closest(self, threshold, engine='auto', mode='parentConstraint'):
+        '''
+        Make every target transform follow its nearest source transform
+        strictly closer than threshold, as one undo step; see
+        MeshIO.constrain for the modes. Both sides' world matrices come from
+        one API read each. A transform picked on both sides is never its own
+        driver, it takes the nearest other source instead, and no pair is made
+        that would close a loop of transforms driving each other: the closer
+        pairs are kept, the target of the one closing it is left alone.
+        '''
+        with stage(self.instrument, 'fetch'):
+            drivenWorld, _ = self.meshIO.transform_matrices(self.aVtxList.names())
+            driverWorld, _ = self.meshIO.transform_matrices(self.bVtxList.names())
+        with stage(self.instrument, 'search'):
+            result = self._closest_drivers(drivenWorld[:, 3, :3], driverWorld[:, 3, :3], threshold, engine)
+        self._count(result.target)
+        drivers = self.bVtxList.take(result.source).names()
+        driven = self.aVtxList.take(result.target).names()
+        try:
+            with self.meshIO.undo_chunk('constrainClosest'), stage(self.instrument, 'write'):
+                for lo in range(0, len(driven), self.chunkSize):
+                    self.meshIO.constrain(drivers[lo:lo + self.chunkSize], driven[lo:lo + self.chunkSize], mode)
+                    step(self.progress, 'write', min(lo + self.chunkSize, len(driven)), len(driven))
+        except Cancelled:
+            # everything in the chunk is plain commands, so undoing it restores the rig
+            self.meshIO.cmds.undo()
+            raise
+        return result
+
+    def _closest_drivers(self, targetPoints, sourcePoints, threshold, engine):
+        index = build_index(sourcePoints, threshold, engine) if len(sourcePoints) else None
+        result = match_points(targetPoints, sourcePoints, threshold, engine, index)
+        sourceRow = {node: row for row, node in enumerate(self.bVtxList.names())}
+        ownRow = numpy.array([sourceRow.get(node, -1) for node in self.aVtxList.names()], dtype=numpy.int64)
+        own = numpy.flatnonzero(ownRow[result.target] == result.source)
+        if len(own):
+            # candidates come sorted by distance, so the first one that is not itself wins
+            rows = result.target[own]
+            queries, sources, dist = index.query_radius(targetPoints[rows], threshold)
+            other = sources != ownRow[rows][queries]
+            queries, sources, dist = queries[other], sources[other], dist[other]
+            first = numpy.ones(len(queries), dtype=bool)
+            first[1:] = queries[1:] != queries[:-1]
+            rest = numpy.setdiff1d(numpy.arange(len(result.target)), own)
+            result = merge_results(MatchResult(*(column[rest] for column in result)),
+                                   MatchResult(rows[queries[first]], sources[first], dist[first]))
+        return _without_loops(result, ownRow)
+
+    def _write(self, positionResult, normalResult, keepFaceNormals, mirror):
+        normals = None
+        if normalResult is not None:
+            normals = matched_values(normalResult, self.source_normals(mirror))
+        self._apply(positionResult.target, matched_values(positionResult, self.source_points(mirror)),
+                    normals, keepFaceNormals, None if normalResult is None else normalResult.target)
+
+    def _apply(self, rows, positions, normals=None, keepFaceNormals=False, normalRows=None):
+        '''
+        Move targets rows to positions and set normals on normalRows (rows by
+        default), chunkSize targets per bulk write (or into blendTarget, once
+        per mesh), as one undo step. When progress cancels, the step is
+        undone, positions, normals and normal locks alike, before Cancelled
+        is raised.
+        '''
+        if normals is not None and self.blendTarget is not None:
+            raise ValueError('normals cannot be copied into a blendShape target: match without copyNormals '
+                             'or clear blendTarget')
+        self._count(rows)
+        normalRows = rows if normalRows is None else normalRows
+        try:
+            with self.meshIO.undo_chunk('matchVertexs'):
+                with stage(self.instrument, 'write'):
+                    if self.blendTarget is not None:
+                        # one write per mesh whatever the count, so there are no chunks
+                        self.meshIO.scatter_blend_target(self.aVtxList.take(rows), positions, self.blendTarget)
+                        step(self.progress, 'write', len(rows), len(rows))
+                    for lo in range(0, len(rows) if self.blendTarget is None else 0, self.chunkSize):
+                        chunk = rows[lo:lo + self.chunkSize]
+                        self.meshIO.scatter(self.aVtxList.take(chunk), positions[lo:lo + self.chunkSize])
+                        step(self.progress, 'write', lo + len(chunk), len(rows))
+                if normals is not None:
+                    with stage(self.instrument, 'normals'):
+                        for lo in range(0, len(normalRows), self.chunkSize):
+                            chunk = normalRows[lo:lo + self.chunkSize]
+                            self.meshIO.scatter_normals(self.aVtxList.take(chunk),
+                                                        normals[lo:lo + self.chunkSize], keepFaceNormals)
+                            step(self.progress, 'normals', lo + len(chunk), len(normalRows))
+        except Cancelled:
+            # progress is only asked after a write, and every write (normals too) is undoable
+            self.meshIO.cmds.undo()
+            raise
+
+    def _count(self, rows):
+        if self.instrument is not None:
+            self.instrument.count('pairs', len(rows))
+
+    def _remember(self, settings, result, mirror, copyNormals):
+        if settings is None:
+            self._lastRun = None
+            return
+        targetPoints = self.aPoints.copy()
+        targetPoints[result.target] = matched_values(result, self.source_points(mirror))
+        self._lastRun = _Run(settings, targetPoints, self.bPoints,
+                             self.source_normals() if copyNormals else None, result)
+
+
+_pool = None
+
+
+def _worker():
+    '''The one background thread async matches queue on, started on first use.'''
+    global _pool
+    if _pool is None:
+        _pool = concurrent.futures.ThreadPoolExecutor(max_workers=1, thread_name_prefix='vtxMatch')
+    return _pool
+
+
+def _without_loops(result, ownRow):
+    '''
+    result without the pairs that would make transforms drive each other in
+    a loop; ownRow is the source row of each target's own node or -1. Only
+    nodes on both sides can be in a loop, pairs are taken closest first.
+    '''
+    targetRow = numpy.full(max(int(ownRow.max(initial=-1)), int(result.source.max(initial=-1))) + 1, -1,
+                           dtype=numpy.int64)
+    targetRow[ownRow[ownRow >= 0]] = numpy.flatnonzero(ownRow >= 0)
+    both = numpy.flatnonzero((ownRow[result.target] >= 0) & (targetRow[result.source] >= 0))
+    driverOf, dropped = {}, []
+    for pair in both[numpy.argsort(result.distance[both], kind='stable')].tolist():
+        target, driver = int(result.target[pair]), int(targetRow[result.source[pair]])
+        # follow the driver's own chain of drivers; reaching target means this pair closes a loop
+        node = driver
+        while node in driverOf and node != target:
+            node = driverOf[node]
+        if node == target:
+            dropped.append(pair)
+        else:
+            driverOf[target] = driver
+    if not dropped:
+        return result
+    kept = numpy.ones(len(result.target), dtype=bool)
+    kept[dropped] = False
+    return MatchResult(*(column[kept] for column in result))
+
+
+def _searches_index(count, topology, unique):
+    '''Whether _pair over count targets queries the source index, i.e. leaves targets to the spatial search.'''
+    if topology is None or not len(topology[0]):
+        return True
+    # a unique search next to topology pairs runs on the free sources only, without the index
+    return not unique and count > len(topology[0])
+
+
+def _index_key(threshold, engine, mirror):
+    # the k-d tree answers any threshold, the grid engines depend on it
+    return ((engine,) if engine == 'kdtree' else (engine, float(threshold))) + _mirror_key(mirror)
+
+
+def _mirror_key(mirror):
+    if mirror is None:
+        return ()
+    normal, offset = mirror_plane(mirror)
+    return (*normal.tolist(), offset)
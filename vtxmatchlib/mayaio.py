@@ -0,0 +1,605 @@
+"""
+Maya side of vtxMatch: bulk reads and writes of mesh data.
+maya is only imported when a MeshIO is created without stand-ins.
+"""
+
+import contextlib
+import hashlib
+import os
+import re
+
+import numpy
+
+from vtxmatchlib.instrument import logger
+
+
+# how constrain_closest ties a driven transform to its driver
+CONSTRAINT_MODES = ('parentConstraint', 'offsetParentMatrix')
+# the plug-in (a file next to this one) and command that make normal edits undoable
+NORMALS_PLUGIN = 'vtxMatchNormals'
+NORMALS_COMMAND = 'vtxMatchSetNormals'
+# deformers that only add offsets, so a blendShape target's offsets pass through them unchanged
+_ADDITIVE_DEFORMERS = ('blendShape', 'tweak')
+# frames per second of Maya's named time units, others are spelled '<fps>fps'
+_TIME_UNITS = {'game': 15, 'film': 24, 'pal': 25, 'ntsc': 30, 'show': 48, 'palf': 50, 'ntscf': 60}
+
+
+class MeshIO():
+    '''
+    Bulk scene access for the matcher.
+    Every query covers a whole mesh in one command, so the number of Maya
+    round-trips follows the number of meshes, not vertices. Pass any object
+    with the used maya.cmds functions (xform, getAttr, setAttr, ...) and a
+    maya.api.OpenMaya stand-in to drive it outside Maya.
+    '''
+
+    def __init__(self, cmdsModule=None, apiModule=None):
+        if cmdsModule is None:
+            import maya.cmds as cmdsModule
+        self.cmds = cmdsModule
+        self._api = apiModule
+
+    @property
+    def api(self):
+        if self._api is None:
+            import maya.api.OpenMaya as om
+            self._api = om
+        return self._api
+
+    def points(self, mesh, dtype=numpy.float64, chunkSize=None, out=None):
+        '''
+        World space positions of every vertex of mesh as a (V, 3) array.
+        With chunkSize the vertices are read in ranges of that many, so the
+        intermediate Python float list never holds the whole mesh; out may be
+        a preallocated (V, 3) array or memmap to read into.
+        '''
+        if chunkSize is None and out is None:
+            flat = self.cmds.xform(f'{mesh}.vtx[*]', q=True, ws=True, t=True)
+            return numpy.array(flat, dtype=dtype).reshape(-1, 3)
+        count = self.vertex_count(mesh)
+        if out is None:
+            out = numpy.empty((count, 3), dtype=dtype)
+        chunkSize = chunkSize or count
+        for lo in range(0, count, chunkSize):
+            hi = min(lo + chunkSize, count)
+            flat = self.cmds.xform(f'{mesh}.vtx[{lo}:{hi - 1}]', q=True, ws=True, t=True)
+            out[lo:hi] = numpy.array(flat, dtype=out.dtype).reshape(-1, 3)
+        return out
+
+    def vertex_count(self, mesh):
+        return self.cmds.polyEvaluate(mesh, vertex=True)
+
+    def fingerprint(self, mesh):
+        '''
+        Hex digest of mesh's topology (vertex count and face-vertex lists),
+        from one MFnMesh call: deforming or moving the mesh keeps it, any
+        change to its vertices or faces does not.
+        '''
+        faceCounts, faceVertices = self._mesh_fn(mesh).getVertices()
+        digest = hashlib.blake2b(numpy.int64(self.vertex_count(mesh)).tobytes(), digest_size=16)
+        digest.update(numpy.array(faceCounts, dtype=numpy.int64).tobytes())
+        digest.update(numpy.array(faceVertices, dtype=numpy.int64).tobytes())
+        return digest.hexdigest()
+
+    def selection(self, items):
+        '''items as a VertexSelection; cmds.ls output is parsed, a VertexSelection passes through.'''
+        if isinstance(items, VertexSelection):
+            return items
+        return VertexSelection.from_items(items, self.vertex_count)
+
+    def expand_meshes(self, items):
+        '''
+        items with every mesh object replaced by "mesh.vtx[*]", so a set of
+        separate pieces becomes one vertex pool; other items are kept.
+        '''
+        return [f'{item}.vtx[*]' if '.' not in item and self.cmds.listRelatives(item, shapes=True, type='mesh')
+                else item for item in items]
+
+    def gather(self, items):
+        '''
+        World space positions of a selection (a VertexSelection or cmds.ls
+        output) as a contiguous (N, 3) array in selection order. Vertices are
+        read one mesh at a time; nodes (transforms) are queried on their own.
+        '''
+        selection = self.selection(items)
+        positions = numpy.empty((len(selection), 3), dtype=numpy.float64)
+        meshes, others = selection.groups()
+        for row in others.tolist():
+            positions[row] = self.cmds.xform(selection.name(row), q=True, ws=True, t=True)
+        for mesh, (rows, ids) in meshes.items():
+            positions[rows] = self._span_points(mesh, ids)
+        return positions
+
+    def _span_points(self, mesh, ids):
+        '''World space positions of vertices ids of mesh, read as the one range that covers them.'''
+        lo, hi = int(ids.min()), int(ids.max())
+        flat = self.cmds.xform(f'{mesh}.vtx[{lo}:{hi}]', q=True, ws=True, t=True)
+        return numpy.array(flat, dtype=numpy.float64).reshape(-1, 3)[ids - lo]
+
+    def set_points(self, mesh, ids, positions):
+        '''
+        Move vertices ids of mesh to world space positions with one setAttr
+        on the shape's tweak array (undoable, unlike MFnMesh.setPoints).
+        '''
+        ids = numpy.asarray(ids, dtype=numpy.int64)
+        if not len(ids):
+            return
+        shape, offsets = self._offsets(mesh, ids, positions)
+        lo, hi = int(ids.min()), int(ids.max())
+        tweaks = numpy.array(self.cmds.getAttr(f'{shape}.pnts[{lo}:{hi}]'), dtype=numpy.float64).reshape(-1, 3)
+        tweaks[ids - lo] += offsets
+        self.cmds.setAttr(f'{shape}.pnts[{lo}:{hi}]', *tweaks.ravel().tolist(), type='float3')
+
+    def _offsets(self, mesh, ids, positions):
+        '''(shape, (N, 3) object space moves that take vertices ids of mesh to world space positions).'''
+        shape = (self.cmds.listRelatives(mesh, shapes=True, noIntermediate=True, fullPath=True) or [mesh])[0]
+        matrix = numpy.array(self.cmds.getAttr(f'{shape}.worldMatrix[0]'), dtype=numpy.float64).reshape(4, 4)
+        world = numpy.hstack([numpy.asarray(positions, dtype=numpy.float64).reshape(-1, 3),
+                              numpy.ones((len(ids), 1))])
+        local = (world @ numpy.linalg.inv(matrix))[:, :3]
+        lo, hi = int(ids.min()), int(ids.max())
+        current = numpy.array(self.cmds.xform(f'{mesh}.vtx[{lo}:{hi}]', q=True, os=True, t=True),
+                              dtype=numpy.float64).reshape(-1, 3)
+        return shape, local - current[ids - lo]
+
+    def set_blend_target(self, mesh, ids, positions, target='vtxMatch'):
+        '''
+        Move vertices ids of mesh to world space positions through the
+        blendShape target named target, leaving the mesh itself alone. The
+        target holds sparse object space offsets: those of ids are replaced,
+        those of its other vertices kept, and the lot is written with one
+        setAttr on its point list and one on its component list whatever
+        the count. Offsets are measured with the target at weight 0. The
+        blendShape is the one deforming mesh (see blend_shape) or a new one;
+        a new target gets weight 1, an existing one keeps its weight.
+        Offsets are measured on the final mesh, so they are only exact while
+        the deformers after the blendShape (deformers_after) are at rest,
+        e.g. a skin in bind pose; a warning names them when there are any.
+        Returns (blendShape, target index).
+        '''
+        ids = numpy.asarray(ids, dtype=numpy.int64)
+        blendShape, geometry = self.blend_shape(mesh)
+        if blendShape is None:
+            blendShape, geometry = self.cmds.blendShape(mesh, name=f'{mesh.split("|")[-1]}_vtxMatch')[0], 0
+        after = self.deformers_after(mesh, blendShape)
+        if after:
+            logger.warning(f'{", ".join(after)} deform {mesh} after {blendShape}: the matched offsets are only '
+                           'exact while they are at rest (e.g. a skin in bind pose)')
+        aliases = self.cmds.aliasAttr(blendShape, q=True) or []
+        weights = dict(zip(aliases[::2], aliases[1::2]))
+        if target in weights:
+            index = int(re.search(r'\[(\d+)\]', weights[target]).group(1))
+            weight = self.cmds.getAttr(f'{blendShape}.weight[{index}]')
+        else:
+            index = max(self.cmds.getAttr(f'{blendShape}.weight', multiIndices=True) or [-1]) + 1
+            weight = 1.0
+        self.cmds.setAttr(f'{blendShape}.weight[{index}]', 0.0)
+        if target not in weights:
+            self.cmds.aliasAttr(target, f'{blendShape}.weight[{index}]')
+        item = f'{blendShape}.inputTarget[{geometry}].inputTargetGroup[{index}].inputTargetItem[6000]'
+        oldIds = [numpy.empty(0, dtype=numpy.int64)]
+        for component in self.cmds.getAttr(f'{item}.inputComponentsTarget') or []:
+            start, stop = _COMPONENT_RANGE.match(component).groups()
+            if start == '*':
+                start, stop = 0, self.vertex_count(mesh) - 1
+            oldIds.append(numpy.arange(int(start), int(start if stop is None else stop) + 1))
+        oldIds = numpy.concatenate(oldIds)
+        oldOffsets = numpy.array(self.cmds.getAttr(f'{item}.inputPointsTarget') or [],
+                                 dtype=numpy.float64).reshape(-1, 4)[:, :3]
+        offsets = numpy.empty((0, 3), dtype=numpy.float64)
+        if len(ids):
+            _, offsets = self._offsets(mesh, ids, positions)
+        kept = ~numpy.isin(oldIds, ids)
+        ids = numpy.concatenate([oldIds[kept], ids])
+        offsets = numpy.concatenate([oldOffsets[kept], offsets])
+        # the point list follows the component list, whose ranges run in ascending id order
+        order = numpy.argsort(ids, kind='stable')
+        ids, offsets = ids[order], offsets[order]
+        points = numpy.hstack([offsets, numpy.ones((len(ids), 1))])
+        self.cmds.setAttr(f'{item}.inputPointsTarget', len(points), *map(tuple, points.tolist()), type='pointArray')
+        components = [f'vtx[{start}:{stop}]' for start, stop in zip(*_runs(ids))]
+        self.cmds.setAttr(f'{item}.inputComponentsTarget', len(components), *components, type='componentList')
+        self.cmds.setAttr(f'{blendShape}.weight[{index}]', weight)
+        return blendShape, index
+
+    def blend_shape(self, mesh):
+        '''
+        (blendShape, geometry index) of the blendShape deforming mesh, or
+        (None, None). mesh's history also holds the deformers of meshes
+        upstream, e.g. of its blendShape targets, so every blendShape in it is
+        asked which geometry it deforms.
+        '''
+        shape = self._long_name((self.cmds.listRelatives(mesh, shapes=True, noIntermediate=True, fullPath=True)
+                                 or [mesh])[0])
+        for blendShape in self.cmds.ls(self.cmds.listHistory(mesh) or [], type='blendShape'):
+            geometry = [self._long_name(node) for node in self.cmds.blendShape(blendShape, q=True, geometry=True) or []]
+            if shape in geometry:
+                return blendShape, self.cmds.blendShape(blendShape, q=True, geometryIndices=True)[geometry.index(shape)]
+        return None, None
+
+    def deformers_after(self, mesh, blendShape):
+        '''
+        Deformers of mesh that act after blendShape and do more than add
+        offsets (skinCluster, wrap, lattice...). mesh's history walks its
+        deformer chain from the mesh up, so they are listed before
+        blendShape; nodes there that deform other meshes are skipped.
+        '''
+        shape = self._long_name((self.cmds.listRelatives(mesh, shapes=True, noIntermediate=True, fullPath=True)
+                                 or [mesh])[0])
+        after = []
+        for deformer in self.cmds.ls(self.cmds.listHistory(mesh) or [], type='geometryFilter'):
+            if deformer == blendShape:
+                break
+            if self.cmds.nodeType(deformer) in _ADDITIVE_DEFORMERS:
+                continue
+            if shape in [self._long_name(node) for node in self.cmds.deformer(deformer, q=True, geometry=True) or []]:
+                after.append(deformer)
+        return after
+
+    def _long_name(self, node):
+        return (self.cmds.ls(node, long=True) or [node])[0]
+
+    def scatter(self, items, positions):
+        '''
+        Inverse of gather: move a selection to world space positions, one
+        bulk write per mesh.
+        '''
+        selection = self.selection(items)
+        meshes, others = selection.groups()
+        for row in others.tolist():
+            self.cmds.xform(selection.name(row), a=True, ws=True, t=positions[row].tolist())
+        for mesh, (rows, ids) in meshes.items():
+            self.set_points(mesh, ids, positions[rows])
+
+    def scatter_blend_target(self, items, positions, target='vtxMatch'):
+        '''scatter through set_blend_target: one blendShape target write per mesh, nodes are moved.'''
+        selection = self.selection(items)
+        meshes, others = selection.groups()
+        for row in others.tolist():
+            self.cmds.xform(selection.name(row), a=True, ws=True, t=positions[row].tolist())
+        for mesh, (rows, ids) in meshes.items():
+            self.set_blend_target(mesh, ids, positions[rows], target)
+
+    def key_points(self, items, frame):
+        '''
+        Key the tweaks of a selection's vertices at frame with one
+        setKeyframe, naming each run of consecutive ids as one range. Maya
+        still makes three animCurves per keyed vertex, so dense meshes are
+        better baked into a geometry cache, see cache_points and
+        attach_cache.
+        '''
+        meshes, _ = self.selection(items).groups()
+        components = []
+        for mesh, (rows, ids) in meshes.items():
+            components += [f'{mesh}.vtx[{start}:{stop}]' for start, stop in zip(*_runs(numpy.unique(ids)))]
+        if components:
+            self.cmds.setKeyframe(components, t=frame)
+
+    def cache_points(self, mesh, ids, positions):
+        '''
+        (V, 3) object space points of every vertex of mesh, as its geometry
+        cache should hold them for the current frame: vertices ids moved to
+        world space positions, the rest where they are now. Tweaks still add
+        on top of a cache, so they are taken out. One read each of points,
+        tweaks and matrix.
+        '''
+        shape = (self.cmds.listRelatives(mesh, shapes=True, noIntermediate=True, fullPath=True) or [mesh])[0]
+        points = numpy.array(self.cmds.xform(f'{mesh}.vtx[*]', q=True, os=True, t=True),
+                             dtype=numpy.float64).reshape(-1, 3)
+        tweaks = numpy.array(self.cmds.getAttr(f'{shape}.pnts[0:{len(points) - 1}]'),
+                             dtype=numpy.float64).reshape(-1, 3)
+        if len(ids):
+            matrix = numpy.array(self.cmds.getAttr(f'{shape}.worldMatrix[0]'), dtype=numpy.float64).reshape(4, 4)
+            world = numpy.hstack([numpy.asarray(positions, dtype=numpy.float64).reshape(-1, 3),
+                                  numpy.ones((len(ids), 1))])
+            points[ids] = (world @ numpy.linalg.inv(matrix))[:, :3]
+        return points - tweaks
+
+    def cache_channel(self, mesh):
+        '''Channel and file name of mesh's geometry cache: its shape's short name, as Maya names them.'''
+        return (self.cmds.listRelatives(mesh, shapes=True, noIntermediate=True, fullPath=True) or [mesh])[0] \
+            .split('|')[-1]
+
+    def attach_cache(self, mesh, directory):
+        '''
+        Play mesh from its geometry cache in directory (cache_channel .xml
+        and .mc) from now on, as Cache > Geometry Cache > Import Cache does:
+        a historySwitch on the mesh, fed by a cacheFile node while inside the
+        cached range. Returns the cacheFile node.
+        '''
+        channel = self.cache_channel(mesh)
+        switch = self.cmds.deformer(mesh, type='historySwitch')[0]
+        cache = self.cmds.cacheFile(attachFile=True, fileName=channel, directory=directory, channelName=[channel],
+                                    inAttr=[f'{switch}.inp[0]'])
+        self.cmds.connectAttr(f'{cache}.inRange', f'{switch}.playFromCache')
+        return cache
+
+    def frame_rate(self):
+        unit = self.cmds.currentUnit(q=True, time=True)
+        return _TIME_UNITS[unit] if unit in _TIME_UNITS else float(unit[:-len('fps')])
+
+    def current_time(self):
+        return self.cmds.currentTime(q=True)
+
+    def set_time(self, frame):
+        '''Go to frame, evaluating the scene there so the next reads see it.'''
+        self.cmds.currentTime(frame, update=True)
+
+    def transform_matrices(self, nodes):
+        '''
+        (world, local) matrices of transforms as two (N, 4, 4) arrays, read
+        through one MSelectionList instead of a query per node. Matrices are
+        row-vector (Maya) order, so the translation is row 3; local is the
+        node's own TRS, without its offsetParentMatrix.
+        '''
+        om = self.api
+        # a selection list merges repeated names, so look each one up once
+        unique = list(dict.fromkeys(nodes))
+        selection = om.MSelectionList()
+        for node in unique:
+            selection.add(node)
+        world = numpy.empty((len(unique), 4, 4), dtype=numpy.float64)
+        local = numpy.empty((len(unique), 4, 4), dtype=numpy.float64)
+        for i in range(len(unique)):
+            path = selection.getDagPath(i)
+            world[i] = _as_array(path.inclusiveMatrix())
+            local[i] = _as_array(om.MFnTransform(path).transformation().asMatrix())
+        if len(unique) == len(nodes):
+            return world, local
+        rowOf = {node: i for i, node in enumerate(unique)}
+        rows = [rowOf[node] for node in nodes]
+        return world[rows], local[rows]
+
+    def constrain(self, drivers, driven, mode='parentConstraint'):
+        '''
+        Make every driven[i] follow drivers[i] from where it is now.
+        'parentConstraint' makes one maintain-offset constraint per pair;
+        'offsetParentMatrix' wires driver.worldMatrix through a multMatrix
+        into driven.offsetParentMatrix (Maya 2020+), which evaluates faster
+        and leaves the driven channels untouched.
+        '''
+        if mode not in CONSTRAINT_MODES:
+            raise ValueError(f'unknown constraint mode {mode!r}, expected one of {CONSTRAINT_MODES}')
+        if mode == 'parentConstraint':
+            for driver, node in zip(drivers, driven):
+                self.cmds.parentConstraint(driver, node, mo=True)
+            return
+        drivenWorld, drivenLocal = self.transform_matrices(driven)
+        driverWorld, _ = self.transform_matrices(drivers)
+        # local @ offset @ driverWorld @ parentInverse == current world while the driver stays put
+        offsets = numpy.linalg.inv(drivenLocal) @ drivenWorld @ numpy.linalg.inv(driverWorld)
+        for driver, node, offset in zip(drivers, driven, offsets):
+            mult = self.cmds.createNode('multMatrix', name=f'{node.split("|")[-1]}_followMatrix')
+            self.cmds.setAttr(f'{mult}.matrixIn[0]', *offset.ravel().tolist(), type='matrix')
+            self.cmds.connectAttr(f'{driver}.worldMatrix[0]', f'{mult}.matrixIn[1]')
+            self.cmds.connectAttr(f'{node}.parentInverseMatrix[0]', f'{mult}.matrixIn[2]')
+            self.cmds.connectAttr(f'{mult}.matrixSum', f'{node}.offsetParentMatrix', force=True)
+
+    def _mesh_fn(self, mesh):
+        selection = self.api.MSelectionList()
+        selection.add(mesh)
+        return self.api.MFnMesh(selection.getDagPath(0))
+
+    def normals(self, mesh):
+        '''World space vertex normals of every vertex of mesh as a (V, 3) array.'''
+        normals = self._mesh_fn(mesh).getVertexNormals(False, self.api.MSpace.kWorld)
+        return numpy.array(normals, dtype=numpy.float64).reshape(-1, 3)
+
+    def triangles(self, mesh):
+        '''(T, 3) vertex ids of mesh's triangulation, from one MFnMesh call.'''
+        _, vertices = self._mesh_fn(mesh).getTriangles()
+        return numpy.array(vertices, dtype=numpy.int64).reshape(-1, 3)
+
+    def set_normals(self, mesh, ids, normals, keepFaceNormals=False):
+        '''
+        Lock vertices ids of mesh to world space normals in one MFnMesh call.
+        With keepFaceNormals, vertices whose face-vertex normals are split
+        (hard edges) are left alone instead of being unified.
+        The call runs inside the vtxMatchSetNormals command (see
+        vtxMatchNormals.py), so it is undoable and joins the open undo chunk.
+        '''
+        ids = numpy.asarray(ids, dtype=numpy.int64)
+        normals = numpy.asarray(normals, dtype=numpy.float64).reshape(-1, 3)
+        if not len(ids):
+            return
+        fn = self._mesh_fn(mesh)
+        faceCounts, faceVertices = fn.getVertices()
+        _, normalIds = fn.getNormalIds()
+        faceVertices = numpy.array(faceVertices, dtype=numpy.int64)
+        normalIds = numpy.array(normalIds, dtype=numpy.int64)
+        if keepFaceNormals:
+            pairs = numpy.unique(numpy.stack([faceVertices, normalIds], axis=1), axis=0)
+            splitCount = numpy.bincount(pairs[:, 0], minlength=int(ids.max()) + 1)
+            smooth = splitCount[ids] <= 1
+            ids, normals = ids[smooth], normals[smooth]
+        if not len(ids):
+            return
+        faces = numpy.repeat(numpy.arange(len(faceCounts)), faceCounts)
+        _normalEdits.append(NormalEdit(self, mesh, ids, normals, fn, faces, faceVertices, normalIds))
+        self._normals_command()()
+
+    def _normals_command(self):
+        '''The vtxMatchSetNormals command, loading its plug-in on first use.'''
+        if not self.cmds.pluginInfo(NORMALS_PLUGIN, q=True, loaded=True):
+            self.cmds.loadPlugin(os.path.join(os.path.dirname(os.path.abspath(__file__)), f'{NORMALS_PLUGIN}.py'),
+                                 quiet=True)
+        return getattr(self.cmds, NORMALS_COMMAND)
+
+    def gather_normals(self, items):
+        '''World space vertex normals of a selection, (N, 3); zero for nodes.'''
+        selection = self.selection(items)
+        result = numpy.zeros((len(selection), 3), dtype=numpy.float64)
+        meshes, _ = selection.groups()
+        for mesh, (rows, ids) in meshes.items():
+            result[rows] = self.normals(mesh)[ids]
+        return result
+
+    def scatter_normals(self, items, normals, keepFaceNormals=False):
+        '''Inverse of gather_normals, one normal write per mesh.'''
+        meshes, _ = self.selection(items).groups()
+        for mesh, (rows, ids) in meshes.items():
+            self.set_normals(mesh, ids, normals[rows], keepFaceNormals)
+
+    @contextlib.contextmanager
+    def undo_chunk(self, name):
+        '''Group every command issued inside the block into one undo step.'''
+        self.cmds.undoInfo(openChunk=True, chunkName=name)
+        try:
+            yield
+        finally:
+            self.cmds.undoInfo(closeChunk=True)
+
+
+class NormalEdit():
+    '''
+    One set_normals write and what it replaces: the face-vertex normals and
+    lock state of the vertices it touches, read when it is made. redo()
+    applies it, undo() restores the locked normals and unlocks the vertices
+    that were not locked before.
+    '''
+
+    def __init__(self, meshIO, mesh, ids, normals, fn, faces, faceVertices, normalIds):
+        om = meshIO.api
+        self.meshIO, self.mesh, self.ids, self.normals = meshIO, mesh, ids, normals
+        touched = numpy.isin(faceVertices, ids)
+        self.faces, self.vertices = faces[touched], faceVertices[touched]
+        allNormals = numpy.array(fn.getNormals(om.MSpace.kWorld), dtype=numpy.float64).reshape(-1, 3)
+        self.faceNormals = allNormals[normalIds[touched]]
+        self.locked = self._read_locks(mesh, ids, faceVertices)
+
+    def _read_locks(self, mesh, ids, faceVertices):
+        '''Lock state of every vertex in ids, from one polyNormalPerVertex query over their ranges.'''
+        unique = numpy.unique(ids)
+        frozen = self.meshIO.cmds.polyNormalPerVertex(
+            [f'{mesh}.vtx[{start}:{stop}]' for start, stop in zip(*_runs(unique))], q=True, freezeNormal=True)
+        # one flag per vertex-face, vertex by vertex in id order; setVertexNormals locks a
+        # vertex's normals alike, so its first one tells
+        frozen = numpy.array(frozen or [], dtype=bool)
+        faceCount = numpy.bincount(faceVertices, minlength=int(unique.max()) + 1)[unique]
+        locked = numpy.zeros(len(unique), dtype=bool)
+        hasFaces = faceCount > 0
+        locked[hasFaces] = frozen[(numpy.cumsum(faceCount) - faceCount)[hasFaces]]
+        return locked[numpy.searchsorted(unique, ids)]
+
+    def redo(self):
+        om = self.meshIO.api
+        self.meshIO._mesh_fn(self.mesh).setVertexNormals(
+            om.MVectorArray([om.MVector(*n) for n in self.normals.tolist()]),
+            om.MIntArray(self.ids.tolist()), om.MSpace.kWorld)
+
+    def undo(self):
+        om = self.meshIO.api
+        fn = self.meshIO._mesh_fn(self.mesh)
+        locked = numpy.isin(self.vertices, self.ids[self.locked])
+        if locked.any():
+            fn.setFaceVertexNormals(om.MVectorArray([om.MVector(*n) for n in self.faceNormals[locked].tolist()]),
+                                    om.MIntArray(self.faces[locked].tolist()),
+                                    om.MIntArray(self.vertices[locked].tolist()), om.MSpace.kWorld)
+        if not self.locked.all():
+            fn.unlockVertexNormals(om.MIntArray(self.ids[~self.locked].tolist()))
+
+
+# set_normals edits waiting for the vtxMatchSetNormals command to pick them up
+_normalEdits = []
+
+
+def take_normal_edit():
+    '''The NormalEdit set_normals staged last; called by the vtxMatchSetNormals command.'''
+    return _normalEdits.pop()
+
+
+def _runs(ids):
+    '''(starts, stops) of the runs of consecutive values in sorted unique ids, as lists.'''
+    if not len(ids):
+        return [], []
+    breaks = numpy.flatnonzero(numpy.diff(ids) != 1)
+    return ids[numpy.append(0, breaks + 1)].tolist(), ids[numpy.append(breaks, len(ids) - 1)].tolist()
+
+
+def _as_array(matrix):
+    '''MMatrix -> (4, 4) array.'''
+    return numpy.array([[matrix.getElement(r, c) for c in range(4)] for r in range(4)], dtype=numpy.float64)
+
+
+_COMPONENT_RANGE = re.compile(r'^vtx\[(\*|\d+)(?::(\d+))?\]$')
+_VERTEX_RANGE = re.compile(r'^(.+)\.vtx\[(\*|\d+)(?::(\d+))?\]$')
+
+
+class VertexSelection():
+    '''
+    A selection kept as index arrays instead of one string per vertex: row
+    i is vertex ids[i] of meshes[mesh[i]] or, where mesh[i] is -1, the node
+    nodes[ids[i]] (a transform). from_items reads the compact ranges of an
+    unflattened cmds.ls ("pCube1.vtx[0:9999]"), so no name is ever built
+    for a single vertex.
+    '''
+
+    def __init__(self, meshes=(), mesh=None, ids=None, nodes=()):
+        self.meshes = list(meshes)
+        self.nodes = list(nodes)
+        self.mesh = numpy.empty(0, dtype=numpy.int32) if mesh is None else numpy.asarray(mesh, dtype=numpy.int32)
+        self.ids = numpy.empty(0, dtype=numpy.int32) if ids is None else numpy.asarray(ids, dtype=numpy.int32)
+
+    @classmethod
+    def from_items(cls, items, vertexCount=None):
+        '''
+        Selection of cmds.ls output, flattened or not, in selection order.
+        vertexCount(mesh) resolves "mesh.vtx[*]"; items that are not
+        vertices are kept as nodes.
+        '''
+        meshes, nodes, runs = {}, [], []
+        for item in items:
+            match = _VERTEX_RANGE.match(item)
+            if match is None:
+                runs.append((-1, len(nodes), len(nodes) + 1))
+                nodes.append(item)
+                continue
+            mesh, start, stop = match.groups()
+            if start == '*':
+                start, stop = 0, vertexCount(mesh) - 1
+            stop = start if stop is None else stop
+            runs.append((meshes.setdefault(mesh, len(meshes)), int(start), int(stop) + 1))
+        runs = numpy.array(runs, dtype=numpy.int64).reshape(-1, 3)
+        lengths = runs[:, 2] - runs[:, 1]
+        # every run counts up from its start: one arange for all, shifted per run
+        shift = numpy.repeat(runs[:, 1] - (numpy.cumsum(lengths) - lengths), lengths)
+        return cls(meshes, numpy.repeat(runs[:, 0], lengths), numpy.arange(int(lengths.sum())) + shift, nodes)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def owners(self, rows):
+        '''
+        (owner mesh ids, vertex ids) of rows as int32 arrays: row r is vertex
+        ids[r] of meshes[owner[r]], so pairs found in a pool of many meshes
+        resolve to their piece without a per-vertex lookup.
+        '''
+        return self.mesh[rows], self.ids[rows]
+
+    def take(self, rows):
+        '''The selection of just rows (any integer index array), in that order.'''
+        return VertexSelection(self.meshes, self.mesh[rows], self.ids[rows], self.nodes)
+
+    def groups(self):
+        '''
+        ({mesh: (rows, vertex ids)}, rows of nodes), keeping the selection
+        order inside each group.
+        '''
+        order = numpy.argsort(self.mesh, kind='stable')
+        bounds = numpy.searchsorted(self.mesh[order], numpy.arange(-1, len(self.meshes) + 1))
+        meshes = {}
+        for i, mesh in enumerate(self.meshes):
+            rows = order[bounds[i + 1]:bounds[i + 2]]
+            if len(rows):
+                meshes[mesh] = (rows, self.ids[rows])
+        return meshes, order[bounds[0]:bounds[1]]
+
+    def name(self, row):
+        '''Maya name of one row, e.g. "pCube1.vtx[12]".'''
+        if self.mesh[row] < 0:
+            return self.nodes[self.ids[row]]
+        return f'{self.meshes[self.mesh[row]]}.vtx[{self.ids[row]}]'
+
+    def names(self):
+        '''Maya names of every row; meant for node (transform) selections.'''
+        return [self.name(row) for row in range(len(self))]
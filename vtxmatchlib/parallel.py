@@ -0,0 +1,144 @@
+"""
+Process-pool matching of many targets against one source.
+The source index is built once and published read-only through shared
+memory; workers attach to it without copying and write their slice of the
+results straight into shared output arrays, so nothing large is pickled.
+"""
+
+import multiprocessing
+import os
+import sys
+from multiprocessing import shared_memory
+
+import numpy
+
+from vtxmatchlib.core import DEFAULT_CHUNK_SIZE, MatchResult, match_points
+from vtxmatchlib.spatial import as_points, build_index
+
+
+def match_many(targets, sourcePoints, threshold, engine='auto', processes=None,
+               chunkSize=DEFAULT_CHUNK_SIZE, index=None):
+    '''
+    Match every (N_i, 3) array in targets (LODs, variants, or a single huge
+    array) against sourcePoints. Work is split into chunkSize slices across
+    a pool of processes (default: all cores). Returns one MatchResult per
+    target array, identical to calling match_points on each.
+    '''
+    if index is None:
+        index = build_index(sourcePoints, threshold, engine)
+    dtype = index.points.dtype
+    targets = [as_points(points, dtype) for points in targets]
+    offsets = numpy.cumsum([0] + [len(points) for points in targets])
+    total = int(offsets[-1])
+    processes = processes or os.cpu_count() or 1
+    if processes == 1 or total <= chunkSize:
+        return [match_points(points, index.points, threshold, index=index) for points in targets]
+
+    blocks = []
+    try:
+        shared = {}
+        for name, array in _index_arrays(index).items():
+            shared[name] = _publish(array, blocks)
+        targetSpec = _publish(numpy.concatenate(targets), blocks)
+        nearestSpec = _publish(numpy.empty(total, dtype=numpy.int64), blocks)
+        distanceSpec = _publish(numpy.empty(total, dtype=dtype), blocks)
+
+        context = multiprocessing.get_context('spawn')
+        executable = _python_executable()
+        if executable:
+            context.set_executable(executable)
+        jobs = [(lo, min(lo + chunkSize, total)) for lo in range(0, total, chunkSize)]
+        with context.Pool(min(processes, len(jobs)), initializer=_init_worker,
+                          initargs=(type(index), _index_scalars(index), shared,
+                                    targetSpec, nearestSpec, distanceSpec, threshold)) as pool:
+            pool.map(_run_slice, jobs)
+
+        nearest = _view(nearestSpec, blocks)
+        distance = _view(distanceSpec, blocks)
+        results = []
+        for lo, hi in zip(offsets[:-1], offsets[1:]):
+            hit = numpy.flatnonzero(nearest[lo:hi] >= 0)
+            results.append(MatchResult(hit, nearest[lo:hi][hit].copy(), distance[lo:hi][hit].copy()))
+        return results
+    finally:
+        for block in blocks:
+            block.close()
+            block.unlink()
+
+
+def parallel_match_meshes(sourceItems, targetMeshes, threshold, engine='auto', processes=None,
+                          chunkSize=DEFAULT_CHUNK_SIZE, meshIO=None):
+    '''
+    Snap every vertex of each target mesh onto the source selection, with
+    the search spread over a process pool and one write per mesh in a single
+    undo chunk. Returns {mesh: MatchResult}.
+    '''
+    from vtxmatchlib.mayaio import MeshIO
+    meshIO = meshIO or MeshIO()
+    source = meshIO.gather(sourceItems)
+    results = match_many([meshIO.points(mesh) for mesh in targetMeshes], source, threshold, engine,
+                         processes, chunkSize)
+    with meshIO.undo_chunk('matchVertexs'):
+        for mesh, result in zip(targetMeshes, results):
+            meshIO.set_points(mesh, result.target, source[result.source])
+    return dict(zip(targetMeshes, results))
+
+
+def _index_arrays(index):
+    return {name: value for name, value in vars(index).items() if isinstance(value, numpy.ndarray)}
+
+
+def _index_scalars(index):
+    return {name: value for name, value in vars(index).items() if not isinstance(value, numpy.ndarray)}
+
+
+def _publish(array, blocks):
+    '''Copy array into a new shared memory block; returns its (name, shape, dtype) spec.'''
+    block = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+    blocks.append(block)
+    numpy.ndarray(array.shape, dtype=array.dtype, buffer=block.buf)[...] = array
+    return block.name, array.shape, array.dtype.str
+
+
+def _view(spec, blocks):
+    name, shape, dtype = spec
+    block = next(block for block in blocks if block.name == name)
+    return numpy.ndarray(shape, dtype=dtype, buffer=block.buf)
+
+
+def _attach(spec, blocks):
+    name, shape, dtype = spec
+    # spawned workers share the parent's resource tracker, which unlinks the block
+    block = shared_memory.SharedMemory(name=name)
+    blocks.append(block)
+    return numpy.ndarray(shape, dtype=dtype, buffer=block.buf)
+
+
+def _python_executable():
+    '''Inside a Maya GUI session sys.executable is maya(.exe); workers need mayapy.'''
+    name = os.path.splitext(os.path.basename(sys.executable))[0].lower()
+    if name != 'maya':
+        return None
+    suffix = '.exe' if sys.platform == 'win32' else ''
+    return os.path.join(os.path.dirname(sys.executable), 'mayapy' + suffix)
+
+
+_worker = {}
+
+
+def _init_worker(indexType, scalars, shared, targetSpec, nearestSpec, distanceSpec, threshold):
+    blocks = []
+    index = indexType.__new__(indexType)
+    vars(index).update(scalars)
+    vars(index).update({name: _attach(spec, blocks) for name, spec in shared.items()})
+    _worker.update(index=index, blocks=blocks, threshold=threshold,
+                   targets=_attach(targetSpec, blocks),
+                   nearest=_attach(nearestSpec, blocks),
+                   distance=_attach(distanceSpec, blocks))
+
+
+def _run_slice(job):
+    lo, hi = job
+    distance, nearest = _worker['index'].query(_worker['targets'][lo:hi], _worker['threshold'])
+    _worker['nearest'][lo:hi] = nearest
+    _worker['distance'][lo:hi] = distance
@@ -0,0 +1,41 @@
+"""
+Progress reporting and cancellation for long vtxMatch runs.
+A progress callback is any callable(stage, done, total); returning False
+cancels the run, which then rolls back and raises Cancelled.
+"""
+
+
+class Cancelled(Exception):
+    '''Raised once a cancelled run has been rolled back.'''
+
+
+def step(progress, stage, done, total):
+    '''Report done of total to progress; raise Cancelled when it returns False.'''
+    if progress is not None and progress(stage, done, total) is False:
+        raise Cancelled(f'cancelled during {stage} at {done} of {total}')
+
+
+class ProgressWindow():
+    '''
+    Maya's progressWindow as a progress callback for the block; pressing
+    Esc cancels. Pass cmdsModule to drive it outside Maya.
+    '''
+
+    def __init__(self, title, cmdsModule=None):
+        if cmdsModule is None:
+            import maya.cmds as cmdsModule
+        self.cmds = cmdsModule
+        self.title = title
+
+    def __enter__(self):
+        self.cmds.progressWindow(title=self.title, progress=0, status='', isInterruptable=True)
+        return self
+
+    def __call__(self, stage, done, total):
+        if self.cmds.progressWindow(q=True, isCancelled=True):
+            return False
+        self.cmds.progressWindow(e=True, progress=int(100 * done / max(total, 1)), status=f'{stage} {done}/{total}')
+        return True
+
+    def __exit__(self, *exc):
+        self.cmds.progressWindow(endProgress=True)
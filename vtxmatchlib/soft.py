@@ -0,0 +1,88 @@
+"""
+Soft vtxMatch: instead of snapping, targets move part of the way toward
+their source, by a falloff weight over the distance, optionally toward an
+inverse distance blend of their k nearest sources.
+"""
+
+import collections
+
+import numpy
+
+from vtxmatchlib.core import DEFAULT_CHUNK_SIZE, match_points
+from vtxmatchlib.spatial import as_points, build_index
+
+
+FALLOFFS = ('linear', 'smoothstep', 'gaussian')
+
+SoftMatch = collections.namedtuple('SoftMatch', ['target', 'source', 'weight'])
+SoftMatch.__doc__ = '''
+Matched target rows with their k nearest source rows and weights as (M, k)
+arrays. A row's weights add up to the falloff weight of its nearest source,
+the rest stays with the target; missing neighbours are source 0 at weight 0.
+'''
+
+
+def falloff_weight(distance, threshold, falloff='linear'):
+    '''
+    How far (0 to 1) a target at distance moves: 1 on top of its source,
+    falling to 0 at threshold ('gaussian' keeps about 0.01 there).
+    '''
+    t = numpy.clip(numpy.asarray(distance) / threshold, 0.0, 1.0)
+    if falloff == 'linear':
+        return 1.0 - t
+    if falloff == 'smoothstep':
+        return 1.0 - t * t * (3.0 - 2.0 * t)
+    if falloff == 'gaussian':
+        # threshold sits at three standard deviations
+        return numpy.exp(-4.5 * t * t)
+    raise ValueError(f'unknown falloff {falloff!r}, expected one of {FALLOFFS}')
+
+
+def soft_match(targetPoints, sourcePoints, threshold, falloff='linear', k=1, engine='auto', index=None,
+               chunkSize=DEFAULT_CHUNK_SIZE):
+    '''
+    Weights for every target with a source strictly closer than threshold.
+    k > 1 blends the k nearest sources inside the threshold by inverse
+    squared distance (see KDTree.query_knn), chunkSize targets at a time.
+    '''
+    if falloff not in FALLOFFS:
+        raise ValueError(f'unknown falloff {falloff!r}, expected one of {FALLOFFS}')
+    targetPoints = as_points(targetPoints)
+    sourcePoints = as_points(sourcePoints)
+    if not len(targetPoints) or not len(sourcePoints):
+        return SoftMatch(numpy.empty(0, dtype=numpy.int64), numpy.empty((0, k), dtype=numpy.int64),
+                         numpy.empty((0, k), dtype=sourcePoints.dtype))
+    if index is None:
+        index = build_index(sourcePoints, threshold, engine)
+    if k == 1:
+        target, source, distance = match_points(targetPoints, sourcePoints, threshold, engine, index)
+        source, distance = source[:, None], distance[:, None]
+    else:
+        parts = [_k_nearest(index, targetPoints[lo:lo + chunkSize], threshold, k, lo)
+                 for lo in range(0, len(targetPoints), chunkSize)]
+        target, source, distance = (numpy.concatenate(column) for column in zip(*parts))
+    # a source right on its target takes all of the blend
+    exact = distance[:, 0] == 0
+    with numpy.errstate(divide='ignore'):
+        inverse = 1.0 / (distance * distance)
+    inverse[exact] = 0.0
+    inverse[exact, 0] = 1.0
+    weight = inverse / inverse.sum(axis=1, keepdims=True)
+    weight *= falloff_weight(distance[:, :1], threshold, falloff)
+    return SoftMatch(target, source, weight)
+
+
+def blended_values(result, sourceValues, targetValues):
+    '''Each matched target's value moved toward its weighted source values, (M, C).'''
+    own = numpy.asarray(targetValues)[result.target]
+    keep = 1.0 - result.weight.sum(axis=1)
+    pulled = numpy.einsum('mk,mkc->mc', result.weight, numpy.asarray(sourceValues)[result.source])
+    return own * keep[:, None] + pulled
+
+
+def _k_nearest(index, targets, threshold, k, offset):
+    '''(target rows, (M, k) sources, (M, k) distances) from one k-nearest query; padding is inf away.'''
+    distance, source = index.query_knn(targets, k, threshold)
+    matched = numpy.flatnonzero(source[:, 0] >= 0)
+    distance, source = distance[matched], source[matched]
+    return matched + offset, numpy.where(source < 0, 0, source), distance
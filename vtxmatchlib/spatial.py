@@ -0,0 +1,521 @@
+"""
+Spatial indices for nearest-source lookups.
+Pure numpy: nothing here touches Maya, so the engines run and benchmark on
+any machine.
+"""
+
+import itertools
+
+import numpy
+
+
+def as_points(points, dtype=None):
+    '''
+    points as a C-contiguous (N, 3) array. float32 input stays float32 (to
+    halve memory on huge meshes), anything else becomes float64.
+    '''
+    points = numpy.asarray(points)
+    if dtype is None:
+        dtype = numpy.float32 if points.dtype == numpy.float32 else numpy.float64
+    return numpy.ascontiguousarray(points, dtype=dtype).reshape(-1, 3)
+
+
+class KDTree():
+    '''
+    Balanced k-d tree over a (M, 3) point array.
+    Built once, then answers a whole batch of nearest-neighbour queries in
+    O(N log M). Queries walk the tree level by level as (query, node) pair
+    arrays, so the Python loop count follows the tree depth, not N or M.
+    '''
+
+    def __init__(self, points, leafsize=32):
+        self.points = as_points(points)
+        self.leafsize = max(int(leafsize), 1)
+        count = len(self.points)
+        order = numpy.arange(count)
+        dims, splits, lefts, rights, boxLo, boxHi, leaves = [], [], [], [], [], [], []
+
+        stack = [(0, count, -1, False)]
+        while stack:
+            lo, hi, parent, isRight = stack.pop()
+            node = len(dims)
+            if parent >= 0:
+                (rights if isRight else lefts)[parent] = node
+            block = self.points[order[lo:hi]]
+            low, high = (block.min(axis=0), block.max(axis=0)) if hi > lo else (numpy.zeros(3), numpy.zeros(3))
+            boxLo.append(low)
+            boxHi.append(high)
+            lefts.append(-1)
+            rights.append(-1)
+            if hi - lo <= self.leafsize:
+                # keep leaf members in index order so ties resolve to the lowest id
+                order[lo:hi].sort()
+                leaves.append((node, lo, hi))
+                dims.append(-1)
+                splits.append(0.0)
+                continue
+            dim = int(numpy.argmax(high - low))
+            mid = (hi - lo) // 2
+            order[lo:hi] = order[lo:hi][numpy.argpartition(block[:, dim], mid)]
+            dims.append(dim)
+            splits.append(self.points[order[lo + mid], dim])
+            stack.append((lo + mid, hi, node, True))
+            stack.append((lo, lo + mid, node, False))
+
+        self._dim = numpy.array(dims, dtype=numpy.int64)
+        self._split = numpy.array(splits, dtype=self.points.dtype)
+        self._left = numpy.array(lefts, dtype=numpy.int64)
+        self._right = numpy.array(rights, dtype=numpy.int64)
+        self._boxLo = numpy.array(boxLo, dtype=self.points.dtype).reshape(-1, 3)
+        self._boxHi = numpy.array(boxHi, dtype=self.points.dtype).reshape(-1, 3)
+        # leaves are padded to leafsize so a batch of leaf visits is one dense block
+        self._leaf = numpy.full(len(dims), -1, dtype=numpy.int64)
+        self._leafPoints = numpy.full((len(leaves), self.leafsize, 3), numpy.inf, dtype=self.points.dtype)
+        self._leafIndex = numpy.full((len(leaves), self.leafsize), count, dtype=numpy.int64)
+        for leaf, (node, lo, hi) in enumerate(leaves):
+            self._leaf[node] = leaf
+            self._leafPoints[leaf, :hi - lo] = self.points[order[lo:hi]]
+            self._leafIndex[leaf, :hi - lo] = order[lo:hi]
+
+    def __len__(self):
+        return len(self.points)
+
+    def query(self, targets, distance_upper_bound=numpy.inf, leafDistances=None):
+        '''
+        Nearest source for every target point.
+        Only sources strictly closer than distance_upper_bound count, ties go
+        to the lowest source index. Returns (distances, indices); targets
+        without a source in range get inf and -1.
+        leafDistances(queries, leaves, targets) swaps the point to point test
+        for another shape: it returns the (len(queries), leafsize) squared
+        distances from each query's target to the members of its leaf (see
+        leaf_members), inf for padding. The boxes must hold whatever it
+        measures, see refit.
+        '''
+        targets = as_points(targets, self.points.dtype)
+        bestDist = numpy.full(len(targets), float(distance_upper_bound) ** 2, dtype=self.points.dtype)
+        bestIndex = numpy.full(len(targets), -1, dtype=numpy.int64)
+        if not len(targets) or not len(self.points):
+            return numpy.full(len(targets), numpy.inf, dtype=self.points.dtype), bestIndex
+
+        # descend every query to its own leaf first for a tight starting bound
+        queries = numpy.arange(len(targets))
+        node = self._descend(targets)
+        # walk the targets in leaf order so gathers during the sweep stay local
+        order = numpy.argsort(node, kind='stable')
+        targets, node = targets[order], node[order]
+        sortedDist, sortedIndex = bestDist[order], bestIndex[order]
+        visit = leafDistances or self._leaf_distances
+        self._visit_leaves(queries, self._leaf[node], targets, sortedDist, sortedIndex, visit)
+
+        # then sweep from the root, dropping nodes whose box is out of reach
+        node = numpy.zeros(len(targets), dtype=numpy.int64)
+        while len(queries):
+            gap = numpy.maximum(self._boxLo[node] - targets[queries], 0.0)
+            gap = numpy.maximum(gap, targets[queries] - self._boxHi[node])
+            keep = numpy.einsum('ij,ij->i', gap, gap) <= sortedDist[queries]
+            queries, node = queries[keep], node[keep]
+            leaf = self._leaf[node]
+            isLeaf = leaf >= 0
+            self._visit_leaves(queries[isLeaf], leaf[isLeaf], targets, sortedDist, sortedIndex, visit)
+            queries, node = queries[~isLeaf], node[~isLeaf]
+            queries = numpy.concatenate([queries, queries])
+            node = numpy.concatenate([self._left[node], self._right[node]])
+
+        bestDist[order], bestIndex[order] = sortedDist, sortedIndex
+        distances = numpy.sqrt(bestDist)
+        distances[bestIndex < 0] = numpy.inf
+        return distances, bestIndex
+
+    def query_knn(self, targets, k, distance_upper_bound=numpy.inf):
+        '''
+        The k nearest sources of every target point as (N, k) distances and
+        indices, nearest first. The bound and ties work as in query; missing
+        neighbours get inf and -1. Only the k best per target are kept while
+        the leaves are swept, so memory stays O(N k) whatever the bound.
+        '''
+        targets = as_points(targets, self.points.dtype)
+        k = max(int(k), 1)
+        bestDist = numpy.full((len(targets), k), float(distance_upper_bound) ** 2, dtype=self.points.dtype)
+        bestIndex = numpy.full((len(targets), k), -1, dtype=numpy.int64)
+        if not len(targets) or not len(self.points):
+            return numpy.full((len(targets), k), numpy.inf, dtype=self.points.dtype), bestIndex
+
+        queries = numpy.arange(len(targets))
+        node = self._descend(targets)
+        order = numpy.argsort(node, kind='stable')
+        targets, ownLeaf = targets[order], self._leaf[node[order]]
+        self._visit_leaves_knn(queries, ownLeaf, targets, bestDist, bestIndex)
+
+        # the sweep skips each query's own leaf, whose sources are already in
+        node = numpy.zeros(len(targets), dtype=numpy.int64)
+        while len(queries):
+            gap = numpy.maximum(self._boxLo[node] - targets[queries], 0.0)
+            gap = numpy.maximum(gap, targets[queries] - self._boxHi[node])
+            keep = numpy.einsum('ij,ij->i', gap, gap) <= bestDist[queries, -1]
+            queries, node = queries[keep], node[keep]
+            leaf = self._leaf[node]
+            isLeaf = leaf >= 0
+            visit = isLeaf & (leaf != ownLeaf[queries])
+            self._visit_leaves_knn(queries[visit], leaf[visit], targets, bestDist, bestIndex)
+            queries, node = queries[~isLeaf], node[~isLeaf]
+            queries = numpy.concatenate([queries, queries])
+            node = numpy.concatenate([self._left[node], self._right[node]])
+
+        distances, indices = numpy.empty_like(bestDist), numpy.empty_like(bestIndex)
+        distances[order], indices[order] = numpy.sqrt(bestDist), bestIndex
+        distances[indices < 0] = numpy.inf
+        return distances, indices
+
+    def query_radius(self, targets, r):
+        '''
+        Every (target, source) pair strictly closer than r, as parallel arrays
+        (targets, sources, distances) sorted by target, distance, source.
+        '''
+        targets = as_points(targets, self.points.dtype)
+        bound = numpy.asarray(float(r) ** 2, dtype=self.points.dtype)
+        parts = []
+        queries = numpy.arange(len(targets)) if len(self.points) else numpy.empty(0, dtype=numpy.int64)
+        node = numpy.zeros(len(queries), dtype=numpy.int64)
+        while len(queries):
+            gap = numpy.maximum(self._boxLo[node] - targets[queries], 0.0)
+            gap = numpy.maximum(gap, targets[queries] - self._boxHi[node])
+            keep = numpy.einsum('ij,ij->i', gap, gap) < bound
+            queries, node = queries[keep], node[keep]
+            leaf = self._leaf[node]
+            isLeaf = leaf >= 0
+            hitQueries, hitLeaves = queries[isLeaf], leaf[isLeaf]
+            delta = targets[hitQueries, None, :] - self._leafPoints[hitLeaves]
+            dist = numpy.einsum('ijk,ijk->ij', delta, delta)
+            row, column = numpy.nonzero(dist < bound)
+            parts.append((hitQueries[row], self._leafIndex[hitLeaves[row], column], dist[row, column]))
+            queries, node = queries[~isLeaf], node[~isLeaf]
+            queries = numpy.concatenate([queries, queries])
+            node = numpy.concatenate([self._left[node], self._right[node]])
+        return _sorted_pairs(parts, self.points.dtype)
+
+    def leaf_members(self):
+        '''
+        (leaves, leafsize) point rows of every leaf, in index order and
+        padded with len(points); the leaf numbers query hands leafDistances.
+        '''
+        return self._leafIndex
+
+    def refit(self, leafLo, leafHi):
+        '''
+        Set every leaf's box to the (leaves, 3) leafLo and leafHi corners and
+        rebuild the inner boxes around them, for a tree over stand-in points
+        of larger shapes (see surface.TriangleBVH).
+        '''
+        leafNodes = numpy.flatnonzero(self._leaf >= 0)
+        self._boxLo[leafNodes] = leafLo[self._leaf[leafNodes]]
+        self._boxHi[leafNodes] = leafHi[self._leaf[leafNodes]]
+        # nodes are numbered parents first, so children are final when reached in reverse
+        for node in numpy.flatnonzero(self._leaf < 0)[::-1].tolist():
+            left, right = self._left[node], self._right[node]
+            self._boxLo[node] = numpy.minimum(self._boxLo[left], self._boxLo[right])
+            self._boxHi[node] = numpy.maximum(self._boxHi[left], self._boxHi[right])
+
+    def _descend(self, targets):
+        '''The leaf node every target falls in.'''
+        node = numpy.zeros(len(targets), dtype=numpy.int64)
+        inner = self._leaf[node] < 0
+        while inner.any():
+            at = node[inner]
+            goLeft = targets[inner, self._dim[at]] < self._split[at]
+            node[inner] = numpy.where(goLeft, self._left[at], self._right[at])
+            inner = self._leaf[node] < 0
+        return node
+
+    def _visit_leaves_knn(self, queries, leaves, targets, bestDist, bestIndex):
+        if not len(queries):
+            return
+        delta = targets[queries, None, :] - self._leafPoints[leaves]
+        dist = numpy.einsum('ijk,ijk->ij', delta, delta)
+        row, column = numpy.nonzero(dist <= bestDist[queries, -1:])
+        _keep_k_nearest(queries[row], dist[row, column], self._leafIndex[leaves[row], column], bestDist, bestIndex)
+
+    def _leaf_distances(self, queries, leaves, targets):
+        delta = targets[queries, None, :] - self._leafPoints[leaves]
+        return numpy.einsum('ijk,ijk->ij', delta, delta)
+
+    def _visit_leaves(self, queries, leaves, targets, bestDist, bestIndex, leafDistances):
+        if not len(queries):
+            return
+        dist = leafDistances(queries, leaves, targets)
+        nearest = dist.argmin(axis=1)
+        dist = dist[numpy.arange(len(queries)), nearest]
+        index = self._leafIndex[leaves, nearest]
+        _keep_nearest(queries, dist, index, bestDist, bestIndex)
+
+
+# (target, source) candidate pairs a HashGrid query holds at once
+GRID_BATCH_PAIRS = 1 << 21
+
+
+class HashGrid():
+    '''
+    Uniform grid of cellSize buckets over a (M, 3) point array.
+    A query only visits the 27 cells around each target, so with the cell
+    size set to the match threshold the search is close to linear on dense
+    meshes. Targets are searched in batches of about GRID_BATCH_PAIRS
+    candidate pairs, so memory stays bounded however crowded the cells are.
+    '''
+
+    def __init__(self, points, cellSize):
+        self.points = as_points(points)
+        self.cellSize = float(cellSize)
+        if not 0 < self.cellSize < numpy.inf:
+            raise ValueError(f'HashGrid needs a positive finite cell size, got {cellSize}')
+        cells = numpy.floor(self.points / self.cellSize).astype(numpy.int64)
+        # two empty cells of padding: any target cell whose 27 neighbours are
+        # not all inside the grid cannot have a source around it
+        if len(cells):
+            self._origin = cells.min(axis=0) - 2
+            self._shape = cells.max(axis=0) - self._origin + 3
+        else:
+            self._origin = numpy.zeros(3, dtype=numpy.int64)
+            self._shape = numpy.full(3, 3, dtype=numpy.int64)
+        if numpy.prod(self._shape.astype(numpy.float64)) >= 2 ** 62:
+            raise ValueError('HashGrid cell size is too small for the extent of the points')
+        strides = numpy.array([self._shape[1] * self._shape[2], self._shape[2], 1], dtype=numpy.int64)
+        self._neighbours = numpy.array(list(itertools.product((-1, 0, 1), repeat=3)), dtype=numpy.int64) @ strides
+        keys, _ = self._keys(cells)
+        self._order = numpy.argsort(keys, kind='stable')
+        self._sorted = self.points[self._order]
+        self._cells, self._start, self._count = numpy.unique(
+            keys[self._order], return_index=True, return_counts=True)
+
+    def __len__(self):
+        return len(self.points)
+
+    @property
+    def occupancy(self):
+        '''Mean number of points per non-empty cell.'''
+        return len(self.points) / max(len(self._cells), 1)
+
+    @property
+    def candidates(self):
+        '''
+        Mean number of sources in the 27 cells around each point: what a
+        query near the points compares per target. Unlike occupancy it
+        grows with the crowded cells, so skewed density shows up in it.
+        '''
+        if not len(self._cells):
+            return 0.0
+        around = numpy.zeros(len(self._cells), dtype=numpy.int64)
+        for offset in self._neighbours:
+            slot = numpy.minimum(numpy.searchsorted(self._cells, self._cells + offset), len(self._cells) - 1)
+            around += numpy.where(self._cells[slot] == self._cells + offset, self._count[slot], 0)
+        return float(self._count @ around) / len(self.points)
+
+    def _keys(self, cells):
+        local = cells - self._origin
+        inside = ((local >= 1) & (local < self._shape - 1)).all(axis=1)
+        keys = (local[:, 0] * self._shape[1] + local[:, 1]) * self._shape[2] + local[:, 2]
+        return keys, inside
+
+    def query(self, targets, distance_upper_bound=None):
+        '''
+        Same contract as KDTree.query. The bound defaults to the cell size
+        and cannot exceed it, since only adjacent cells are searched.
+        '''
+        distance_upper_bound = self._check_bound(distance_upper_bound)
+        targets = as_points(targets, self.points.dtype)
+        bestDist = numpy.full(len(targets), float(distance_upper_bound) ** 2, dtype=self.points.dtype)
+        bestIndex = numpy.full(len(targets), -1, dtype=numpy.int64)
+        for order, queries, sources, dist in self._candidates(targets):
+            close = dist <= bestDist[order[queries]]
+            _keep_nearest(order[queries[close]], dist[close], sources[close], bestDist, bestIndex, grouped=True)
+        distances = numpy.sqrt(bestDist)
+        distances[bestIndex < 0] = numpy.inf
+        return distances, bestIndex
+
+    def query_knn(self, targets, k, distance_upper_bound=None):
+        '''Same contract as KDTree.query_knn, the bound limited to the cell size.'''
+        distance_upper_bound = self._check_bound(distance_upper_bound)
+        targets = as_points(targets, self.points.dtype)
+        k = max(int(k), 1)
+        bestDist = numpy.full((len(targets), k), float(distance_upper_bound) ** 2, dtype=self.points.dtype)
+        bestIndex = numpy.full((len(targets), k), -1, dtype=numpy.int64)
+        for order, queries, sources, dist in self._candidates(targets):
+            close = dist <= bestDist[order[queries], -1]
+            _keep_k_nearest(order[queries[close]], dist[close], sources[close], bestDist, bestIndex)
+        distances = numpy.sqrt(bestDist)
+        distances[bestIndex < 0] = numpy.inf
+        return distances, bestIndex
+
+    def query_radius(self, targets, r=None):
+        '''Same contract as KDTree.query_radius, r limited to the cell size.'''
+        bound = numpy.asarray(float(self._check_bound(r)) ** 2, dtype=self.points.dtype)
+        parts = []
+        for order, queries, sources, dist in self._candidates(as_points(targets, self.points.dtype)):
+            close = dist < bound
+            parts.append((order[queries[close]], sources[close], dist[close]))
+        return _sorted_pairs(parts, self.points.dtype)
+
+    def _check_bound(self, bound):
+        if bound is None:
+            return self.cellSize
+        if bound > self.cellSize:
+            raise ValueError(f'HashGrid built for {self.cellSize} cannot search up to {bound}')
+        return bound
+
+    def _candidates(self, targets):
+        '''
+        Yield (order, queries, sources, squared distances) for each of the 27
+        neighbour offsets: every source in that neighbour cell of each target.
+        Targets are walked in cell order (target row = order[queries]) so
+        lookups and gathers stay local; each target's candidates are
+        contiguous and in source index order. Targets go in batches of about
+        GRID_BATCH_PAIRS candidates (a target never spans two batches), the
+        27 offsets once per batch.
+        '''
+        if not len(targets) or not len(self._cells):
+            return
+        keys, inside = self._keys(numpy.floor(targets / self.cellSize).astype(numpy.int64))
+        order = numpy.flatnonzero(inside)
+        order = order[numpy.argsort(keys[order], kind='stable')]
+        keys, points = keys[order], targets[order]
+        # cell lookups only need to happen once per distinct target cell
+        cellStart = numpy.ones(len(keys), dtype=bool)
+        cellStart[1:] = keys[1:] != keys[:-1]
+        targetCells = keys[cellStart]
+        cellOf = numpy.cumsum(cellStart) - 1
+        slots, founds = [], []
+        around = numpy.zeros(len(targetCells), dtype=numpy.int64)
+        for offset in self._neighbours:
+            slot = numpy.minimum(numpy.searchsorted(self._cells, targetCells + offset), len(self._cells) - 1)
+            found = self._cells[slot] == targetCells + offset
+            around += numpy.where(found, self._count[slot], 0)
+            slots.append(slot)
+            founds.append(found)
+        pairs = numpy.cumsum(around[cellOf])
+        start = 0
+        while start < len(order):
+            before = pairs[start] - around[cellOf[start]]
+            stop = max(int(numpy.searchsorted(pairs, before + GRID_BATCH_PAIRS, side='right')), start + 1)
+            batchCells = cellOf[start:stop]
+            for slot, found in zip(slots, founds):
+                queries = numpy.flatnonzero(found[batchCells]) + start
+                cellSlot = slot[cellOf[queries]]
+                # expand every (query, cell) hit into its (query, point) pairs
+                count = self._count[cellSlot]
+                queries = numpy.repeat(queries, count)
+                member = numpy.repeat(self._start[cellSlot] - (numpy.cumsum(count) - count), count)
+                member += numpy.arange(len(queries))
+                delta = points[queries] - self._sorted[member]
+                yield order, queries, self._order[member], numpy.einsum('ij,ij->i', delta, delta)
+            start = stop
+
+
+def _sorted_pairs(parts, dtype):
+    '''Concatenate (targets, sources, squared distances) parts into sorted pair arrays.'''
+    if not parts:
+        return (numpy.empty(0, dtype=numpy.int64), numpy.empty(0, dtype=numpy.int64),
+                numpy.empty(0, dtype=dtype))
+    queries, sources, dist = (numpy.concatenate(column) for column in zip(*parts))
+    order = numpy.lexsort((sources, dist, queries))
+    return queries[order], sources[order], numpy.sqrt(dist[order])
+
+
+def _keep_nearest(queries, dist, index, bestDist, bestIndex, grouped=False):
+    '''
+    Fold candidate (query, squared distance, source index) triples into the
+    running best arrays: closest wins, ties go to the lowest source index,
+    and a source exactly on the initial bound is never accepted.
+    grouped promises each query's candidates are contiguous and in index
+    order, which skips the sort.
+    '''
+    if not len(queries):
+        return
+    if grouped:
+        start = numpy.ones(len(queries), dtype=bool)
+        start[1:] = queries[1:] != queries[:-1]
+        segment = numpy.cumsum(start) - 1
+        lowest = numpy.minimum.reduceat(dist, numpy.flatnonzero(start))
+        hit = numpy.flatnonzero(dist == lowest[segment])
+        first = numpy.ones(len(hit), dtype=bool)
+        first[1:] = segment[hit[1:]] != segment[hit[:-1]]
+        hit = hit[first]
+    else:
+        order = numpy.lexsort((index, dist, queries))
+        start = numpy.ones(len(queries), dtype=bool)
+        start[1:] = queries[order[1:]] != queries[order[:-1]]
+        hit = order[start]
+    queries, dist, index = queries[hit], dist[hit], index[hit]
+    better = (dist < bestDist[queries]) | (
+        (dist == bestDist[queries]) & (index < bestIndex[queries]))
+    bestDist[queries[better]] = dist[better]
+    bestIndex[queries[better]] = index[better]
+
+
+def _keep_k_nearest(queries, dist, index, bestDist, bestIndex):
+    '''
+    _keep_nearest for the k best: fold candidate triples into running (N, k)
+    best arrays, nearest first, ties to the lowest index. A query's running
+    best joins its candidates, so the initial bound (index -1) still wins
+    ties and is never replaced by a source exactly on it.
+    '''
+    if not len(queries):
+        return
+    k = bestDist.shape[1]
+    rows, row = numpy.unique(queries, return_inverse=True)
+    row = numpy.concatenate([row, numpy.repeat(numpy.arange(len(rows)), k)])
+    dist = numpy.concatenate([dist, bestDist[rows].ravel()])
+    index = numpy.concatenate([index, bestIndex[rows].ravel()])
+    order = numpy.lexsort((index, dist, row))
+    row, dist, index = row[order], dist[order], index[order]
+    first = numpy.ones(len(row), dtype=bool)
+    first[1:] = row[1:] != row[:-1]
+    start = numpy.flatnonzero(first)
+    rank = numpy.arange(len(row)) - numpy.repeat(start, numpy.diff(numpy.r_[start, len(row)]))
+    keep = rank < k
+    bestDist[rows[row[keep]], rank[keep]] = dist[keep]
+    bestIndex[rows[row[keep]], rank[keep]] = index[keep]
+
+
+ENGINES = ('auto', 'kdtree', 'grid')
+# above about this many candidates per point (HashGrid.candidates) the 27-cell scan loses to the tree
+GRID_MAX_CANDIDATES = 128
+# above this many the grid is refused outright: the scan would take far longer than the tree
+GRID_LIMIT_CANDIDATES = 1 << 12
+
+
+def build_index(points, distanceRange, engine='auto'):
+    '''
+    Spatial index over points for matches within distanceRange.
+    'auto' takes the hash grid for a finite threshold as long as its cells
+    stay sparse (dense meshes, short range) and the k-d tree otherwise.
+    'grid' raises ValueError when the threshold is so large against the
+    point spacing that every target would be compared with a crowd.
+    '''
+    if engine not in ENGINES:
+        raise ValueError(f'Unknown engine {engine!r}, expected one of {ENGINES}')
+    if engine == 'kdtree':
+        return KDTree(points)
+    if engine == 'grid':
+        grid = HashGrid(points, distanceRange)
+        if grid.candidates > GRID_LIMIT_CANDIDATES:
+            raise ValueError(f'threshold {distanceRange} is too large for the grid engine: a query would compare '
+                             f'about {grid.candidates:.0f} sources per target; use a smaller threshold, '
+                             f'"kdtree" or "auto"')
+        return grid
+    grid = auto_engine(points, distanceRange)[1]
+    return KDTree(points) if grid is None else grid
+
+
+def auto_engine(points, distanceRange):
+    '''
+    (engine, grid): the engine build_index's 'auto' picks for points and
+    distanceRange, with the HashGrid it had to build to decide when that is
+    the pick (None for 'kdtree').
+    '''
+    if 0 < distanceRange < numpy.inf:
+        try:
+            grid = HashGrid(points, distanceRange)
+        except ValueError:
+            grid = None
+        if grid is not None and grid.candidates <= GRID_MAX_CANDIDATES:
+            return 'grid', grid
+    return 'kdtree', None
@@ -0,0 +1,36 @@
+"""
+Out-of-core matching of whole meshes with millions of vertices.
+Fetch, search and write-back all run in fixed-size vertex ranges, positions
+can be kept as float32 and large arrays can live in memory-mapped files, so
+peak memory stays bounded by the source mesh and the chunk size.
+"""
+
+import numpy
+
+from vtxmatchlib.core import DEFAULT_CHUNK_SIZE, allocate, match_points_chunked, spill_folder
+from vtxmatchlib.mayaio import MeshIO
+
+
+def stream_match(sourceMesh, targetMesh, threshold, engine='auto', chunkSize=DEFAULT_CHUNK_SIZE,
+                 float32=True, spillDir=None, meshIO=None):
+    '''
+    Snap every vertex of targetMesh onto its nearest sourceMesh vertex,
+    chunk by chunk, as one undo step. With spillDir the fetched positions
+    are memory-mapped into a temporary folder under it, removed again once
+    the write is done. Returns the MatchResult.
+    '''
+    meshIO = meshIO or MeshIO()
+    dtype = numpy.float32 if float32 else numpy.float64
+    with spill_folder(spillDir) as folder:
+        source = meshIO.points(sourceMesh, dtype, chunkSize,
+                               allocate((meshIO.vertex_count(sourceMesh), 3), dtype, folder, 'source_points'))
+        target = meshIO.points(targetMesh, dtype, chunkSize,
+                               allocate((meshIO.vertex_count(targetMesh), 3), dtype, folder, 'target_points'))
+        result = match_points_chunked(target, source, threshold, engine, chunkSize=chunkSize, spillDir=folder)
+        with meshIO.undo_chunk('matchVertexs'):
+            for lo in range(0, len(result.target), chunkSize):
+                ids = result.target[lo:lo + chunkSize]
+                meshIO.set_points(targetMesh, ids, source[result.source[lo:lo + chunkSize]])
+        # closed before the folder goes, see match_points_chunked
+        del source, target
+    return result
@@ -0,0 +1,139 @@
+"""
+Closest point on surface matching: targets land anywhere on the source
+triangles instead of only on source vertices, which matters when the
+source is a low resolution cage.
+"""
+
+import collections
+
+import numpy
+
+from vtxmatchlib.spatial import KDTree, as_points
+
+
+SurfaceMatch = collections.namedtuple('SurfaceMatch', ['target', 'triangle', 'weight', 'point', 'distance'])
+SurfaceMatch.__doc__ = '''
+Matched target rows with the source triangle row they landed on, the
+(M, 3) barycentric weights of that triangle's corners, the (M, 3) closest
+surface points and their distances.
+'''
+
+# (query, leaf) pairs per point-triangle batch; keeps the kernel's temporaries small
+_VISIT_CHUNK = 16384
+
+
+class TriangleBVH():
+    '''
+    Bounding volume hierarchy over a triangle mesh.
+    The hierarchy is a KDTree over triangle centroids refit so every box
+    holds its whole triangles, and queried with point-triangle distances at
+    the leaves, so query finds the closest triangle with the KDTree.query
+    contract: (distances, triangle rows). points are the centroids;
+    vertices and triangles the mesh it was built from. Build it once and
+    reuse it for any number of queries.
+    '''
+
+    def __init__(self, vertices, triangles, leafsize=8):
+        self.vertices = as_points(vertices)
+        self.triangles = numpy.asarray(triangles, dtype=numpy.int64).reshape(-1, 3)
+        corners = self.vertices[self.triangles]
+        self.tree = KDTree(corners.mean(axis=1), leafsize)
+        self.points = self.tree.points
+        if not len(self.triangles):
+            return
+        members = self.tree.leaf_members()
+        # pad short leaves with their first triangle rather than a dummy, their distances are masked
+        self._padding = members == len(self.triangles)
+        leafCorners = corners[numpy.where(self._padding, members[:, :1], members)]
+        # per triangle terms of the closest point kernel, so a visit only needs two dot products
+        self._leafA = leafCorners[..., 0, :]
+        self._leafAB = leafCorners[..., 1, :] - self._leafA
+        self._leafAC = leafCorners[..., 2, :] - self._leafA
+        self._leafDots = _edge_dots(self._leafAB, self._leafAC)
+        self.tree.refit(leafCorners.min(axis=(1, 2)), leafCorners.max(axis=(1, 2)))
+
+    def __len__(self):
+        return len(self.triangles)
+
+    def query(self, targets, distance_upper_bound=numpy.inf):
+        '''Closest triangle for every target point, as KDTree.query.'''
+        return self.tree.query(targets, distance_upper_bound, self._leaf_distances)
+
+    def _leaf_distances(self, queries, leaves, targets):
+        dist = numpy.empty(self._padding[leaves].shape, dtype=targets.dtype)
+        for lo in range(0, len(queries), _VISIT_CHUNK):
+            chunkQueries, chunkLeaves = queries[lo:lo + _VISIT_CHUNK], leaves[lo:lo + _VISIT_CHUNK]
+            ab, ac = self._leafAB[chunkLeaves], self._leafAC[chunkLeaves]
+            ap = targets[chunkQueries, None, :] - self._leafA[chunkLeaves]
+            v, w = _barycentric(ap, ab, ac, self._leafDots[chunkLeaves])
+            delta = v[..., None] * ab + w[..., None] * ac - ap
+            dist[lo:lo + _VISIT_CHUNK] = numpy.einsum('ijk,ijk->ij', delta, delta)
+        dist[self._padding[leaves]] = numpy.inf
+        return dist
+
+
+def closest_on_triangles(points, a, b, c):
+    '''
+    Closest point on triangle (a, b, c) to each point, over any matching
+    leading shape. Returns (closest points, barycentric weights of a, b, c).
+    '''
+    ab, ac = b - a, c - a
+    v, w = _barycentric(points - a, ab, ac, _edge_dots(ab, ac))
+    closest = a + v[..., None] * ab + w[..., None] * ac
+    return closest, numpy.stack([1.0 - v - w, v, w], axis=-1)
+
+
+def _edge_dots(ab, ac):
+    '''ab.ab, ab.ac and ac.ac stacked on the last axis.'''
+    return numpy.stack([numpy.einsum('...k,...k->...', ab, ab), numpy.einsum('...k,...k->...', ab, ac),
+                        numpy.einsum('...k,...k->...', ac, ac)], axis=-1)
+
+
+def _barycentric(ap, ab, ac, dots):
+    '''
+    Weights (v, w) of b and c for the closest point, by Voronoi region as in
+    Ericson's Real-Time Collision Detection 5.1.5, with every region
+    evaluated as arrays and picked by numpy.select in order of precedence.
+    '''
+    abab, abac, acac = dots[..., 0], dots[..., 1], dots[..., 2]
+    d1 = numpy.einsum('...k,...k->...', ab, ap)
+    d2 = numpy.einsum('...k,...k->...', ac, ap)
+    # the same products measured from b and from c
+    d3, d4 = d1 - abab, d2 - abac
+    d5, d6 = d1 - abac, d2 - acac
+    va = d3 * d6 - d5 * d4
+    vb = d5 * d2 - d1 * d6
+    vc = d1 * d4 - d3 * d2
+    with numpy.errstate(divide='ignore', invalid='ignore'):
+        # zero denominators only occur on zero area triangles, whose nan
+        # weights become 0 below (the closest point falls back to a corner)
+        face = 1.0 / (va + vb + vc)
+        onFace = vb * face, vc * face
+        onAB = d1 / (d1 - d3)
+        onAC = d2 / (d2 - d6)
+        onBC = (d4 - d3) / ((d4 - d3) + (d5 - d6))
+    regions = [(d1 <= 0) & (d2 <= 0),
+               (d3 >= 0) & (d4 <= d3),
+               (vc <= 0) & (d1 >= 0) & (d3 <= 0),
+               (d6 >= 0) & (d5 <= d6),
+               (vb <= 0) & (d2 >= 0) & (d6 <= 0),
+               (va <= 0) & (d4 - d3 >= 0) & (d5 - d6 >= 0)]
+    v = numpy.select(regions, [0.0, 1.0, onAB, 0.0, 0.0, 1.0 - onBC], onFace[0])
+    w = numpy.select(regions, [0.0, 0.0, 0.0, 1.0, onAC, onBC], onFace[1])
+    return numpy.nan_to_num(v), numpy.nan_to_num(w)
+
+
+def closest_points(targetPoints, bvh, threshold=numpy.inf):
+    '''Closest point on bvh's surface for every target strictly closer than threshold.'''
+    targetPoints = as_points(targetPoints, bvh.points.dtype)
+    distance, triangle = bvh.query(targetPoints, threshold)
+    target = numpy.flatnonzero(triangle >= 0)
+    corners = bvh.vertices[bvh.triangles[triangle[target]]]
+    point, weight = closest_on_triangles(targetPoints[target], corners[:, 0], corners[:, 1], corners[:, 2])
+    return SurfaceMatch(target, triangle[target], weight, point, distance[target])
+
+
+def interpolated_values(result, triangles, vertexValues):
+    '''Per vertex values (normals, colours) at each matched surface point, (M, C).'''
+    corners = numpy.asarray(vertexValues)[numpy.asarray(triangles)[result.triangle]]
+    return numpy.einsum('mk,mkc->mc', result.weight, corners)
@@ -0,0 +1,49 @@
+"""
+Maya plug-in behind MeshIO.set_normals. MFnMesh normal edits skip the undo
+queue, so MeshIO stages each bulk edit (mayaio.NormalEdit) and runs it
+through the vtxMatchSetNormals command defined here, which keeps the edit
+for undoIt: the normal copy then joins the open undoInfo chunk like any
+other command. MeshIO loads this file with cmds.loadPlugin on first use; it
+is not meant to be imported.
+"""
+
+import maya.api.OpenMaya as om
+
+from vtxmatchlib import mayaio
+
+
+def maya_useNewAPI():
+    pass
+
+
+class SetNormalsCommand(om.MPxCommand):
+    '''Applies the normal edit MeshIO staged last; undoIt puts back what it replaced.'''
+
+    def __init__(self):
+        super().__init__()
+        self.edit = None
+
+    def doIt(self, args):
+        self.edit = mayaio.take_normal_edit()
+        self.edit.redo()
+
+    def redoIt(self):
+        self.edit.redo()
+
+    def undoIt(self):
+        self.edit.undo()
+
+    def isUndoable(self):
+        return True
+
+    @staticmethod
+    def creator():
+        return SetNormalsCommand()
+
+
+def initializePlugin(plugin):
+    om.MFnPlugin(plugin, 'vtxMatch', '1.0').registerCommand(mayaio.NORMALS_COMMAND, SetNormalsCommand.creator)
+
+
+def uninitializePlugin(plugin):
+    om.MFnPlugin(plugin).deregisterCommand(mayaio.NORMALS_COMMAND)